@@ -0,0 +1,106 @@
+"""Construction cost of path structures.
+
+Compares the slotted core with validation on and off and, when typedpy is
+installed, against the typedpy ImmutableStructure definitions the core
+replaced. Also times running the body of elements.py and the individual
+fluent builders.
+
+    python -m benchmarks.bench_construction
+"""
+import importlib.util
+import timeit
+
+from dollarxpy import BasicPath, ElementProperty, div, span, li, has_class, has_some_text
+from dollarxpy.immutable import set_validation, is_interning_enabled, is_validation_enabled
+
+NUMBER = 20000
+
+
+def _build_raw(path_cls, prop_cls):
+    prop = prop_cls(xpath="contains(@class, 'a')", text="has class 'a'")
+    return path_cls(xpath='div', xpath_explanation='div', element_properties=(prop, prop))
+
+
+def _build_chain():
+    return span.that(has_class('x'), has_some_text).descendant_of(div.that(has_class('a')))
+
+
+def _elements_module_code():
+    origin = importlib.util.find_spec('dollarxpy.elements').origin
+    with open(origin) as f:
+        return compile(f.read(), origin, 'exec')
+
+
+def _fluent_builders():
+    prop = has_class('a')
+    target = div.that(prop)
+    return {
+        'that': lambda: span.that(prop),
+        'and_': lambda: target.and_(has_some_text),
+        'or_': lambda: span.or_(li),
+        'inside_top_level': lambda: span.inside_top_level(),
+        'descendant_of': lambda: span.descendant_of(target),
+        'child_of': lambda: span.child_of(target),
+        'after_sibling': lambda: span.after_sibling(target),
+        'before': lambda: span.before(target),
+    }
+
+
+def _typedpy_structures():
+    try:
+        from typedpy import ImmutableStructure, String, Tuple
+    except ImportError:
+        return None
+
+    class TypedpyElementProperty(ImmutableStructure):
+        xpath = String
+        text = String
+
+        _required = ['xpath', 'text']
+
+    class TypedpyBasicPath(ImmutableStructure):
+        inside_xpath = String
+        xpath = String(minLength=1)
+        alternate_xpath = String
+        xpath_explanation = String
+        description = String
+        element_properties = Tuple[TypedpyElementProperty]
+
+        _required = ['xpath']
+
+    return TypedpyBasicPath, TypedpyElementProperty
+
+
+def _time(fn) -> float:
+    return min(timeit.repeat(fn, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def run():
+    results = {}
+    was_enabled = is_validation_enabled()
+    try:
+        for enabled in (True, False):
+            set_validation(enabled)
+            label = 'validated' if enabled else 'unvalidated'
+            results[f'raw structures ({label})'] = _time(lambda: _build_raw(BasicPath, ElementProperty))
+            results[f'fluent chain ({label})'] = _time(_build_chain)
+    finally:
+        set_validation(was_enabled)
+    elements_code = _elements_module_code()
+    results['elements.py constants'] = _time(lambda: exec(elements_code, {'__name__': 'dollarxpy.elements'}))
+    for name, build in _fluent_builders().items():
+        results[f'fluent {name}'] = _time(build)
+    # interned paths are only shared while alive; building one that already exists returns it
+    kept = _build_chain()
+    results['fluent chain (already built)'] = _time(_build_chain)
+    if is_interning_enabled():
+        assert _build_chain() is kept
+    typedpy_structures = _typedpy_structures()
+    if typedpy_structures:
+        results['raw structures (typedpy)'] = _time(lambda: _build_raw(*typedpy_structures))
+    return results
+
+
+if __name__ == '__main__':
+    for name, micros in run().items():
+        print(f'{name:<36}{micros:10.2f} us')
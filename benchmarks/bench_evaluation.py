@@ -0,0 +1,124 @@
+"""Evaluation cost against synthetic documents of increasing size.
+
+Each path is evaluated with the lxml Snapshot and with the DomIndex built
+from it; building the index is reported on its own. A page object batch,
+whose selectors share their containers, is evaluated path by path, as
+one planned batch, and again from a ResultCache holding its results.
+Per-row checks on the grid are made with a path relative to each row
+from the document, and inside the row's Scope. Paths that rely on
+following::/preceding:: are only run through lxml on the smaller
+documents, since libxml2 is quadratic on them.
+
+    python -m benchmarks.bench_evaluation
+"""
+import time
+
+from dollarxpy import (
+    custom_element, div, span, table, td, header1, ul, li, first_occurrence_of, header, has_class, has_text,
+    has_text_containing, is_last_sibling, is_nth_sibling, is_after_sibling, has_id, has_class_containing,
+    has_aggregated_text_starting_with,
+)
+from dollarxpy.dom_index import DomIndex
+from dollarxpy.npath import at_least
+from dollarxpy.result_cache import ResultCache
+from dollarxpy.snapshot import Snapshot
+
+SIZES = (1000, 10000, 100000)
+SLOW_AXES_LIMIT = 10000
+
+row = custom_element('tr')
+
+
+def synthetic_html(n_nodes: int) -> str:
+    # body, div, h1, table, ul and 50 li; every row is a tr with 5 td, each holding a span
+    rows = max(1, (n_nodes - 55) // 11)
+    cells = ''.join([f'<tr class="row {"odd" if i % 2 else "even"}">' +
+                     ''.join([f'<td class="c{j}{" hot" if (i + j) % 7 == 0 else ""}"><span>v{i}-{j}</span></td>'
+                              for j in range(5)]) + '</tr>' for i in range(rows)])
+    items = ''.join([f'<li>item {i}</li>' for i in range(50)])
+    return f'<html><body><div id="main"><h1>Grid</h1><table class="grid">{cells}</table><ul>{items}</ul></div>' \
+           f'</body></html>'
+
+
+def corpus():
+    # (name, path, uses following::/preceding::)
+    return [
+        ('class', td.that(has_class('hot')), False),
+        ('text', span.that(has_text('v3-1')), False),
+        ('text containing', span.that(has_text_containing('7-2')), False),
+        ('descendant', span.descendant_of(td.that(has_class('c2'))), False),
+        ('child of', span.child_of(row.that(has_class('odd'))), False),
+        ('last sibling', td.that(is_last_sibling), False),
+        ('nth sibling', td.that(is_nth_sibling(2)), False),
+        ('sibling count', row.that(is_after_sibling(at_least(3).occurrences_of(row))), False),
+        ('first occurrence', first_occurrence_of(span.that(has_class('hot'))), False),
+        ('header union', header, False),
+        ('inside list', li.descendant_of(ul), False),
+        ('container text', div.that(has_id('main'), has_aggregated_text_starting_with('grid')), False),
+        ('class containing', row.that(has_class_containing('od')), False),
+        ('after', span.after(header1), True),
+        ('before', td.before(ul), True),
+    ]
+
+
+def page_object():
+    main = div.that(has_id('main'))
+    grid = table.that(has_class('grid')).descendant_of(main)
+    items = ul.descendant_of(main)
+    return [grid, header1.descendant_of(main), items, li.descendant_of(items),
+            li.that(has_text('item 7')).descendant_of(items), td.that(has_class('hot')).descendant_of(grid),
+            row.descendant_of(grid), span.descendant_of(grid), row.that(has_class('odd')).child_of(grid)]
+
+
+ROW_CHECKS = 20
+
+
+def _row_checks_from_document(snapshot: Snapshot):
+    for i in range(ROW_CHECKS):
+        snapshot.count(td.that(has_class('hot')).child_of(row.that(is_nth_sibling(i))))
+
+
+def _row_checks_in_scopes(snapshot: Snapshot):
+    for scope in snapshot.scopes(row)[:ROW_CHECKS]:
+        scope.count(td.that(has_class('hot')))
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(sizes=SIZES):
+    results = {}
+    for size in sizes:
+        repeat = 3 if size <= SLOW_AXES_LIMIT else 1
+        snapshot = Snapshot.from_html(synthetic_html(size))
+        results[f'dom index build [n={size}]'] = _best_of(lambda: DomIndex.from_snapshot(snapshot), repeat)
+        index = DomIndex.from_snapshot(snapshot)
+        for name, path, slow_axes in corpus():
+            if not slow_axes or size <= SLOW_AXES_LIMIT:
+                results[f'snapshot {name} [n={size}]'] = _best_of(lambda: snapshot.find_all(path), repeat)
+            index.find_all(path)  # the first query builds the text and class postings
+            results[f'dom index {name} [n={size}]'] = _best_of(lambda: index.find_all(path), repeat)
+        batch = page_object()
+        results[f'snapshot batch path by path [n={size}]'] = _best_of(lambda: [snapshot.find_all(p) for p in batch],
+                                                                      repeat)
+        results[f'snapshot batch planned [n={size}]'] = _best_of(lambda: snapshot.find_all_of(batch), repeat)
+        cached = Snapshot(snapshot.root, ResultCache())
+        cached.find_all_of(batch)
+        results[f'snapshot batch cached [n={size}]'] = _best_of(lambda: cached.find_all_of(batch), repeat)
+        if size <= SLOW_AXES_LIMIT:
+            results[f'snapshot row checks from document [n={size}]'] = \
+                _best_of(lambda: _row_checks_from_document(snapshot), repeat)
+        results[f'snapshot row checks in scopes [n={size}]'] = _best_of(lambda: _row_checks_in_scopes(snapshot), repeat)
+    return results
+
+
+if __name__ == '__main__':
+    for name, micros in run().items():
+        print(f'{name:<44}{micros:14.2f} us')
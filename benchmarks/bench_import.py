@@ -0,0 +1,63 @@
+"""Import cost of the package, measured in fresh interpreters.
+
+Besides the timings, checks that importing dollarxpy does not load the
+browser or offline-evaluation dependencies and does not build any element
+constant; the run fails when it does.
+
+    python -m benchmarks.bench_import
+"""
+import json
+import subprocess
+import sys
+
+REPEAT = 10
+
+# loaded only once a browser or document API is used
+LAZY_MODULES = ('selenium', 'lxml', 'numpy', 'typedpy')
+
+_TIMED = """
+import time
+start = time.perf_counter()
+import dollarxpy
+imported = time.perf_counter()
+dollarxpy.div
+print(imported - start, time.perf_counter() - imported)
+"""
+
+_INSPECTED = """
+import json, sys
+import dollarxpy, dollarxpy.elements as elements
+print(json.dumps({
+    'modules': [m for m in %r if m in sys.modules],
+    'elements': [name for name in elements.__all__ if name in vars(elements)],
+}))
+"""
+
+
+def _python(code: str) -> str:
+    return subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+
+
+def run():
+    imports, first_accesses = [], []
+    for _ in range(REPEAT):
+        imported, accessed = _python(_TIMED).split()
+        imports.append(float(imported) * 1e6)
+        first_accesses.append(float(accessed) * 1e6)
+    return {'import dollarxpy': min(imports), 'first element access': min(first_accesses)}
+
+
+def check():
+    loaded = json.loads(_python(_INSPECTED % (LAZY_MODULES,)))
+    problems = [f'importing dollarxpy loads {module}' for module in loaded['modules']]
+    problems += [f'importing dollarxpy builds the element {name}' for name in loaded['elements']]
+    return problems
+
+
+if __name__ == '__main__':
+    for name, micros in run().items():
+        print(f'{name:<36}{micros:10.2f} us')
+    problems = check()
+    for problem in problems:
+        print(f'FAIL {problem}')
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,119 @@
+"""A test flow of snapshots of the same page, each after a small change.
+
+Every snapshot is parsed, then the selectors of a page object are either
+all evaluated on the whole document or updated from the previous snapshot
+by a SnapshotSeries, which re-evaluates them on the changed subtrees. The
+timings are microseconds per snapshot, parsing included.
+
+    python -m benchmarks.bench_incremental
+"""
+import copy
+import time
+
+from lxml import etree, html as lxml_html
+
+from dollarxpy import (
+    custom_element, div, span, table, td, ul, li, header1, button, has_class, has_id, has_text, has_child,
+    has_text_containing, has_aggregated_text_containing, is_last_sibling, is_nth_sibling, first_occurrence_of,
+)
+from dollarxpy.incremental import SnapshotSeries
+from dollarxpy.snapshot import Snapshot
+
+SIZES = (3000, 30000)
+SNAPSHOTS = 20
+
+row = custom_element('tr')
+
+
+def _page(n_nodes: int) -> str:
+    rows = max(1, (n_nodes - 60) // 11)
+    cells = ''.join(['<tr class="row">' + ''.join([f'<td class="c{j}"><span>v{i}-{j}</span></td>' for j in range(5)]) +
+                     '</tr>' for i in range(rows)])
+    items = ''.join([f'<li>item {i}</li>' for i in range(40)])
+    return f'<html><body><div id="main"><h1>Orders</h1><div class="toolbar"><button>save</button>' \
+           f'<button>cancel</button></div><table class="grid">{cells}</table><ul>{items}</ul>' \
+           f'<div class="status">ready</div></div></body></html>'
+
+
+def selectors():
+    main = div.that(has_id('main'))
+    grid = table.that(has_class('grid')).descendant_of(main)
+    selected = row.that(has_class('selected'))
+    return [
+        main, grid, header1.descendant_of(main), button.that(has_text('save')), button.that(has_text('cancel')),
+        div.that(has_class('status')), div.that(has_class('status'), has_text('saved')), ul.descendant_of(main),
+        li.that(has_text('item 7')), li.that(is_last_sibling), selected, td.child_of(selected),
+        span.descendant_of(selected), row.that(has_child(td.that(has_class('edited')))),
+        td.that(has_class('edited')), span.that(has_text('v3-1')), span.that(has_text_containing('-edited')),
+        row.that(is_nth_sibling(0)), row.that(is_last_sibling), td.that(has_class('c4')).child_of(selected),
+        div.that(has_class('dialog')), button.descendant_of(div.that(has_class('dialog'))),
+        div.that(has_aggregated_text_containing('saved')), first_occurrence_of(selected),
+    ]
+
+
+# markup of every snapshot of the flow: select a row, edit a cell, add a row, open and close a dialog
+def _flow(n_nodes: int):
+    root = lxml_html.document_fromstring(_page(n_nodes))
+    rows = root.xpath('//tr')
+    flow = [etree.tostring(root)]
+    for i in range(1, SNAPSHOTS):
+        step = i % 5
+        if step == 0:
+            for selected in root.xpath('//tr[@class="row selected"]'):
+                selected.set('class', 'row')
+            rows[(i * 37) % len(rows)].set('class', 'row selected')
+        elif step == 1:
+            cell = rows[(i * 53) % len(rows)][2]
+            cell.set('class', 'c2 edited')
+            cell[0].text += '-edited'
+        elif step == 2:
+            rows[-1].addnext(copy.deepcopy(rows[(i * 11) % len(rows)]))
+        elif step == 3:
+            root.xpath('//div[@id="main"]')[0].append(
+                lxml_html.fragment_fromstring('<div class="dialog"><span>saved</span><button>ok</button></div>'))
+            root.xpath('//div[@class="status"]')[0].text = 'saved'
+        else:
+            dialog = root.xpath('//div[@class="dialog"]')[0]
+            dialog.getparent().remove(dialog)
+        flow.append(etree.tostring(root))
+    return flow
+
+
+def _evaluate_all(flow, paths):
+    results = None
+    for markup in flow:
+        snapshot = Snapshot.from_html(markup)
+        results = [snapshot.find_all(p) for p in paths]
+    return results
+
+
+def _update_series(flow, paths):
+    series = SnapshotSeries(paths)
+    for markup in flow:
+        series.update(Snapshot.from_html(markup))
+    return [series.find_all(p) for p in paths]
+
+
+def _per_snapshot(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) / SNAPSHOTS * 1e6
+
+
+def run(sizes=SIZES):
+    results = {}
+    paths = selectors()
+    for size in sizes:
+        flow = _flow(size)
+        expected, updated = _evaluate_all(flow, paths), _update_series(flow, paths)
+        assert [[x.getroottree().getpath(x) for x in r] for r in expected] == \
+               [[x.getroottree().getpath(x) for x in r] for r in updated]
+        results[f'evaluate every selector [n={size}]'] = min(_per_snapshot(_evaluate_all, flow, paths)
+                                                             for _ in range(3))
+        results[f'update the series [n={size}]'] = min(_per_snapshot(_update_series, flow, paths) for _ in range(3))
+    return results
+
+
+if __name__ == '__main__':
+    for name, micros in run().items():
+        print(f'{name:<44}{micros:14.2f} us')
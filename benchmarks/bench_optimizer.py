@@ -0,0 +1,69 @@
+"""Speed of the xpath optimizer.
+
+Every path is evaluated with lxml on a generated table, once with the plain
+rendered xpath and once with the optimized one. That both find the same
+elements is checked by tests/test_optimizer.py.
+
+    python -m benchmarks.bench_optimizer
+"""
+import time
+
+from lxml import etree, html
+
+import dollarxpy as d
+from dollarxpy.npath import at_most, exactly
+from dollarxpy.optimizer import optimized_xpath
+from dollarxpy.path_utils import document_xpath
+
+ROWS = 2000
+
+
+def _table(rows: int) -> str:
+    cells = ''.join([f'<tr class="row {"odd" if i % 2 else "even"}">' +
+                     ''.join([f'<td class="c{j}{" hot" if (i + j) % 7 == 0 else ""}"><span>v{i}-{j}</span></td>'
+                              for j in range(5)]) + '</tr>' for i in range(rows)])
+    return f'<html><body><div id="main"><h1>Grid</h1><table class="grid">{cells}</table></div></body></html>'
+
+
+def corpus():
+    return [
+        d.span.that(d.has_class('x')),
+        d.element.that(d.has_any_of_classes('x', 'c', 'hot')),
+        d.element.that(d.has_none_of_the_classes('x', 'row')),
+        d.element.that(d.has_class('x').or_(d.has_class('c')).and_not(d.has_class('y'))),
+        d.header.or_(d.span).or_(d.td),
+        d.element.that(d.has_text('v3-1')),
+        d.span.that(d.has_text_containing('-4')),
+        d.span.that(d.has_text_ending_with('-3')),
+        d.element.that(d.has_aggregated_text_containing('7-2')),
+        d.td.that(d.is_last_sibling),
+        d.span.that(d.is_only_child),
+        d.element.that(d.has_no_children),
+        d.tr.that(d.has_n_children(5).exactly()),
+        d.td.that(d.is_nth_sibling(0)),
+        d.td.that(d.is_nth_from_last_sibling(2)),
+        d.td.that(d.is_after_sibling(at_most(1).occurrences_of(d.td))),
+        d.td.that(d.is_after_sibling(exactly(3).occurrences_of(d.td))),
+        d.element.that(d.is_parent_of(d.td)),
+        d.anything_except(d.div).that(d.has_id('main')),
+        d.last_occurrence_of(d.td),
+        d.child_number(2).of_type(d.td),
+    ]
+
+
+def _evaluate(document, xpath: str):
+    compiled = etree.XPath(xpath)
+    start = time.perf_counter()
+    compiled(document)
+    return time.perf_counter() - start
+
+
+def run():
+    document = html.document_fromstring(_table(ROWS))
+    return [(str(path), _evaluate(document, document_xpath(path)), _evaluate(document, optimized_xpath(path)))
+            for path in corpus()]
+
+
+if __name__ == '__main__':
+    for path, plain_time, optimized_time in run():
+        print(f'{plain_time * 1e3:10.2f} ms{optimized_time * 1e3:10.2f} ms  {path[:70]}')
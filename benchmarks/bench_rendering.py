@@ -0,0 +1,70 @@
+"""Rendering cost of xpath and __str__ for chains of increasing depth.
+
+Rendering is cached on each node, so every measurement renders freshly
+built chains. Series named '... [n=N]' are picked up by benchmarks.run to
+estimate how cost grows with N; a nested relation chain should stay close
+to linear.
+
+    python -m benchmarks.bench_rendering
+"""
+import time
+
+from dollarxpy import div, span, li, ul, has_class, has_some_text, contains, is_sibling_of, is_parent_of
+from dollarxpy.element_properties import is_before
+
+DEPTHS = (1, 2, 4, 8, 16, 32, 64)
+PATH_COUNTS = (1, 10, 100)
+CHAINS = 200
+
+
+def _nested(depth: int):
+    path = span.that(has_class('leaf'))
+    for i in range(depth):
+        path = path.descendant_of(div.that(has_class(f'c{i}')))
+    return path
+
+
+def _chained(depth: int):
+    path = span
+    for i in range(depth):
+        path = path.after_sibling(li.that(has_class(f'c{i}'))) if i % 2 else path.inside_top_level().that(has_some_text)
+    return path
+
+
+def _right_nested(depth: int):
+    path = span.that(has_class('leaf'))
+    for i in range(depth):
+        path = div.that(has_class(f'c{i}')).ancestor_of(path)
+    return path
+
+
+def _time_fresh(build, render, count: int = CHAINS) -> float:
+    best = None
+    for _ in range(3):
+        paths = [build() for _ in range(count)]
+        start = time.perf_counter()
+        for path in paths:
+            render(path)
+        elapsed = (time.perf_counter() - start) / count * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run():
+    results = {}
+    for name, build in (('nested', _nested), ('chained', _chained), ('right nested', _right_nested)):
+        for depth in DEPTHS:
+            results[f'xpath {name} [n={depth}]'] = _time_fresh(lambda: build(depth), lambda p: p.get_xpath())
+            results[f'str {name} [n={depth}]'] = _time_fresh(lambda: build(depth), str)
+    for count in PATH_COUNTS:
+        paths = [div.that(has_class(f'c{i}')) for i in range(count)]
+        for name, builder in (('contains', contains), ('is_sibling_of', is_sibling_of),
+                              ('is_parent_of', is_parent_of), ('is_before', lambda *ps: is_before(list(ps)))):
+            results[f'{name} render [n={count}]'] = _time_fresh(
+                lambda: ul.that(builder(*paths)), lambda p: (p.get_xpath(), str(p)), count=50)
+    return results
+
+
+if __name__ == '__main__':
+    for name, micros in run().items():
+        print(f'{name:<44}{micros:12.2f} us')
@@ -0,0 +1,62 @@
+"""Loading precompiled selectors against building and compiling them.
+
+A worker that loads a precompiled file gets the path trees with their
+xpath, description and css selector already rendered; one that imports the
+page objects builds the trees and renders them all again. Interning is
+turned off while timing so every run starts from nothing, as a fresh
+worker would.
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+import timeit
+
+from dollarxpy import css, serialization, span, li, tr, td, table, button, has_class, has_text, \
+    has_some_text, has_id, is_after_sibling
+from dollarxpy.immutable import set_interning, is_interning_enabled
+from dollarxpy.npath import at_least
+
+NUMBER = 20
+
+
+def _page_objects(n: int) -> dict:
+    grid = table.that(has_class('grid'))
+    found = {}
+    for i in range(n):
+        row = tr.descendant_of(grid).that(has_id(f'row-{i}'))
+        found[f'row{i}'] = row
+        found[f'cell{i}'] = td.that(has_text(f'cell {i}')).descendant_of(row)
+        found[f'action{i}'] = button.that(has_class('action'), has_some_text).descendant_of(row).after_sibling(span)
+        found[f'list{i}'] = li.that(is_after_sibling(at_least(2).occurrences_of(li.that(has_class(f'item-{i}')))))
+    return found
+
+
+def _compile(paths: dict):
+    for path in paths.values():
+        path.get_xpath(), path.get_alternate_xpath(), str(path), css.compile_selector(path)
+
+
+def _time(fn) -> float:
+    return min(timeit.repeat(fn, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def run():
+    results = {}
+    was_enabled = is_interning_enabled()
+    set_interning(False)
+    try:
+        for n in (10, 100, 1000):
+            data = serialization.dumps(_page_objects(n))
+            results[f'size in bytes per path [n={n}]'] = len(data) / (4 * n)
+
+            results[f'build and compile [n={n}]'] = _time(lambda: _compile(_page_objects(n)))
+            results[f'load precompiled [n={n}]'] = _time(lambda: serialization.loads(data))
+            results[f'json parse only [n={n}]'] = _time(lambda: json.loads(data))
+    finally:
+        set_interning(was_enabled)
+    return results
+
+
+if __name__ == '__main__':
+    for name, micros in run().items():
+        print(f'{name:<40}{micros:12.2f}')
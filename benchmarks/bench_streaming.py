@@ -0,0 +1,53 @@
+"""Streaming a document against parsing it whole and evaluating the xpath.
+
+The timings are microseconds per table row. Streaming costs more per row,
+as every check runs in python, but keeps only the open elements in memory
+where the whole tree grows with the document; both should stay linear.
+
+    python -m benchmarks.bench_streaming
+"""
+import io
+import timeit
+
+from lxml import etree
+
+from dollarxpy import table, td, tr, has_class, has_text, has_child, has_aggregated_text_equal_to
+from dollarxpy.path_utils import document_xpath
+from dollarxpy.streaming import iter_matches
+
+NUMBER = 3
+
+_PATHS = {
+    'cell in grid': td.that(has_text('42')).descendant_of(table.that(has_class('grid'))),
+    'row by aggregated text': tr.that(has_child(td.that(has_aggregated_text_equal_to('row 3 tail')))),
+}
+
+
+def _document(rows: int) -> bytes:
+    body = ''.join(f'<tr><td class="c">{i}</td><td>row <b>{i % 7}</b> tail</td></tr>\n' for i in range(rows))
+    return f'<html><body><table class="grid">{body}</table></body></html>'.encode()
+
+
+def _stream(document: bytes, path) -> int:
+    return sum(1 for _ in iter_matches(io.BytesIO(document), path))
+
+
+def _whole(document: bytes, path) -> int:
+    return len(etree.XPath(document_xpath(path))(etree.fromstring(document)))
+
+
+def run():
+    results = {}
+    for rows in (1000, 10000):
+        document = _document(rows)
+        for name, path in _PATHS.items():
+            assert _stream(document, path) == _whole(document, path)
+            for method, fn in (('stream', _stream), ('parse whole', _whole)):
+                seconds = min(timeit.repeat(lambda: fn(document, path), number=NUMBER, repeat=3)) / NUMBER
+                results[f'{method}: {name} [n={rows}]'] = seconds / rows * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    for name, value in run().items():
+        print(f'{name:<50}{value:12.2f}')
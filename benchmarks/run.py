@@ -0,0 +1,134 @@
+"""Runs the benchmark suites and writes machine-readable results.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --suite rendering --compare baseline.json
+
+Results are microseconds per operation, grouped by suite. For every series
+named '... [n=N]' the growth exponent of time against N is reported as well
+(1 is linear, 2 is quadratic), so a change in complexity shows up even when
+absolute timings move with the machine. --compare reports every timing that
+got slower than the threshold ratio and every exponent that grew, and exits
+with status 1 when there are any.
+"""
+import argparse
+import json
+import math
+import platform
+import re
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks import bench_construction, bench_rendering, bench_evaluation, bench_import, bench_serialization, \
+    bench_streaming, bench_incremental
+
+FORMAT_VERSION = 1
+DEFAULT_THRESHOLD = 1.25
+EXPONENT_TOLERANCE = 0.25
+
+SUITES = {
+    'import': bench_import.run,
+    'construction': bench_construction.run,
+    'rendering': bench_rendering.run,
+    'evaluation': bench_evaluation.run,
+    'serialization': bench_serialization.run,
+    'streaming': bench_streaming.run,
+    'incremental': bench_incremental.run,
+}
+
+_series = re.compile(r'^(.*) \[n=(\d+)\]$')
+
+
+def _versions():
+    versions = {'python': platform.python_version()}
+    for module in ('lxml', 'numpy', 'selenium'):
+        try:
+            versions[module] = __import__(module).__version__
+        except (ImportError, AttributeError):
+            pass
+    return versions
+
+
+def growth_exponents(results: dict) -> dict:
+    # least-squares slope of log(time) over log(n), on the larger half of each series where overhead matters less
+    series = defaultdict(list)
+    for name, micros in results.items():
+        match = _series.match(name)
+        if match and micros > 0:
+            series[match.group(1)].append((int(match.group(2)), micros))
+    exponents = {}
+    for name, points in series.items():
+        points = sorted(points)[len(points) // 2:] if len(points) > 3 else sorted(points)
+        if len(points) < 2:
+            continue
+        xs = [math.log(n) for n, _ in points]
+        ys = [math.log(micros) for _, micros in points]
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        spread = sum((x - mean_x) ** 2 for x in xs)
+        if spread:
+            exponents[name] = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+    return exponents
+
+
+def run(suites) -> dict:
+    results, growth = {}, {}
+    for suite in suites:
+        results[suite] = SUITES[suite]()
+        growth[suite] = growth_exponents(results[suite])
+    return {
+        'format': FORMAT_VERSION,
+        'unit': 'us',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'platform': platform.platform(),
+        'versions': _versions(),
+        'results': results,
+        'growth': growth,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    regressions = []
+    for suite, results in current['results'].items():
+        previous = baseline.get('results', {}).get(suite, {})
+        for name, micros in results.items():
+            before = previous.get(name)
+            if before and micros / before > threshold:
+                regressions.append(f'{suite}: {name}: {before:.2f} -> {micros:.2f} us ({micros / before:.2f}x)')
+    for suite, exponents in current['growth'].items():
+        previous = baseline.get('growth', {}).get(suite, {})
+        for name, exponent in exponents.items():
+            before = previous.get(name)
+            if before is not None and exponent - before > EXPONENT_TOLERANCE:
+                regressions.append(f'{suite}: {name}: growth exponent {before:.2f} -> {exponent:.2f}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES), help='run only this suite (repeatable)')
+    parser.add_argument('--output', help='write the json results to this file instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='json results of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'slowdown ratio reported as a regression (default {DEFAULT_THRESHOLD})')
+    args = parser.parse_args(argv)
+
+    report = run(args.suite or list(SUITES))
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
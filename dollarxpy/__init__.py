@@ -1,9 +1,11 @@
+from types import ModuleType as _ModuleType
+
 from dollarxpy.basic_path import (
         BasicPath, not_, custom_element, child_number, occurrence_number, first_occurrence_of, last_occurrence_of,
         anything_except
     )
 
-from dollarxpy.elements import *
+from dollarxpy import elements as _elements
 
 from dollarxpy.element_property import ElementProperty
 
@@ -14,4 +16,20 @@ from dollarxpy.element_properties import (
         has_role, has_text, has_text_containing, has_text_ending_with, has_text_starting_with, is_inside, is_after, is_after_sibling, is_ancestor_of, is_before,
         is_before_sibling, is_child_of, is_contained_in, is_descendant_of, is_hidden_with_inline_styling, is_last_sibling, is_nth_from_last_sibling,
         is_nth_sibling, is_only_child, is_parent_of, is_sibling_of, is_with_index, contains, with_index_in_range, not_, not_prop
-)
\ No newline at end of file
+)
+
+# element constants (div, span, header, ...) are looked up lazily in dollarxpy.elements, a star import included
+__all__ = [name for name, value in globals().items() if not name.startswith('_') and not isinstance(value, _ModuleType)]
+__all__ += _elements.__all__
+
+
+def __getattr__(name):
+    if name in _elements.__all__:
+        value = getattr(_elements, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_elements.__all__))
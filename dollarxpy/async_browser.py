@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import ssl
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from dollarxpy.npath import NPath
+from dollarxpy.operations import OperationFailed
+from dollarxpy.queries import EXTRACT_SCRIPT, WAIT_SCRIPT, WITHIN_SCRIPT, Query, batch_call, batch_results, \
+    extract_arguments, occurrences_result, wait_chunk, wait_interrupted, wait_query, within_arguments, within_results
+from dollarxpy.result_cache import ResultCache
+
+# Browser operations for asyncio: the W3C WebDriver protocol spoken over asyncio streams, so one event loop
+# drives any number of sessions without a thread per session. Each session keeps one http connection open;
+# its commands are sent one at a time, as webdriver runs them in order anyway.
+
+_ELEMENT_KEY = 'element-6066-11e4-a23f-4fd9ac6dc74b'
+_DEFAULT_CAPABILITIES = {'alwaysMatch': {'browserName': 'chrome'}}
+
+
+#########################################
+# http
+
+class _Connection:
+    __slots__ = ('host', 'port', 'tls', 'reader', 'writer', 'lock')
+
+    def __init__(self, host: str, port: int, tls: bool):
+        self.host, self.port, self.tls = host, port, tls
+        self.reader = self.writer = None
+        self.lock = asyncio.Lock()
+
+    async def _open(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.tls else None)
+
+    async def close(self):
+        writer, self.reader, self.writer = self.writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _read_body(self, headers: dict) -> bytes:
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # the trailer fields, if any, up to the empty line that ends the response
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append((await self.reader.readexactly(size + 2))[:-2])
+        length = headers.get('content-length')
+        if length is not None:
+            return await self.reader.readexactly(int(length))
+        body = await self.reader.read()
+        await self.close()
+        return body
+
+    async def _send(self, request: bytes) -> bytes:
+        self.writer.write(request)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("the connection was closed")
+        return status_line
+
+    async def _receive(self, status_line: bytes):
+        try:
+            status = int(status_line.split()[1])
+        except (ValueError, IndexError):
+            raise ValueError(f"malformed status line {status_line[:80]!r}") from None
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = await self._read_body(headers)
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, body
+
+    async def request(self, method: str, path: str, payload=None):
+        async with self.lock:
+            return await self._request(method, path, payload)
+
+    async def _request(self, method: str, path: str, payload=None):
+        body = b'' if payload is None else json.dumps(payload).encode()
+        request = (f'{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+                   f'Content-Type: application/json; charset=utf-8\r\nContent-Length: {len(body)}\r\n'
+                   f'Connection: keep-alive\r\n\r\n').encode() + body
+        reused = self.writer is not None
+        if not reused:
+            await self._open()
+        # a command interrupted after its request was sent, even by a cancellation, would leave its response to
+        # the next one: the connection is closed instead
+        try:
+            try:
+                status_line = await self._send(request)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # the server dropped the idle connection before answering, send again on a new one; once any of
+                # the response was read the command may have run, and is not sent again
+                await self.close()
+                await self._open()
+                status_line = await self._send(request)
+            return await self._receive(status_line)
+        except BaseException:
+            await self.close()
+            raise
+
+
+def _connection(url: str):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError(f"webdriver url: Expected http or https, got '{url}'")
+    tls = parts.scheme == 'https'
+    return _Connection(parts.hostname, parts.port or (443 if tls else 80), tls), parts.path.rstrip('/')
+
+
+# an error response of the webdriver, with its error code, like 'no such element', and message
+class WebDriverError(OperationFailed):
+    def __init__(self, command: str, error: str, message: str):
+        super().__init__(f"{command}: {error}: {message}")
+        self.error = error
+        self.message = message
+
+
+async def _command(connection: _Connection, method: str, path: str, payload=None):
+    try:
+        status, body = await connection.request(method, path, payload)
+    except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+        raise OperationFailed(f"webdriver {method} {path} failed: {e}") from e
+    try:
+        value = json.loads(body).get('value') if body else None
+    except ValueError as e:
+        raise OperationFailed(f"webdriver {method} {path}: invalid response (status {status})") from e
+    if status >= 400:
+        error = value if isinstance(value, dict) else {}
+        raise WebDriverError(f"webdriver {method} {path}", str(error.get('error', status)),
+                             error.get('message') or '')
+    return value
+
+
+#########################################
+# sessions and elements
+
+class AsyncSession:
+    __slots__ = ('connection', 'prefix', 'session_id')
+
+    def __init__(self, connection: _Connection, prefix: str, session_id: str):
+        self.connection = connection
+        self.prefix = prefix
+        self.session_id = session_id
+
+    @classmethod
+    async def start(cls, url: str, capabilities: Optional[dict] = None) -> AsyncSession:
+        connection, prefix = _connection(url)
+        try:
+            value = await _command(connection, 'POST', f'{prefix}/session',
+                                   {'capabilities': capabilities or _DEFAULT_CAPABILITIES})
+        except BaseException:
+            await connection.close()
+            raise
+        return cls(connection, f'{prefix}/session/{value["sessionId"]}', value['sessionId'])
+
+    async def command(self, method: str, path: str = '', payload=None):
+        return await _command(self.connection, method, self.prefix + path, payload)
+
+    async def execute_script(self, script: str, *args):
+        return _elements_in(self, await self.command('POST', '/execute/sync',
+                                                     {'script': script, 'args': _references_in(list(args))}))
+
+    async def execute_async_script(self, script: str, *args):
+        return _elements_in(self, await self.command('POST', '/execute/async',
+                                                     {'script': script, 'args': _references_in(list(args))}))
+
+    async def get(self, url: str):
+        await self.command('POST', '/url', {'url': url})
+
+    async def quit(self):
+        try:
+            await self.command('DELETE')
+        finally:
+            await self.connection.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.quit()
+
+
+class AsyncElement:
+    __slots__ = ('session', 'element_id')
+
+    def __init__(self, session: AsyncSession, element_id: str):
+        self.session = session
+        self.element_id = element_id
+
+    async def click(self):
+        await self.session.command('POST', f'/element/{self.element_id}/click', {})
+
+    async def get_text(self) -> str:
+        return await self.session.command('GET', f'/element/{self.element_id}/text')
+
+    def __eq__(self, other):
+        return isinstance(other, AsyncElement) and self.element_id == other.element_id
+
+    def __hash__(self):
+        return hash(self.element_id)
+
+    def __repr__(self):
+        return f"<AsyncElement {self.element_id}>"
+
+
+def _elements_in(session: AsyncSession, value):
+    if isinstance(value, list):
+        return [_elements_in(session, v) for v in value]
+    if isinstance(value, dict):
+        element_id = value.get(_ELEMENT_KEY)
+        if element_id is not None and len(value) == 1:
+            return AsyncElement(session, element_id)
+        return {k: _elements_in(session, v) for k, v in value.items()}
+    return value
+
+
+def _references_in(value):
+    if isinstance(value, AsyncElement):
+        return {_ELEMENT_KEY: value.element_id}
+    if isinstance(value, (list, tuple)):
+        return [_references_in(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _references_in(v) for k, v in value.items()}
+    return value
+
+
+#########################################
+# browser
+
+# The operations of Browser, sending the same scripts and arguments.
+class AsyncBrowser:
+    __slots__ = ('session', 'cache', '_version')
+
+    def __init__(self, session: AsyncSession, cache: Optional[ResultCache] = None):
+        self.session = session
+        self.cache = cache
+        self._version = None
+
+    @classmethod
+    async def start(cls, url: str, capabilities: Optional[dict] = None,
+                    cache: Optional[ResultCache] = None) -> AsyncBrowser:
+        return cls(await AsyncSession.start(url, capabilities), cache)
+
+    async def _execute(self, script: str, arguments: list, failure: str):
+        try:
+            return await self.session.execute_script(script, *arguments)
+        except OperationFailed as e:
+            raise OperationFailed(f"{failure}: {e}") from e
+
+    async def _evaluate_paths(self, kind: str, paths: Sequence[Query]) -> list:
+        script, arguments = batch_call(kind, paths, self.cache, self._version)
+        response = await self._execute(script, arguments, f"failed to evaluate {len(paths)} xpath queries")
+        self._version, results = batch_results(kind, paths, self.cache, self._version, response)
+        return results
+
+    async def count_all(self, paths: Sequence[Query]) -> List[int]:
+        return await self._evaluate_paths('count', paths)
+
+    async def exists_all(self, paths: Sequence[Query]) -> List[bool]:
+        return await self._evaluate_paths('exists', paths)
+
+    async def find_all_of(self, paths: Sequence[Query]) -> List[list]:
+        return await self._evaluate_paths('elements', paths)
+
+    async def find_all(self, path: Query) -> list:
+        return (await self.find_all_of([path]))[0]
+
+    async def find_first(self, path: Query) -> Optional[AsyncElement]:
+        found = await self.find_all(path)
+        return found[0] if found else None
+
+    async def find(self, path: Query) -> AsyncElement:
+        found = await self.find_first(path)
+        if found is None:
+            raise OperationFailed(f"could not find {path}")
+        return found
+
+    async def _evaluate_within(self, kind: str, contexts: Sequence, path: Query) -> list:
+        response = await self._execute(WITHIN_SCRIPT, within_arguments(kind, contexts, path),
+                                       f"failed to evaluate {path} inside {len(contexts)} elements")
+        return within_results(kind, path, response)
+
+    async def find_all_within(self, contexts: Sequence, path: Query) -> List[list]:
+        return await self._evaluate_within('elements', contexts, path)
+
+    async def count_within(self, contexts: Sequence, path: Query) -> List[int]:
+        return await self._evaluate_within('count', contexts, path)
+
+    async def exists_within(self, contexts: Sequence, path: Query) -> List[bool]:
+        return await self._evaluate_within('exists', contexts, path)
+
+    async def count(self, path: Query) -> int:
+        return (await self.count_all([path]))[0]
+
+    async def exists(self, path: Query) -> bool:
+        return (await self.exists_all([path]))[0]
+
+    async def assert_occurrences(self, path: NPath) -> int:
+        return occurrences_result(path, await self.count(path))
+
+    async def extract(self, path: Query, attributes: Sequence[str] = (), text: bool = True,
+                      aggregated_text: bool = True) -> Dict[str, list]:
+        return await self._execute(EXTRACT_SCRIPT, extract_arguments(path, attributes, text, aggregated_text),
+                                   f"failed to extract from {path}")
+
+    async def _wait(self, path: Query, present: bool, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        query = wait_query(path, present)
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                if await self.session.execute_async_script(WAIT_SCRIPT, query, wait_chunk(remaining)):
+                    return True
+            except WebDriverError as e:
+                if not wait_interrupted(e.error, e.message):
+                    raise OperationFailed(f"failed to wait for {path}: {e}") from e
+                await asyncio.sleep(0.1)
+            if loop.time() >= deadline:
+                return False
+
+    async def wait_until(self, path: Query, timeout: float = 10):
+        if not await self._wait(path, True, timeout):
+            raise OperationFailed(f"{path} was not found within {timeout}s")
+
+    async def wait_until_gone(self, path: Query, timeout: float = 10):
+        if not await self._wait(path, False, timeout):
+            raise OperationFailed(f"{path} was still found after {timeout}s")
+
+    async def click(self, path: Query):
+        await (await self.find(path)).click()
+
+    async def get_text(self, path: Query) -> str:
+        return await (await self.find(path)).get_text()
+
+    async def quit(self):
+        await self.session.quit()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.quit()
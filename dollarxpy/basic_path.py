@@ -1,75 +1,112 @@
-from typedpy import ImmutableStructure, String, Array, Integer, Tuple
-from selenium import webdriver
 from __future__ import annotations
 
+from enum import Enum
 
-from dollarxpy.element_property import ElementProperty
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.immutable import ImmutableStructure, InternedStructure, String, Integer, Tuple, InstanceOf
 from dollarxpy.path_utils import has_heirarchy, opposite_relation, transform_xpath_to_correct_axis
 import dollarxpy.xpath_utils as xpath_utils
 
-class BasicPath(ImmutableStructure):
+
+class PathKind(Enum):
+    ELEMENT = "element"
+    PREDICATE = "predicate"
+    RELATION = "relation"
+    OCCURRENCE = "occurrence"
+    UNION = "union"
+    NEGATION = "negation"
+    TOP_LEVEL = "top_level"
+
+
+_GLOBAL_OCCURRENCE = "global"
+_CHILD_OCCURRENCE = "child"
+
+
+def _properties_xpath(props) -> str:
+    return ''.join([f'[{x.to_xpath()}]' for x in props])
+
+
+class BasicPath(InternedStructure):
     inside_xpath = String
     xpath = String(minLength=1)
     alternate_xpath = String
     xpath_explanation = String
-    described_by = String
-    element_properties = Tuple[ElementProperty]
+    description = String
+    element_properties = Tuple(ElementProperty, default=())
+    kind = InstanceOf(PathKind, default=PathKind.ELEMENT)
+    operands = Tuple(default=())
+    relation = String
+    relation_text = String
+    n = Integer(minimum=0)
+
+    __slots__ = ('_xpath_cache', '_alternate_xpath_cache', '_without_inside_cache', '_str_cache',
+                 '_selector_cache', '_optimized_cache')
 
-    _required = ['xpath']
+    def __validate__(self):
+        if self.kind is PathKind.ELEMENT and self.xpath is None:
+            raise TypeError("BasicPath: missing a required argument: 'xpath'")
+        for operand in self.operands or ():
+            if not isinstance(operand, BasicPath):
+                raise TypeError("operands: Expected an instance of BasicPath")
 
     def or_(self, other: BasicPath) -> BasicPath:
         self._verify_relationship_between_elements(other)
-        return BasicPath(xpath = f'*[self::{transform_xpath_to_correct_axis(self)}] | [self::{transform_xpath_to_correct_axis(path)}]')
+        return BasicPath(kind=PathKind.UNION, operands=(self, other))
 
     def and_(self, *props) -> BasicPath:
-        return self.that(props)
+        return self.that(*props)
 
     def described_by(self, description) -> BasicPath:
-        return BasicPath(xpath=self.xpath,
-                         inside_path=self.inside_path,
-                         alternate_path=self.alternate_xpath,
-                         described_by=description,
-                         element_properties=self.element_properties)
+        return self._replace(description=description)
 
     def _verify_relationship_between_elements(self, other: BasicPath):
-        if not self.get_xpath() or not other.get_xpath():
+        if not isinstance(other, BasicPath):
             raise ValueError()
 
     def with_global_index(self, n: int) -> BasicPath:
-        return BasicPath.occurrence_number(n + 1).of(self)
+        return occurrence_number(n + 1).of(self)
 
     def that(self, *props) -> BasicPath:
-        if (self.described_by):
-            return BasicPath(xpath=self._get_xpath_without_inside_claus(),
-                             inside_xpath=self.inside_xpath,
-                             element_properties=tuple(props),
-                             alternate_xpath=self.alternate_xpath,
-                             xpath_explanation=self.described_by)
+        if self.kind is PathKind.PREDICATE and not self.description:
+            return BasicPath(kind=PathKind.PREDICATE,
+                             operands=self.operands,
+                             element_properties=(*self.element_properties, *props))
         else:
-            return BasicPath(xpath=self.xpath,
-                             inside_xpath=self.inside_xpath,
-                             element_properties=(*self.element_properties, *props),
-                             alternate_xpath=self.alternate_xpath,
-                             xpath_explanation=self.described_by)
+            return BasicPath(kind=PathKind.PREDICATE,
+                             operands=(self,),
+                             element_properties=props)
 
     def get_xpath(self) -> String:
-        proccessed_xpath = (self.inside_xpath + '//' if self.inside_xpath else "") + self.xpath
-        props = ''.join([f'[{x.to_xpath()}]' for x in self.element_properties])
-        return proccessed_xpath + props
+        rendered = self._xpath_cache
+        if rendered is None:
+            rendered = _xpath_renderers[self.kind](self)
+            object.__setattr__(self, '_xpath_cache', rendered)
+        return rendered
 
     def get_alternate_xpath(self) -> String:
-        props = ''.join([f'[{x.to_xpath()}]' for x in self.element_properties])
-        return (self.alternate_xpath or "*") + props
-
+        rendered = self._alternate_xpath_cache
+        if rendered is None:
+            rendered = _alternate_xpath_renderers[self.kind](self)
+            object.__setattr__(self, '_alternate_xpath_cache', rendered)
+        return rendered
 
     def _get_xpath_without_inside_claus(self):
-        props = ''.join([f'[{x.to_xpath()}]' for x in self.element_properties])
-        return (self.xpath or "*") + props
+        rendered = self._without_inside_cache
+        if rendered is None:
+            rendered = _without_inside_renderers[self.kind](self)
+            object.__setattr__(self, '_without_inside_cache', rendered)
+        return rendered
+
+    # xpath vs alternate xpath, a cost estimate and, given a document/Snapshot/Browser, the measured time
+    def explain(self, target=None):
+        from dollarxpy.explain import explain
+        return explain(self, target)
 
+    def _get_inside_xpath(self):
+        return self.operands[0]._get_inside_xpath() if self.kind is PathKind.PREDICATE else self.inside_xpath
 
     def inside_top_level(self) -> BasicPath:
-        return BasicPath(xpath = xpath_utils.inside_top_level(self.get_xpath()),
-                         described_by = str(self))
+        return BasicPath(kind=PathKind.TOP_LEVEL, operands=(self,))
 
 
     def after_sibling(self, path: BasicPath) -> BasicPath:
@@ -86,7 +123,7 @@ class BasicPath(ImmutableStructure):
         return self._create_with_relation(path, "preceding", human_readable_relation="before")
 
     def child_of(self, path: BasicPath) -> BasicPath:
-        return self._create_with_relation(path, "parent")
+        return self._create_with_relation(path, "child", human_readable_relation="child of")
 
     def containing(self, path: BasicPath) -> BasicPath:
         return self.ancestor_of(path)
@@ -102,111 +139,168 @@ class BasicPath(ImmutableStructure):
         return self._create_with_relation(path, "descendant")
 
     def with_class(self, css_class):
-        return self._create_new_with_additional_property()
-
-    def _create_new_with_additional_property(self, prop):
-        if self.described_by:
-            return BasicPath(xpath = self.get_xpath(),
-                             alternate_xpath = self.get_alternate_xpath(),
-                             inside_xpath = self.inside_xpath,
-                             element_properties = (self.prop,),
-                             xpath_explanation = self.described_by)
-        else:
-            new_props = *self.element_properties, prop
-            return BasicPath(xpath = self.xpath,
-                             alternate_xpath = self.get_alternate_xpath(),
-                             element_properties = new_props,
-                             inside_xpath = self.inside_xpath,
-                             xpath_explanation = self.xpath_explanation)
-
+        return self.that(ElementProperty(kind=PropertyKind.CLASS, args=(css_class,)))
 
     def _create_with_relation(self, path: BasicPath, xpath_relation: str, human_readable_relation: str = None):
         self._verify_relationship_between_elements(path)
-        my_xpath = self.get_xpath()
-        is_inside = bool(self.inside_xpath)
-        processed_xpath = f'{self._get_xpath_without_inside_claus()}[ancestor::{self.inside_xpath}]' if is_inside else my_xpath
-        new_alternate_xpath = self.get_alternate_xpath() + \
-                              f'[{opposite_relation(xpath_relation)}::{path.get_alternate_xpath()}]'
-        use_alternate_xpath = has_heirarchy(processed_xpath)
-        new_xpath  = new_alternate_xpath if use_alternate_xpath else \
-            f'{path.get_xpath()}/{xpath_relation}::{processed_xpath}'
-        relation_as_text = human_readable_relation if human_readable_relation else xpath_relation
-        return BasicPath(xpath = new_xpath,
-                         alternate_xpath = new_alternate_xpath,
-                         xpath_explanation = f'{str(self)},{relation_as_text} {_wrap_if_needed(path)}')
+        return BasicPath(kind=PathKind.RELATION,
+                         operands=(self, path),
+                         relation=xpath_relation,
+                         relation_text=human_readable_relation)
 
 
     def _get_xpath_explanation_for_str(self) -> str:
-        return self.xpath_explanation if self.xpath_explanation else f"xpath: \"{xpath}\""
+        if self.kind is PathKind.PREDICATE:
+            return str(self.operands[0])
+        return self.xpath_explanation if self.xpath_explanation else f"xpath: \"{self.xpath}\""
 
     def _get_properties_to_string_for_length1(self):
         first_prop_description = str(self.element_properties[0])
         that_maybe = "that " if (first_prop_description.startswith("has") or first_prop_description.startswith("is")) else ""
         return that_maybe + first_prop_description
 
-    def _get_properties_to_string_for_length_larger_than_2(self):
+    def _get_properties_to_string_for_length_larger_than_2(self, xpath: str):
         props_as_list: str = ", ".join([str(p) for p in self.element_properties])
-        if (self.xpath_explanation and "with properties" in self.xpath_explanation) or self.element_properties==1:
+        if "with properties" in xpath or len(self.element_properties)==1:
             return f"and {props_as_list}"
         else:
             return f"that [{props_as_list}]"
 
+    def _to_string_with_properties(self) -> str:
+        xpath = self._get_xpath_explanation_for_str()
 
-    def __str__(self):
-        if self.described_by and self.described_by != self.xpath_explanation:
-            return self.described_by
-        else:
-            xpath = self._get_xpath_explanation_for_str()
-
-            use_length_1 = self.element_properties and len(self.element_properties)==1 and (", " not in xpath or xpath==self.described_by)
-            use_that_and = self.element_properties and len(self.element_properties==2) and " " not in xpath
-            use_larger_format_than_2 = (self.element_properties and len(self.element_properties)>1) or \
-                                       (" " in xpath and self.element_properties)
-            props = self._get_properties_to_string_for_length1() if use_length_1 else \
-                f"that {self.elementProperties[0]}, and {self.element_properties[-1]}" if use_that_and else \
-                    self._get_properties_to_string_for_length_larger_than_2() if use_larger_format_than_2 else ""
-
-
-
+        use_length_1 = self.element_properties and len(self.element_properties)==1 and (", " not in xpath or xpath==self.description)
+        use_that_and = self.element_properties and len(self.element_properties)==2 and " " not in xpath
+        use_larger_format_than_2 = (self.element_properties and len(self.element_properties)>1) or \
+                                   (" " in xpath and self.element_properties)
+        props = self._get_properties_to_string_for_length1() if use_length_1 else \
+            f"that {self.element_properties[0]}, and {self.element_properties[-1]}" if use_that_and else \
+                self._get_properties_to_string_for_length_larger_than_2(xpath) if use_larger_format_than_2 else ""
+        return f"{xpath}, {props}" if props else xpath
 
+    def __str__(self):
+        rendered = self._str_cache
+        if rendered is None:
+            if self.description and self.description != self.xpath_explanation:
+                rendered = self.description
+            else:
+                rendered = _str_renderers[self.kind](self)
+            object.__setattr__(self, '_str_cache', rendered)
+        return rendered
 
 
 class ChildNumber(ImmutableStructure):
     n = Integer(minimum=1)
 
     def of_type(self, path: BasicPath) -> BasicPath:
-        new_xpath = f'{path.get_xpath()}[{self.n}]'
-        alternate_xpath = f'{path.get_alternate_xpath()}[{self.n}]'
-        return BasicPath(xpath=new_xpath, alternate_xpath=alternate_xpath,
-                         xpath_explanation=f'child number {n} of type {path}')
+        return BasicPath(kind=PathKind.OCCURRENCE, operands=(path,), n=self.n, relation=_CHILD_OCCURRENCE)
 
 
 class GlobalOccurrenceNumber(ImmutableStructure):
     n = Integer(minimum=0)
 
     def of(self, path: BasicPath) -> BasicPath:
-        prefix = 'the first occurrence of ' if self.n == 1 \
-            else 'the last occurrence of ' if self.n == 0 \
-            else f'occurrence number {self.n}'
-        path_st = path.__str__()
-        wrapped = f'({path_st})' if " " in path_st else path_st
-        index = 'last()' if self.n == 0 else f'{self.n}'
-        xpath_prefix = '(' if path.get_xpath().startswidth('(') else '(//'
-        new_xpath = f'{xpath_prefix}{path.get_xpath()})[{index}]'
-        new_alternate_xpath = f'{xpath_prefix}{path.get_alternative_xpath()})[{index}]'
-        return BasicPath(xpath=new_xpath,
-                         alternate_xpath=new_alternate_xpath,
-                         xpath_explanation=prefix + wrapped)
+        return BasicPath(kind=PathKind.OCCURRENCE, operands=(path,), n=self.n, relation=_GLOBAL_OCCURRENCE)
+
+
+#########################################
+# rendering, done lazily on first use and cached on the node
+
+def _element_alternate_xpath(path: BasicPath) -> str:
+    if path.alternate_xpath:
+        return path.alternate_xpath
+    return "*" if path.xpath == "*" or has_heirarchy(path.xpath) else f"*[self::{path.xpath}]"
+
+
+def _relation_xpath(path: BasicPath) -> str:
+    subject, target = path.operands
+    inside_xpath = subject._get_inside_xpath()
+    processed_xpath = f'{subject._get_xpath_without_inside_claus()}[ancestor::{inside_xpath}]' if inside_xpath \
+        else subject.get_xpath()
+    if has_heirarchy(processed_xpath):
+        return path.get_alternate_xpath()
+    return f'{target.get_xpath()}/{path.relation}::{processed_xpath}'
+
+
+def _relation_alternate_xpath(path: BasicPath) -> str:
+    subject, target = path.operands
+    return subject.get_alternate_xpath() + \
+        f'[{opposite_relation(path.relation)}::{target.get_alternate_xpath()}]'
+
+
+def _relation_str(path: BasicPath) -> str:
+    subject, target = path.operands
+    relation_as_text = path.relation_text if path.relation_text else path.relation
+    return f'{subject}, {relation_as_text} {_wrap_if_needed(target)}'
+
+
+def _occurrence_xpath(path: BasicPath, render) -> str:
+    operand = path.operands[0]
+    if path.relation == _CHILD_OCCURRENCE:
+        return f'{render(operand)}[{path.n}]'
+    index = 'last()' if path.n == 0 else f'{path.n}'
+    xpath_prefix = '(' if operand.get_xpath().startswith('(') else '(//'
+    return f'{xpath_prefix}{render(operand)})[{index}]'
+
+
+def _occurrence_str(path: BasicPath) -> str:
+    operand = path.operands[0]
+    if path.relation == _CHILD_OCCURRENCE:
+        return f'child number {path.n} of type {operand}'
+    prefix = 'the first occurrence of ' if path.n == 1 \
+        else 'the last occurrence of ' if path.n == 0 \
+        else f'occurrence number {path.n} of '
+    return prefix + _wrap_if_needed(operand)
+
+
+def _union_xpath(path: BasicPath) -> str:
+    left, right = path.operands
+    return f'*[self::{transform_xpath_to_correct_axis(left)} | self::{transform_xpath_to_correct_axis(right)}]'
+
+
+_xpath_renderers = {
+    PathKind.ELEMENT: lambda p: (p.inside_xpath + '//' if p.inside_xpath else "") + p.xpath +
+                                _properties_xpath(p.element_properties),
+    PathKind.PREDICATE: lambda p: p.operands[0].get_xpath() + _properties_xpath(p.element_properties),
+    PathKind.RELATION: _relation_xpath,
+    PathKind.OCCURRENCE: lambda p: _occurrence_xpath(p, BasicPath.get_xpath),
+    PathKind.UNION: _union_xpath,
+    PathKind.NEGATION: lambda p: f"*[not(self::{transform_xpath_to_correct_axis(p.operands[0])})]",
+    PathKind.TOP_LEVEL: lambda p: xpath_utils.inside_top_level(p.operands[0].get_xpath()),
+}
+
+_alternate_xpath_renderers = {
+    PathKind.ELEMENT: lambda p: _element_alternate_xpath(p) + _properties_xpath(p.element_properties),
+    PathKind.PREDICATE: lambda p: p.operands[0].get_alternate_xpath() + _properties_xpath(p.element_properties),
+    PathKind.RELATION: _relation_alternate_xpath,
+    PathKind.OCCURRENCE: lambda p: _occurrence_xpath(p, BasicPath.get_alternate_xpath),
+    PathKind.UNION: _union_xpath,
+    PathKind.NEGATION: lambda p: f"*[not(self::{p.operands[0].get_alternate_xpath()})]",
+    PathKind.TOP_LEVEL: lambda p: p.operands[0].get_alternate_xpath(),
+}
+
+_without_inside_renderers = {
+    **_xpath_renderers,
+    PathKind.ELEMENT: lambda p: (p.xpath or "*") + _properties_xpath(p.element_properties),
+    PathKind.PREDICATE: lambda p: p.operands[0]._get_xpath_without_inside_claus() +
+                                  _properties_xpath(p.element_properties),
+}
+
+_str_renderers = {
+    PathKind.ELEMENT: BasicPath._to_string_with_properties,
+    PathKind.PREDICATE: BasicPath._to_string_with_properties,
+    PathKind.RELATION: _relation_str,
+    PathKind.OCCURRENCE: _occurrence_str,
+    PathKind.UNION: lambda p: f'{p.operands[0]} or {p.operands[1]}',
+    PathKind.NEGATION: lambda p: f"anything except ({p.operands[0]})",
+    PathKind.TOP_LEVEL: lambda p: str(p.operands[0]),
+}
 
 
 #  functions
 
 def not_(path: BasicPath):
-    return BasicPath(
-        xpath = f"*[not(self::{transform_xpath_to_correct_axis(path)})]",
-        alternate_xpath = f"*[not(self::{path.get_alternate_xpath()})]",
-        xpath_explanation = f"anything except ({path})"
-    )
+    return BasicPath(kind=PathKind.NEGATION, operands=(path,))
 
 
 def _wrap_if_needed(path:BasicPath) -> str:
@@ -218,26 +312,22 @@ def custom_element(xpath):
     return BasicPath(xpath=xpath, xpath_explanation=xpath)
 
 
-def child_number(n: int) -> BasicPath.ChildNumber:
-    return BasicPath.ChildNumber(n)
+def child_number(n: int) -> ChildNumber:
+    return ChildNumber(n=n)
 
 
-def occurrence_number(n: int) -> BasicPath.GlobalOccurrenceNumber:
-    return BasicPath.GlobalOccurrenceNumber(n)
+def occurrence_number(n: int) -> GlobalOccurrenceNumber:
+    return GlobalOccurrenceNumber(n=n)
 
 
 def first_occurrence_of(path: BasicPath):
-    return path.occurrence_number(0)
+    return occurrence_number(1).of(path)
 
 
 def last_occurrence_of(path: BasicPath):
-    return path.occurrence_number(-1)
+    return occurrence_number(0).of(path)
 
 def anything_except(path: BasicPath) -> BasicPath:
-    transformed_xpath = transform_xpath_to_correct_axis(path)
-    return BasicPath(xpath = f"*[not(self::{transformed_xpath})]",
-                     alternate_xpath = f"*[not(self::{path.get_alternate_xpath()})]",
-                     xpath_explanation = f"anything except ({str(path)})"
-                     )
+    return not_(path)
 
 #########################################
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+from selenium.common.exceptions import JavascriptException, TimeoutException, WebDriverException
+
+from dollarxpy.npath import NPath
+from dollarxpy.operations import OperationFailed
+from dollarxpy.queries import EXTRACT_SCRIPT, WAIT_SCRIPT, WITHIN_SCRIPT, Query, batch_call, batch_results, \
+    extract_arguments, occurrences_result, wait_chunk, wait_interrupted, wait_query, within_arguments, within_results
+from dollarxpy.result_cache import ResultCache
+
+
+# With a ResultCache, the results of count_all, exists_all and find_all_of are kept under the version of the
+# document, read by the same script: a batch whose results are all kept still costs a round trip, which checks
+# the version and evaluates nothing.
+class Browser:
+    __slots__ = ('driver', 'cache', '_version')
+
+    def __init__(self, driver, cache: Optional[ResultCache] = None):
+        self.driver = driver
+        self.cache = cache
+        self._version = None
+
+    def _execute(self, script: str, arguments: list, failure: str):
+        try:
+            return self.driver.execute_script(script, *arguments)
+        except WebDriverException as e:
+            raise OperationFailed(f"{failure}: {e.msg}") from e
+
+    def _evaluate_paths(self, kind: str, paths: Sequence[Query]) -> list:
+        script, arguments = batch_call(kind, paths, self.cache, self._version)
+        response = self._execute(script, arguments, f"failed to evaluate {len(paths)} xpath queries")
+        self._version, results = batch_results(kind, paths, self.cache, self._version, response)
+        return results
+
+    def count_all(self, paths: Sequence[Query]) -> List[int]:
+        return self._evaluate_paths('count', paths)
+
+    def exists_all(self, paths: Sequence[Query]) -> List[bool]:
+        return self._evaluate_paths('exists', paths)
+
+    # sub-paths shared by several of the paths are evaluated once, in the same script; with a cache, only the
+    # paths it has no results for are evaluated, one by one
+    def find_all_of(self, paths: Sequence[Query]) -> List[list]:
+        return self._evaluate_paths('elements', paths)
+
+    def find_all(self, path: Query) -> list:
+        return self.find_all_of([path])[0]
+
+    def find_first(self, path: Query):
+        found = self.find_all(path)
+        return found[0] if found else None
+
+    # one query inside each of the elements, in one script: .//x from every element, as Scope does offline
+    def _evaluate_within(self, kind: str, contexts: Sequence, path: Query) -> list:
+        response = self._execute(WITHIN_SCRIPT, within_arguments(kind, contexts, path),
+                                 f"failed to evaluate {path} inside {len(contexts)} elements")
+        return within_results(kind, path, response)
+
+    def find_all_within(self, contexts: Sequence, path: Query) -> List[list]:
+        return self._evaluate_within('elements', contexts, path)
+
+    def count_within(self, contexts: Sequence, path: Query) -> List[int]:
+        return self._evaluate_within('count', contexts, path)
+
+    def exists_within(self, contexts: Sequence, path: Query) -> List[bool]:
+        return self._evaluate_within('exists', contexts, path)
+
+    def count(self, path: Query) -> int:
+        return self.count_all([path])[0]
+
+    def exists(self, path: Query) -> bool:
+        return self.exists_all([path])[0]
+
+    # only the number crosses over, not the elements
+    def assert_occurrences(self, path: NPath) -> int:
+        return occurrences_result(path, self.count(path))
+
+    # one script call for all the fields of all the matches
+    def extract(self, path: Query, attributes: Sequence[str] = (), text: bool = True,
+                aggregated_text: bool = True) -> Dict[str, list]:
+        return self._execute(EXTRACT_SCRIPT, extract_arguments(path, attributes, text, aggregated_text),
+                             f"failed to extract from {path}")
+
+    def _wait(self, path: Query, present: bool, timeout: float) -> bool:
+        query = wait_query(path, present)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if self.driver.execute_async_script(WAIT_SCRIPT, query, wait_chunk(remaining)):
+                    return True
+            except WebDriverException as e:
+                error = 'script timeout' if isinstance(e, TimeoutException) else \
+                    'javascript error' if isinstance(e, JavascriptException) else None
+                if not wait_interrupted(error, e.msg or ''):
+                    raise OperationFailed(f"failed to wait for {path}: {e.msg}") from e
+                time.sleep(0.1)
+            if time.monotonic() >= deadline:
+                return False
+
+    def wait_until(self, path: Query, timeout: float = 10):
+        if not self._wait(path, True, timeout):
+            raise OperationFailed(f"{path} was not found within {timeout}s")
+
+    def wait_until_gone(self, path: Query, timeout: float = 10):
+        if not self._wait(path, False, timeout):
+            raise OperationFailed(f"{path} was still found after {timeout}s")
+
+
+#########################################
+# session pool
+
+# run before navigating away, storage of about:blank is not accessible
+_RESET_STORAGE_SCRIPT = """
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+_HEALTH_CHECK_SCRIPT = "return document.readyState"
+
+
+class _Session:
+    __slots__ = ('driver', 'uses')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except WebDriverException:
+        pass
+
+
+# Starting a webdriver session costs seconds, so sessions are kept and handed out again, with their cookies,
+# storage, extra windows and page cleared in between. At most `size` sessions exist at a time; checkout waits
+# for one to be checked in when all of them are in use.
+class SessionPool:
+    def __init__(self, factory: Callable[[], object], size: int = 1, max_uses: Optional[int] = None,
+                 reset_url: str = 'about:blank', checkout_timeout: Optional[float] = None):
+        if size < 1:
+            raise ValueError("pool size: Expected a minimum of 1")
+        if max_uses is not None and max_uses < 1:
+            raise ValueError("max uses: Expected a minimum of 1")
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.reset_url = reset_url
+        self.checkout_timeout = checkout_timeout
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._leased: Dict[Browser, _Session] = {}
+        self._started = 0
+        self._closed = False
+
+    def _start(self) -> _Session:
+        try:
+            driver = self.factory()
+        except WebDriverException as e:
+            raise OperationFailed(f"failed to start a webdriver session: {e.msg}") from e
+        return _Session(driver)
+
+    def _discard(self, session: Optional[_Session]):
+        if session is not None:
+            _quit(session.driver)
+        with self._condition:
+            self._started -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        try:
+            driver.execute_script(_HEALTH_CHECK_SCRIPT)
+            return True
+        except WebDriverException:
+            return False
+
+    def reset(self, driver):
+        handles = driver.window_handles
+        if not handles:
+            raise WebDriverException("no window is left open")
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.delete_all_cookies()
+        driver.execute_script(_RESET_STORAGE_SCRIPT)
+        driver.get(self.reset_url)
+
+    def _reserve(self, timeout: Optional[float]) -> Optional[_Session]:
+        # an idle session, or None once a slot for starting a new one is reserved
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise OperationFailed("the session pool is closed")
+                if self._idle:
+                    return self._idle.popleft()
+                if self._started < self.size:
+                    self._started += 1
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise OperationFailed(f"no webdriver session was checked in within {timeout}s")
+                self._condition.wait(remaining)
+
+    def checkout(self, timeout: Optional[float] = None) -> Browser:
+        timeout = self.checkout_timeout if timeout is None else timeout
+        session = self._reserve(timeout)
+        while session is not None and not self.is_healthy(session.driver):
+            self._discard(session)
+            session = self._reserve(timeout)
+        if session is None:
+            try:
+                session = self._start()
+            except BaseException:
+                self._discard(None)
+                raise
+            if not self.is_healthy(session.driver):
+                self._discard(session)
+                raise OperationFailed("a new webdriver session failed its health check")
+        session.uses += 1
+        browser = Browser(session.driver)
+        with self._condition:
+            self._leased[browser] = session
+        return browser
+
+    # a session that cannot be reset is replaced by a new one on a later checkout, as is one checked in with
+    # discard=True or one used max_uses times
+    def checkin(self, browser: Browser, discard: bool = False):
+        with self._condition:
+            session = self._leased.pop(browser, None)
+        if session is None:
+            raise ValueError("the browser was not checked out of this pool")
+        if discard or self._closed or (self.max_uses is not None and session.uses >= self.max_uses):
+            self._discard(session)
+            return
+        try:
+            self.reset(session.driver)
+        except WebDriverException:
+            self._discard(session)
+            return
+        with self._condition:
+            if not self._closed:
+                self._idle.append(session)
+                self._condition.notify()
+                return
+        self._discard(session)
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None):
+        browser = self.checkout(timeout)
+        try:
+            yield browser
+        finally:
+            self.checkin(browser)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._condition.notify_all()
+        for session in idle:
+            self._discard(session)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
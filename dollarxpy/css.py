@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import re
+from enum import Enum
+from typing import Optional
+
+from dollarxpy.basic_path import BasicPath, PathKind
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.immutable import ImmutableStructure, String, InstanceOf
+from dollarxpy.optimizer import optimized_xpath
+
+_identifier = re.compile(r'^-?[A-Za-z_][A-Za-z0-9_-]*$')
+_tag_name = re.compile(r'^[A-Za-z][A-Za-z0-9-]*$')
+_whitespace = re.compile(r'\s')
+
+_combinators = {
+    "descendant": " ",
+    "child": " > ",
+    "following-sibling": " ~ ",
+}
+
+
+class SelectorStrategy(Enum):
+    CSS = "css"
+    XPATH = "xpath"
+
+
+class CompiledSelector(ImmutableStructure):
+    strategy = InstanceOf(SelectorStrategy)
+    selector = String(minLength=1)
+
+    _required = ['strategy', 'selector']
+
+    @property
+    def is_css(self) -> bool:
+        return self.strategy is SelectorStrategy.CSS
+
+
+def _quote(value) -> str:
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+# css splits the class attribute into tokens, while xpath looks for the whole name in it: an empty name, or one
+# with whitespace, is left to xpath
+def _class_selector(name: str) -> Optional[str]:
+    if not name or _whitespace.search(name):
+        return None
+    return f'.{name}' if _identifier.match(name) else f'[class~={_quote(name)}]'
+
+
+def _class_selectors(names, template: str = '{}') -> Optional[str]:
+    selectors = [_class_selector(name) for name in names]
+    return None if None in selectors else ''.join([template.format(s) for s in selectors])
+
+
+def _attribute_selector(name: str, value) -> Optional[str]:
+    if not _identifier.match(name):
+        return None
+    if name == "id" and _identifier.match(str(value)):
+        return f'#{value}'
+    return f'[{name}={_quote(value)}]'
+
+
+def _simple_property_css(prop: ElementProperty) -> Optional[str]:
+    if prop.xpath is not None:
+        return None
+    args = prop.args
+    if prop.kind is PropertyKind.CLASS:
+        return _class_selector(args[0])
+    if prop.kind is PropertyKind.CLASSES:
+        return _class_selectors(args)
+    if prop.kind is PropertyKind.CLASS_CONTAINING:
+        return f'[class*={_quote(args[0])}]'
+    if prop.kind is PropertyKind.ATTRIBUTE:
+        return _attribute_selector(*args)
+    if prop.kind is PropertyKind.LAST_SIBLING:
+        return ':last-child'
+    if prop.kind is PropertyKind.ONLY_CHILD:
+        return ':only-child'
+    if prop.kind is PropertyKind.NTH_SIBLING:
+        return f':nth-child({args[0] + 1})'
+    if prop.kind is PropertyKind.NTH_FROM_LAST_SIBLING:
+        return f':nth-last-child({args[0] + 1})'
+    return None
+
+
+def _property_css(prop: ElementProperty) -> Optional[str]:
+    if prop.kind is PropertyKind.NONE_OF_CLASSES and prop.xpath is None:
+        return _class_selectors(prop.args, ':not({})')
+    if prop.kind is PropertyKind.NOT and prop.xpath is None:
+        negated = prop.args[0]
+        simple = _simple_property_css(negated)
+        # css3 :not() only takes a single simple selector
+        if simple and negated.kind in (PropertyKind.CLASS, PropertyKind.ATTRIBUTE):
+            return f':not({simple})'
+        return None
+    return _simple_property_css(prop)
+
+
+def _properties_css(props) -> Optional[str]:
+    compiled = [_property_css(p) for p in props]
+    return None if None in compiled else ''.join(compiled)
+
+
+def _with_properties(base: Optional[str], props) -> Optional[str]:
+    compiled = _properties_css(props)
+    return None if base is None or compiled is None else base + compiled
+
+
+# a compound selector tests the element itself, without combinators
+def _compound_css(path: BasicPath) -> Optional[str]:
+    if path.kind is PathKind.ELEMENT:
+        if path.inside_xpath or not (path.xpath == '*' or _tag_name.match(path.xpath)):
+            return None
+        props = _properties_css(path.element_properties)
+        return None if props is None else path.xpath + props
+    if path.kind is PathKind.PREDICATE:
+        return _with_properties(_compound_css(path.operands[0]), path.element_properties)
+    if path.kind is PathKind.NEGATION:
+        operand = path.operands[0]
+        if operand.kind is PathKind.ELEMENT and not operand.element_properties and _tag_name.match(operand.xpath or ''):
+            return f'*:not({operand.xpath})'
+    return None
+
+
+def _complex_css(path: BasicPath) -> Optional[str]:
+    if path.kind is PathKind.RELATION:
+        combinator = _combinators.get(path.relation)
+        subject = _compound_css(path.operands[0])
+        target = _complex_css(path.operands[1])
+        if combinator is None or subject is None or target is None:
+            return None
+        return f'{target}{combinator}{subject}'
+    if path.kind is PathKind.PREDICATE:
+        # the properties apply to the rightmost compound, which is the subject
+        return _with_properties(_complex_css(path.operands[0]), path.element_properties)
+    if path.kind is PathKind.TOP_LEVEL:
+        return _complex_css(path.operands[0])
+    return _compound_css(path)
+
+
+def compile_css(path: BasicPath) -> Optional[str]:
+    if path.kind is PathKind.UNION:
+        operands = [compile_css(p) for p in path.operands]
+        return None if None in operands else ', '.join(operands)
+    return _complex_css(path)
+
+
+# kept on the path itself, where precompiled selectors (see serialization) are loaded as well
+def compile_selector(path: BasicPath) -> CompiledSelector:
+    compiled = path._selector_cache
+    if compiled is None:
+        compiled = _compile_selector(path)
+        object.__setattr__(path, '_selector_cache', compiled)
+    return compiled
+
+
+def _compile_selector(path: BasicPath) -> CompiledSelector:
+    css = compile_css(path)
+    if css is not None:
+        return CompiledSelector(strategy=SelectorStrategy.CSS, selector=css)
+    return CompiledSelector(strategy=SelectorStrategy.XPATH, selector=optimized_xpath(path))
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from lxml import etree
+
+from dollarxpy.basic_path import BasicPath, PathKind, _CHILD_OCCURRENCE
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.npath import NPath
+from dollarxpy.optimizer import optimize_property, optimized_xpath
+from dollarxpy.path_utils import _element_name, _positional, opposite_relation
+from dollarxpy.predicates import compile_properties
+from dollarxpy.queries import occurrences_result
+from dollarxpy.relation_operator import RelationOperation
+from dollarxpy.snapshot import Scope, Snapshot, compile_xpath, extract_columns
+from dollarxpy.text_index import TextIndex
+
+
+# properties run as python predicates on the candidates when there are at most this fraction of the nodes; on more,
+# one numpy mask per property over the whole document is cheaper, once the text index is built. Properties without
+# an index are masked by an xpath over the whole document, which predicates beat on many more candidates.
+_PREDICATE_CANDIDATES_RATIO = 1 / 256
+_XPATH_PREDICATE_CANDIDATES_RATIO = 1 / 8
+_XPATH_MASKED_KINDS = (PropertyKind.ATTRIBUTE, PropertyKind.HIDDEN, PropertyKind.CLASS_CONTAINING)
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _xpath_masked(prop: ElementProperty) -> bool:
+    if prop.kind in (PropertyKind.AND, PropertyKind.OR, PropertyKind.NOT):
+        return any(_xpath_masked(p) for p in prop.args)
+    return prop.kind in _XPATH_MASKED_KINDS
+
+
+def _compare(counts: np.ndarray, qualifier: RelationOperation, n: int) -> np.ndarray:
+    if qualifier is RelationOperation.OrMore:
+        return counts >= n
+    if qualifier is RelationOperation.OrLess:
+        return counts <= n
+    return counts == n
+
+
+class DomIndex:
+    __slots__ = ('root', 'elements', 'parent', 'depth', 'pre', 'post', 'subtree_end', 'tag_id', 'tag_ids',
+                 'sibling_index', 'child_count', '_position_of', '_sibling_order', '_sibling_group_start',
+                 'aggregated_texts', '_text_index', '_relation_counts')
+
+    def __init__(self, root):
+        root = root.getroot() if isinstance(root, etree._ElementTree) else root
+        self.root = root
+        elements, parents, depths, posts, ends, sibling_indexes = [], [], [], [], [], []
+        position_of = {}
+        stack, child_counters = [], []
+        post_counter = 0
+        for event, element in etree.iterwalk(root, events=('start', 'end')):
+            if not isinstance(element.tag, str):
+                continue
+            if event == 'start':
+                i = len(elements)
+                position_of[element] = i
+                elements.append(element)
+                parents.append(stack[-1] if stack else -1)
+                depths.append(len(stack))
+                sibling_indexes.append(child_counters[-1] if child_counters else 0)
+                posts.append(0)
+                ends.append(i)
+                if child_counters:
+                    child_counters[-1] += 1
+                stack.append(i)
+                child_counters.append(0)
+            else:
+                i = stack.pop()
+                child_counters.pop()
+                posts[i] = post_counter
+                post_counter += 1
+                ends[i] = len(elements) - 1
+        n = len(elements)
+        self.elements = elements
+        self._position_of = position_of
+        self.pre = np.arange(n, dtype=np.int64)
+        self.post = np.asarray(posts, dtype=np.int64)
+        self.parent = np.asarray(parents, dtype=np.int64)
+        self.depth = np.asarray(depths, dtype=np.int64)
+        self.subtree_end = np.asarray(ends, dtype=np.int64)
+        self.sibling_index = np.asarray(sibling_indexes, dtype=np.int64)
+        self.tag_ids = {}
+        self.tag_id = np.asarray([self.tag_ids.setdefault(e.tag, len(self.tag_ids)) for e in elements],
+                                 dtype=np.int64)
+        has_parent = self.parent >= 0
+        self.child_count = np.bincount(self.parent[has_parent], minlength=n).astype(np.int64)
+        self._sibling_order = np.lexsort((self.sibling_index, self.parent))
+        sorted_parents = self.parent[self._sibling_order]
+        starts = np.ones(n, dtype=bool)
+        starts[1:] = sorted_parents[1:] != sorted_parents[:-1]
+        self._sibling_group_start = np.maximum.accumulate(np.where(starts, np.arange(n), 0)) if n else starts
+        self.aggregated_texts = {}
+        self._text_index = None
+        self._relation_counts = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> DomIndex:
+        return cls(snapshot.root)
+
+    def __len__(self):
+        return len(self.elements)
+
+    # class and text postings, built on the first text or class predicate
+    @property
+    def text_index(self) -> TextIndex:
+        if self._text_index is None:
+            self._text_index = TextIndex(self.elements)
+        return self._text_index
+
+    #########################################
+    # axes
+
+    def _prefix_counts(self, mask: np.ndarray) -> np.ndarray:
+        return np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+
+    def _sibling_counts(self, mask: np.ndarray):
+        order = self._sibling_order
+        in_order = mask[order].astype(np.int64)
+        before = np.cumsum(in_order) - in_order
+        preceding = before - before[self._sibling_group_start]
+        group_ids = np.cumsum(np.concatenate(([1], np.diff(self._sibling_group_start) != 0))) - 1 \
+            if len(order) else order
+        totals = np.bincount(group_ids, weights=in_order, minlength=1).astype(np.int64)
+        following = totals[group_ids] - preceding - in_order
+        preceding_by_node = np.empty_like(preceding)
+        following_by_node = np.empty_like(following)
+        preceding_by_node[order] = preceding
+        following_by_node[order] = following
+        return preceding_by_node, following_by_node
+
+    # for every node, how many nodes of `mask` are on `axis` of it
+    def axis_counts(self, mask: np.ndarray, axis: str) -> np.ndarray:
+        n = len(self.elements)
+        if axis == 'self':
+            return mask.astype(np.int64)
+        if axis == 'child':
+            has_parent = self.parent >= 0
+            return np.bincount(self.parent[has_parent & mask], minlength=n).astype(np.int64)
+        if axis == 'parent':
+            counts = np.zeros(n, dtype=np.int64)
+            has_parent = self.parent >= 0
+            counts[has_parent] = mask[self.parent[has_parent]]
+            return counts
+        if axis == 'descendant':
+            prefix = self._prefix_counts(mask)
+            return prefix[self.subtree_end + 1] - prefix[self.pre + 1]
+        if axis == 'ancestor':
+            diff = np.zeros(n + 1, dtype=np.int64)
+            targets = np.flatnonzero(mask)
+            np.add.at(diff, targets + 1, 1)
+            np.add.at(diff, self.subtree_end[targets] + 1, -1)
+            return np.cumsum(diff[:n])
+        if axis == 'following':
+            prefix = self._prefix_counts(mask)
+            return prefix[n] - prefix[self.subtree_end + 1]
+        if axis == 'preceding':
+            sorted_ends = np.sort(self.subtree_end[mask])
+            return np.searchsorted(sorted_ends, self.pre, side='left')
+        if axis in ('preceding-sibling', 'following-sibling', 'sibling'):
+            preceding, following = self._sibling_counts(mask)
+            return preceding if axis == 'preceding-sibling' else following if axis == 'following-sibling' \
+                else preceding + following
+        raise _Unsupported(axis)
+
+    #########################################
+    # path evaluation
+
+    def _xpath_mask(self, xpath: str) -> np.ndarray:
+        mask = np.zeros(len(self.elements), dtype=bool)
+        for element in compile_xpath(xpath)(self.root):
+            i = self._position_of.get(element)
+            if i is not None:
+                mask[i] = True
+        return mask
+
+    def _tag_mask(self, tag: str) -> np.ndarray:
+        if tag == '*':
+            return np.ones(len(self.elements), dtype=bool)
+        tag_id = self.tag_ids.get(tag)
+        return np.zeros(len(self.elements), dtype=bool) if tag_id is None else self.tag_id == tag_id
+
+    def _ids_mask(self, ids: np.ndarray) -> np.ndarray:
+        mask = np.zeros(len(self.elements), dtype=bool)
+        mask[ids] = True
+        return mask
+
+    def _property_mask(self, prop: ElementProperty) -> np.ndarray:
+        kind = prop.kind
+        if prop.xpath is None:
+            if kind is PropertyKind.NONE_OF_CLASSES:
+                ids = self.text_index.resolve(ElementProperty(kind=PropertyKind.ANY_OF_CLASSES, args=prop.args))
+                if ids is not None:
+                    return ~self._ids_mask(ids)
+            ids = self.text_index.resolve(prop)
+            if ids is not None:
+                return self._ids_mask(ids)
+            if kind is PropertyKind.AND:
+                return self._property_mask(prop.args[0]) & self._property_mask(prop.args[1])
+            if kind is PropertyKind.OR:
+                return self._property_mask(prop.args[0]) | self._property_mask(prop.args[1])
+            if kind is PropertyKind.NOT:
+                return ~self._property_mask(prop.args[0])
+            if kind is PropertyKind.LAST_SIBLING:
+                return self.axis_counts(np.ones(len(self.elements), dtype=bool), 'following-sibling') == 0
+            if kind is PropertyKind.ONLY_CHILD:
+                return self.axis_counts(np.ones(len(self.elements), dtype=bool), 'sibling') == 0
+            if kind is PropertyKind.N_CHILDREN:
+                n, qualifier = prop.args
+                return _compare(self.child_count, qualifier, n)
+            if kind is PropertyKind.NTH_SIBLING:
+                return self.sibling_index == prop.args[0]
+            if kind is PropertyKind.NTH_FROM_LAST_SIBLING:
+                return self.axis_counts(np.ones(len(self.elements), dtype=bool), 'following-sibling') == prop.args[0]
+            if kind is PropertyKind.RELATION:
+                return self._relation_property_mask(*prop.args)
+            if kind in (PropertyKind.INDEX, PropertyKind.INDEX_RANGE):
+                raise _Unsupported(kind)
+        xpath = prop.to_xpath()
+        if _positional.search(xpath):
+            raise _Unsupported(xpath)
+        return self._xpath_mask(f"//*[{optimize_property(prop).to_xpath()}]")
+
+    def _relation_property_mask(self, relation, paths, npath, text_prefix, pluralize) -> np.ndarray:
+        result = np.ones(len(self.elements), dtype=bool)
+        for path in paths:
+            counts = self.relation_counts(path, relation)
+            result &= counts > 0 if npath is None else _compare(counts, npath.qualifier, npath.n)
+        return result
+
+    # for every node, how many nodes matching the path are on the relation axis of it
+    def relation_counts(self, path: BasicPath, relation: str) -> np.ndarray:
+        key = (path, relation)
+        counts = self._relation_counts.get(key)
+        if counts is None:
+            counts = self._relation_counts[key] = self.axis_counts(self._mask(path), relation)
+        return counts
+
+    def _properties_mask(self, mask: np.ndarray, props) -> np.ndarray:
+        ratio = _XPATH_PREDICATE_CANDIDATES_RATIO if any(_xpath_masked(p) for p in props) \
+            else _PREDICATE_CANDIDATES_RATIO
+        if props and np.count_nonzero(mask) <= len(self.elements) * ratio:
+            predicate = compile_properties(props)
+            if predicate is not None:
+                result = np.zeros(len(self.elements), dtype=bool)
+                for i in np.flatnonzero(mask).tolist():
+                    if predicate(self, i):
+                        result[i] = True
+                return result
+        for prop in props:
+            mask = mask & self._property_mask(prop)
+        return mask
+
+    def _mask(self, path: BasicPath) -> np.ndarray:
+        kind = path.kind
+        if kind is PathKind.ELEMENT:
+            if path.inside_xpath or not (path.xpath == '*' or _element_name.match(path.xpath)):
+                if _positional.search(path.get_xpath()):
+                    raise _Unsupported(path.get_xpath())
+                return self._xpath_mask(optimized_xpath(path))
+            return self._properties_mask(self._tag_mask(path.xpath), path.element_properties)
+        if kind is PathKind.PREDICATE:
+            return self._properties_mask(self._mask(path.operands[0]), path.element_properties)
+        if kind is PathKind.RELATION:
+            subject, target = path.operands
+            return self._mask(subject) & (self.relation_counts(target, opposite_relation(path.relation)) > 0)
+        if kind is PathKind.OCCURRENCE:
+            if path.relation == _CHILD_OCCURRENCE:
+                raise _Unsupported(path.relation)
+            matches = np.flatnonzero(self._mask(path.operands[0]))
+            mask = np.zeros(len(self.elements), dtype=bool)
+            position = len(matches) - 1 if path.n == 0 else path.n - 1
+            if 0 <= position < len(matches):
+                mask[matches[position]] = True
+            return mask
+        if kind is PathKind.UNION:
+            return self._mask(path.operands[0]) | self._mask(path.operands[1])
+        if kind is PathKind.NEGATION:
+            return ~self._mask(path.operands[0])
+        if kind is PathKind.TOP_LEVEL:
+            return self._mask(path.operands[0])
+        raise _Unsupported(kind)
+
+    def supports(self, path: BasicPath) -> bool:
+        try:
+            self._mask(path)
+            return True
+        except _Unsupported:
+            return False
+
+    def matches(self, path: BasicPath) -> np.ndarray:
+        try:
+            return np.flatnonzero(self._mask(path))
+        except _Unsupported:
+            return np.flatnonzero(self._xpath_mask(optimized_xpath(path)))
+
+    #########################################
+    # same queries as Snapshot
+
+    def find_all(self, path: Union[BasicPath, NPath]) -> List[etree._Element]:
+        if isinstance(path, NPath):
+            return self.find_all(path.path) if self.exists(path) else []
+        return [self.elements[i] for i in self.matches(path)]
+
+    # the axis counts of a relation target are kept, so targets shared by the paths are evaluated once
+    def find_all_of(self, paths: Sequence[Union[BasicPath, NPath]]) -> List[List[etree._Element]]:
+        return [self.find_all(path) for path in paths]
+
+    def find_first(self, path: Union[BasicPath, NPath]) -> Optional[etree._Element]:
+        found = self.find_all(path)
+        return found[0] if found else None
+
+    def count(self, path: Union[BasicPath, NPath]) -> int:
+        if isinstance(path, NPath):
+            path = path.path
+        try:
+            return int(np.count_nonzero(self._mask(path)))
+        except _Unsupported:
+            return int(np.count_nonzero(self._xpath_mask(optimized_xpath(path))))
+
+    def exists(self, path: Union[BasicPath, NPath]) -> bool:
+        if isinstance(path, NPath):
+            return path.qualifier.is_satisfied_by(self.count(path.path), path.n)
+        return self.count(path) > 0
+
+    def assert_occurrences(self, path: NPath) -> int:
+        return occurrences_result(path, self.count(path))
+
+    def extract(self, path: Union[BasicPath, NPath], attributes: Sequence[str] = (), text: bool = True,
+                aggregated_text: bool = True) -> Dict[str, list]:
+        return extract_columns(self.find_all(path), attributes, text, aggregated_text)
+
+    def scopes(self, path: Union[BasicPath, NPath]) -> List[Scope]:
+        return [Scope(element) for element in self.find_all(path)]
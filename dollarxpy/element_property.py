@@ -1,27 +1,73 @@
-from typedpy import ImmutableStructure, String, PositiveInt, Array
+from enum import Enum
 
 from dollarxpy import xpath_utils
-from dollarxpy.npath import NPath
+from dollarxpy.immutable import InternedStructure, String, PositiveInt, Tuple, InstanceOf
+from dollarxpy.path_utils import transform_xpath_to_correct_axis
 from dollarxpy.relation_operator import RelationOperation
 
 
-class ElementProperty(ImmutableStructure):
+class PropertyKind(Enum):
+    RAW = "raw"
+    CLASS = "class"
+    CLASSES = "classes"
+    ANY_OF_CLASSES = "any_of_classes"
+    NONE_OF_CLASSES = "none_of_classes"
+    CLASS_CONTAINING = "class_containing"
+    ATTRIBUTE = "attribute"
+    SOME_TEXT = "some_text"
+    TEXT_EQUALS = "text_equals"
+    TEXT_CONTAINS = "text_contains"
+    TEXT_STARTS_WITH = "text_starts_with"
+    TEXT_ENDS_WITH = "text_ends_with"
+    AGGREGATED_TEXT_EQUALS = "aggregated_text_equals"
+    AGGREGATED_TEXT_CONTAINS = "aggregated_text_contains"
+    AGGREGATED_TEXT_STARTS_WITH = "aggregated_text_starts_with"
+    AGGREGATED_TEXT_ENDS_WITH = "aggregated_text_ends_with"
+    HIDDEN = "hidden"
+    LAST_SIBLING = "last_sibling"
+    ONLY_CHILD = "only_child"
+    N_CHILDREN = "n_children"
+    NTH_SIBLING = "nth_sibling"
+    NTH_FROM_LAST_SIBLING = "nth_from_last_sibling"
+    INDEX = "index"
+    INDEX_RANGE = "index_range"
+    RELATION = "relation"
+    AND = "and"
+    OR = "or"
+    NOT = "not"
+
+
+class ElementProperty(InternedStructure):
     xpath = String
     text = String
+    kind = InstanceOf(PropertyKind, default=PropertyKind.RAW)
+    args = Tuple(default=())
 
-    _required = ['xpath', 'text']
+    __slots__ = ('_xpath_cache', '_text_cache', '_predicate_cache')
+
+    def __validate__(self):
+        if self.kind is PropertyKind.RAW and (self.xpath is None or self.text is None):
+            raise TypeError("ElementProperty: a raw property requires both 'xpath' and 'text'")
+
+    def to_xpath(self) -> str:
+        rendered = self._xpath_cache
+        if rendered is None:
+            rendered = self.xpath if self.xpath is not None else _xpath_renderers[self.kind](*self.args)
+            object.__setattr__(self, '_xpath_cache', rendered)
+        return rendered
+
+    def __str__(self):
+        rendered = self._text_cache
+        if rendered is None:
+            rendered = self.text if self.text is not None else _text_renderers[self.kind](*self.args)
+            object.__setattr__(self, '_text_cache', rendered)
+        return rendered
 
     def or_(self, elementProperty):
-        return ElementProperty(
-            xpath=f"({self} or {elementProperty})",
-            text=f"({self} or {elementProperty})"
-        )
+        return ElementProperty(kind=PropertyKind.OR, args=(self, elementProperty))
 
     def and_(self, elementProperty):
-        return ElementProperty(
-            xpath=f"({self} and {elementProperty})",
-            text=f"({self} and {elementProperty})"
-        )
+        return ElementProperty(kind=PropertyKind.AND, args=(self, elementProperty))
 
     def and_not(self, element_property):
         return self.and_(not_prop(element_property))
@@ -29,19 +75,14 @@ class ElementProperty(ImmutableStructure):
 
 
 def not_prop(element_property):
-    return ElementProperty(
-        xpath=xpath_utils.does_not_exist(element_property),
-        text=f"not ({element_property})")
+    return ElementProperty(kind=PropertyKind.NOT, args=(element_property,))
 
 
 class _ElementPropertyWithNumericalBoundaries(ElementProperty):
     n = PositiveInt
 
     def _create_with_relation(self, relation):
-        return ElementProperty(
-            xpath=f"count(./*){relation.as_xpath()}{self.n}",
-            text=f"has{relation.as_english()}{self.n} children"
-        )
+        return ElementProperty(kind=PropertyKind.N_CHILDREN, args=(self.n, relation))
 
     def or_more(self) -> ElementProperty:
         return self._create_with_relation(RelationOperation.OrMore)
@@ -53,3 +94,98 @@ class _ElementPropertyWithNumericalBoundaries(ElementProperty):
         return self._create_with_relation(RelationOperation.Exactly)
 
 
+#########################################
+# rendering, done lazily on first use
+
+def _as_list(names) -> str:
+    return ", ".join(names)
+
+
+def _rvalue_to_string(path) -> str:
+    path_st = str(path)
+    return f"({path_st})" if " " in path_st.strip() else path_st
+
+
+def _relation_for_single_xpath(relation, path, npath):
+    if relation == "sibling":
+        target = transform_xpath_to_correct_axis(path)
+        expression = f"(preceding-sibling::{target}) or (following-sibling::{target})"
+    else:
+        expression = f"{relation}::{transform_xpath_to_correct_axis(path)}"
+    if npath is None:
+        return expression
+    return f"count({expression}){npath.qualifier.as_xpath()}{npath.n}"
+
+
+def _relation_xpath(relation, paths, npath, text_prefix, pluralize):
+    result = ") and (".join([_relation_for_single_xpath(relation, p, npath) for p in paths])
+    return f"({result})" if len(paths) > 1 else result
+
+
+def _relation_text(relation, paths, npath, text_prefix, pluralize):
+    if npath is not None:
+        return f"{text_prefix} {_rvalue_to_string(npath.path)}"
+    as_list = ", ".join([_rvalue_to_string(p) for p in paths])
+    prefix = text_prefix + "s" if pluralize and len(paths) > 1 else text_prefix
+    return f"{prefix}: [{as_list}]" if len(paths) > 1 else f"{prefix}: {as_list}"
+
+
+_xpath_renderers = {
+    PropertyKind.CLASS: xpath_utils.has_class,
+    PropertyKind.CLASSES: lambda *names: xpath_utils.has_classes(*names),
+    PropertyKind.ANY_OF_CLASSES: lambda *names: xpath_utils.has_any_of_classes(*names),
+    PropertyKind.NONE_OF_CLASSES: lambda *names: xpath_utils.does_not_exist(xpath_utils.has_any_of_classes(*names)),
+    PropertyKind.CLASS_CONTAINING: xpath_utils.has_class_containing,
+    PropertyKind.ATTRIBUTE: xpath_utils.has_attribute,
+    PropertyKind.SOME_TEXT: lambda: xpath_utils.has_some_text,
+    PropertyKind.TEXT_EQUALS: xpath_utils.text_equals,
+    PropertyKind.TEXT_CONTAINS: xpath_utils.text_contains,
+    PropertyKind.TEXT_STARTS_WITH: xpath_utils.text_starts_with,
+    PropertyKind.TEXT_ENDS_WITH: xpath_utils.text_ends_with,
+    PropertyKind.AGGREGATED_TEXT_EQUALS: xpath_utils.aggregated_text_equals,
+    PropertyKind.AGGREGATED_TEXT_CONTAINS: xpath_utils.aggregated_text_contains,
+    PropertyKind.AGGREGATED_TEXT_STARTS_WITH: xpath_utils.aggregated_text_starts_with,
+    PropertyKind.AGGREGATED_TEXT_ENDS_WITH: xpath_utils.aggregated_text_ends_with,
+    PropertyKind.HIDDEN: lambda: xpath_utils.is_hidden,
+    PropertyKind.LAST_SIBLING: lambda: "count(following-sibling::*)=0",
+    PropertyKind.ONLY_CHILD: lambda: "count(preceding-sibling::*)=0 and count(following-sibling::*)=0",
+    PropertyKind.N_CHILDREN: lambda n, relation: f"count(./*){relation.as_xpath()}{n}",
+    PropertyKind.NTH_SIBLING: lambda index: f"count(preceding-sibling::*)={index}",
+    PropertyKind.NTH_FROM_LAST_SIBLING: lambda index: f"count(following-sibling::*)={index}",
+    PropertyKind.INDEX: lambda index: f"position()={index}",
+    PropertyKind.INDEX_RANGE: lambda first, last: f"position()>={first} and position()<={last}",
+    PropertyKind.RELATION: _relation_xpath,
+    PropertyKind.AND: lambda left, right: f"({left.to_xpath()} and {right.to_xpath()})",
+    PropertyKind.OR: lambda left, right: f"({left.to_xpath()} or {right.to_xpath()})",
+    PropertyKind.NOT: lambda prop: xpath_utils.does_not_exist(prop.to_xpath()),
+}
+
+_text_renderers = {
+    PropertyKind.CLASS: lambda name: f"has class '{name}'",
+    PropertyKind.CLASSES: lambda *names: f"has classes [{_as_list(names)}]",
+    PropertyKind.ANY_OF_CLASSES: lambda *names: f"has at least one of the classes: [{_as_list(names)}]",
+    PropertyKind.NONE_OF_CLASSES: lambda *names: f"has none of the classes: [{_as_list(names)}]",
+    PropertyKind.CLASS_CONTAINING: lambda name: f"has class containing '{name}'",
+    PropertyKind.ATTRIBUTE: lambda name, value: f"has {name}: {value}",
+    PropertyKind.SOME_TEXT: lambda: "has some text",
+    PropertyKind.TEXT_EQUALS: lambda text: f'has the text "{text}"',
+    PropertyKind.TEXT_CONTAINS: lambda text: f'has text containing "{text}"',
+    PropertyKind.TEXT_STARTS_WITH: lambda text: f'has text that starts with "{text}"',
+    PropertyKind.TEXT_ENDS_WITH: lambda text: f'has text that ends with "{text}"',
+    PropertyKind.AGGREGATED_TEXT_EQUALS: lambda text: f'has aggregated text "{text}"',
+    PropertyKind.AGGREGATED_TEXT_CONTAINS: lambda text: f'has aggregated text containing "{text}"',
+    PropertyKind.AGGREGATED_TEXT_STARTS_WITH: lambda text: f'has aggregated text starting with "{text}"',
+    PropertyKind.AGGREGATED_TEXT_ENDS_WITH: lambda text: f'has aggregated text ending with "{text}"',
+    PropertyKind.HIDDEN: lambda: "is hidden",
+    PropertyKind.LAST_SIBLING: lambda: "is last sibling",
+    PropertyKind.ONLY_CHILD: lambda: "is only child",
+    PropertyKind.N_CHILDREN: lambda n, relation: f"has{relation.as_english()}{n} children",
+    PropertyKind.NTH_SIBLING: lambda index: f"is in place {index} among its siblings",
+    PropertyKind.NTH_FROM_LAST_SIBLING: lambda index: f"is in place {index} from the last sibling",
+    PropertyKind.INDEX: lambda index: f"with index {index}",
+    PropertyKind.INDEX_RANGE: lambda first, last: f"with index from {first} to {last}",
+    PropertyKind.RELATION: _relation_text,
+    PropertyKind.AND: lambda left, right: f"({left} and {right})",
+    PropertyKind.OR: lambda left, right: f"({left} or {right})",
+    PropertyKind.NOT: lambda prop: f"not ({prop})",
+}
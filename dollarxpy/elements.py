@@ -1,36 +1,75 @@
 from dollarxpy import custom_element, BasicPath
 
-element = BasicPath(xpath='*', xpath_explanation='any element')
-div = custom_element('div')
-span = custom_element('span')
-image = custom_element('image')
-button = custom_element('button')
-
-li = BasicPath(xpath='li', xpath_explanation='list item')
-ul = BasicPath(xpath='ul', xpath_explanation='unordered list')
-ol = BasicPath(xpath='ol', xpath_explanation='ordered list')
-select = BasicPath(xpath='select', xpath_explanation='selection menu')
-html = BasicPath(xpath='html', xpath_explanation='document')
-body = BasicPath(xpath='body', xpath_explanation='document body')
-section = custom_element("section")
-
-header1 = BasicPath(xpath='h1', xpath_explanation='header-1')
-header2 = BasicPath(xpath='h2', xpath_explanation='header-2')
-header3 = BasicPath(xpath='h3', xpath_explanation='header-3')
-header4 = BasicPath(xpath='h4', xpath_explanation='header-4')
-header5 = BasicPath(xpath='h5', xpath_explanation='header-5')
-header6 = BasicPath(xpath='h6', xpath_explanation='header-6')
-header = header1.or_(header2).or_(header3).or_(header4).or_(header5).or_(header6)
-
-input = custom_element("input")
-form = custom_element("form")
-title = custom_element("title")
-iframe = custom_element("iframe")
-
-table = custom_element("table")
-td = BasicPath(xpath='td', xpath_explanation='table cell')
-tr = BasicPath(xpath='td', xpath_explanation='table row')
-th = BasicPath(xpath='th', xpath_explanation='table header')
-
-option = custom_element("option")
-label = custom_element("label")
+# Element constants are built on first access (module __getattr__), so importing dollarxpy stays cheap.
+# Each one is stored in the module globals once built, so later lookups are plain attribute reads.
+
+
+def _named(xpath, explanation):
+    return lambda: BasicPath(xpath=xpath, xpath_explanation=explanation)
+
+
+def _custom(xpath):
+    return lambda: custom_element(xpath)
+
+
+def _header():
+    return _get('header1').or_(_get('header2')).or_(_get('header3')).or_(_get('header4')).or_(_get('header5')) \
+        .or_(_get('header6'))
+
+
+_definitions = {
+    'element': _named('*', 'any element'),
+    'div': _custom('div'),
+    'span': _custom('span'),
+    'image': _custom('image'),
+    'button': _custom('button'),
+
+    'li': _named('li', 'list item'),
+    'ul': _named('ul', 'unordered list'),
+    'ol': _named('ol', 'ordered list'),
+    'select': _named('select', 'selection menu'),
+    'html': _named('html', 'document'),
+    'body': _named('body', 'document body'),
+    'section': _custom('section'),
+
+    'header1': _named('h1', 'header-1'),
+    'header2': _named('h2', 'header-2'),
+    'header3': _named('h3', 'header-3'),
+    'header4': _named('h4', 'header-4'),
+    'header5': _named('h5', 'header-5'),
+    'header6': _named('h6', 'header-6'),
+    'header': _header,
+
+    'input': _custom('input'),
+    'form': _custom('form'),
+    'title': _custom('title'),
+    'iframe': _custom('iframe'),
+
+    'table': _custom('table'),
+    'td': _named('td', 'table cell'),
+    'tr': _named('tr', 'table row'),
+    'th': _named('th', 'table header'),
+
+    'option': _custom('option'),
+    'label': _custom('label'),
+}
+
+__all__ = list(_definitions)
+
+
+def _get(name):
+    value = globals().get(name)
+    if value is None:
+        value = _definitions[name]()
+        globals()[name] = value
+    return value
+
+
+def __getattr__(name):
+    if name in _definitions:
+        return _get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_definitions))
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import re
+import time
+from enum import Enum
+from typing import List
+
+from dollarxpy.basic_path import BasicPath
+from dollarxpy.immutable import ImmutableStructure, String, Integer, InstanceOf
+from dollarxpy.optimizer import optimized_xpath
+from dollarxpy.path_utils import has_heirarchy
+
+_literal = re.compile(r"'[^']*'|\"[^\"]*\"")
+_full_document_axis = re.compile(r'\b(?:following|preceding)::')
+_string_function = re.compile(r'\b(?:translate|normalize-space)\(')
+
+
+class CostClass(Enum):
+    CHEAP = "cheap"
+    MODERATE = "moderate"
+    EXPENSIVE = "expensive"
+
+
+_cost_rank = {CostClass.CHEAP: 0, CostClass.MODERATE: 1, CostClass.EXPENSIVE: 2}
+
+
+class Explanation(ImmutableStructure):
+    description = String
+    xpath = String
+    alternate_xpath = String
+    uses_alternate = InstanceOf(bool, default=False)
+    evaluated_xpath = String
+    cost = InstanceOf(CostClass)
+    full_document_axes = Integer(minimum=0)
+    nested_document_scans = Integer(minimum=0)
+    string_functions = Integer(minimum=0)
+    measured_time = InstanceOf(float)
+    found = Integer(minimum=0)
+
+    _required = ['description', 'xpath', 'evaluated_xpath', 'cost']
+
+    def __str__(self):
+        lines = [
+            self.description,
+            f"  xpath:           {self.xpath}",
+            f"  alternate xpath: {self.alternate_xpath}" +
+            (" (used when nested, the xpath has a hierarchy)" if self.uses_alternate else ""),
+            f"  evaluated:       {self.evaluated_xpath}",
+            f"  cost:            {self.cost.value} ({self.full_document_axes} following/preceding axes, "
+            f"{self.nested_document_scans} nested document scans, {self.string_functions} string functions)",
+        ]
+        if self.measured_time is not None:
+            lines.append(f"  measured:        {self.measured_time * 1e3:.2f} ms, {self.found} found")
+        return "\n".join(lines)
+
+
+def _nested_document_scans(xpath: str) -> int:
+    # a '//' inside a predicate is evaluated again from the document root for every candidate
+    depth, scans = 0, 0
+    for i, c in enumerate(xpath):
+        if c == '[':
+            depth += 1
+        elif c == ']':
+            depth -= 1
+        elif depth > 0 and xpath.startswith('//', i) and not xpath.startswith('//', i - 1):
+            scans += 1
+    return scans
+
+
+def _cost(full_document_axes: int, nested_document_scans: int, string_functions: int, xpath: str) -> CostClass:
+    if full_document_axes or nested_document_scans:
+        return CostClass.EXPENSIVE
+    if string_functions or 'count(' in xpath:
+        return CostClass.MODERATE
+    return CostClass.CHEAP
+
+
+# `target` is anything with find_all(path) - a Snapshot, DomIndex or Browser - or an lxml document
+def explain(path: BasicPath, target=None) -> Explanation:
+    xpath = path.get_xpath()
+    evaluated = optimized_xpath(path)
+    code = _literal.sub("''", evaluated)
+    full_document_axes = len(_full_document_axis.findall(code))
+    nested_document_scans = _nested_document_scans(code)
+    string_functions = len(_string_function.findall(code))
+    measured_time = found = None
+    if target is not None:
+        if not hasattr(target, 'find_all'):
+            from dollarxpy.snapshot import Snapshot
+            target = Snapshot(target)
+        start = time.perf_counter()
+        found = len(target.find_all(path))
+        measured_time = time.perf_counter() - start
+    return Explanation(description=str(path),
+                       xpath=xpath,
+                       alternate_xpath=path.get_alternate_xpath(),
+                       uses_alternate=has_heirarchy(xpath),
+                       evaluated_xpath=evaluated,
+                       cost=_cost(full_document_axes, nested_document_scans, string_functions, code),
+                       full_document_axes=full_document_axes,
+                       nested_document_scans=nested_document_scans,
+                       string_functions=string_functions,
+                       measured_time=measured_time,
+                       found=found)
+
+
+def _measured_cost(explanation: Explanation) -> float:
+    return explanation.measured_time
+
+
+def _estimated_cost(explanation: Explanation) -> tuple:
+    return (_cost_rank[explanation.cost], explanation.full_document_axes + explanation.nested_document_scans,
+            explanation.string_functions)
+
+
+def most_expensive(paths, target=None, limit: int = 10) -> List[Explanation]:
+    explanations = [explain(path, target) for path in paths]
+    key = _measured_cost if target is not None else _estimated_cost
+    return sorted(explanations, key=key, reverse=True)[:limit]
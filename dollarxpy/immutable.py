@@ -0,0 +1,264 @@
+import os
+import weakref
+
+
+_validation_enabled = os.environ.get('DOLLARXPY_VALIDATION', '1') != '0'
+_interning_enabled = os.environ.get('DOLLARXPY_INTERNING', '1') != '0'
+
+
+def set_validation(enabled: bool):
+    global _validation_enabled
+    _validation_enabled = enabled
+
+
+def is_validation_enabled() -> bool:
+    return _validation_enabled
+
+
+def set_interning(enabled: bool):
+    global _interning_enabled
+    _interning_enabled = enabled
+
+
+def is_interning_enabled() -> bool:
+    return _interning_enabled
+
+
+#########################################
+# field declarations
+
+class Field:
+    coerce = None
+    default = None
+
+    def validate(self, name, value):
+        pass
+
+
+class String(Field):
+    def __init__(self, minLength: int = 0):
+        self.min_length = minLength
+
+    def validate(self, name, value):
+        if not isinstance(value, str):
+            raise TypeError(f"{name}: Expected a string")
+        if len(value) < self.min_length:
+            raise ValueError(f"{name}: Expected length of at least {self.min_length}")
+
+
+class Integer(Field):
+    def __init__(self, minimum: int = None):
+        self.minimum = minimum
+
+    def validate(self, name, value):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise TypeError(f"{name}: Expected an integer")
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"{name}: Expected a minimum of {self.minimum}")
+
+
+class PositiveInt(Integer):
+    def __init__(self):
+        super().__init__(minimum=1)
+
+
+class InstanceOf(Field):
+    def __init__(self, cls, default=None):
+        self.cls = cls
+        self.default = default
+
+    def validate(self, name, value):
+        if not isinstance(value, self.cls):
+            raise TypeError(f"{name}: Expected an instance of {self.cls.__name__}")
+
+
+class Array(Field):
+    coerce = tuple
+
+    def __init__(self, items=None, default=None):
+        self.items = items
+        self.default = default
+
+    def __class_getitem__(cls, items):
+        return cls(items)
+
+    def validate(self, name, value):
+        if not isinstance(value, (tuple, list)):
+            raise TypeError(f"{name}: Expected a sequence")
+        if self.items is not None:
+            for i, item in enumerate(value):
+                if not isinstance(item, self.items):
+                    raise TypeError(f"{name}_{i}: Expected an instance of {self.items.__name__}")
+
+
+Tuple = Array
+
+
+def _as_field(spec):
+    if isinstance(spec, Field):
+        return spec
+    if isinstance(spec, type) and issubclass(spec, Field):
+        return spec()
+    if isinstance(spec, type) and issubclass(spec, ImmutableStructure):
+        return InstanceOf(spec)
+    return None
+
+
+#########################################
+# structures
+
+class _StructureMeta(type):
+    def __new__(mcs, name, bases, namespace):
+        fields = {}
+        for base in reversed(bases):
+            fields.update(getattr(base, '_fields', {}))
+        own_fields = {}
+        for key, spec in list(namespace.items()):
+            field = None if key.startswith('_') else _as_field(spec)
+            if field is not None:
+                own_fields[key] = field
+                del namespace[key]
+        fields.update(own_fields)
+        namespace['__slots__'] = tuple(own_fields) + tuple(namespace.get('__slots__', ()))
+        namespace['_fields'] = fields
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls._field_names = tuple(fields)
+        cls._field_defaults = tuple((k, f.default) for k, f in fields.items())
+        cls._coerced_fields = tuple((k, f.coerce) for k, f in fields.items() if f.coerce)
+        cls._coerced_positions = tuple((i, f.coerce) for i, f in enumerate(fields.values()) if f.coerce)
+        cls._private_slots = tuple(s for c in cls.__mro__ for s in c.__dict__.get('__slots__', ())
+                                   if s not in fields and not s.startswith('__'))
+        # every interned class, subclasses included, gets its own table of canonical instances
+        cls._instances = weakref.WeakValueDictionary() if getattr(cls, '_interned', False) else None
+        return cls
+
+    def __call__(cls, *args, **kwargs):
+        instances = cls._instances
+        if instances is None or not _interning_enabled:
+            return super().__call__(*args, **kwargs)
+        if args:
+            kwargs.update(zip(cls._field_names, args))
+        if not kwargs.keys() <= cls._fields.keys():
+            return super().__call__(**kwargs)  # reports the unexpected argument
+        # the key is the field values the instance would get, so a hit skips building it altogether
+        values = [kwargs.get(name, default) for name, default in cls._field_defaults]
+        for i, coerce in cls._coerced_positions:
+            value = values[i]
+            if value is not None and type(value) is not coerce:
+                values[i] = coerce(value)
+        key = tuple(values)
+        try:
+            canonical = instances.get(key)
+        except TypeError:  # an unhashable field value, keep the instance as it is
+            return super().__call__(**kwargs)
+        if canonical is None:
+            instances[key] = canonical = super().__call__(**kwargs)
+        return canonical
+
+
+class ImmutableStructure(metaclass=_StructureMeta):
+    __slots__ = ()
+    _required = []
+
+    def __init__(self, *args, **kwargs):
+        cls = type(self)
+        if args:
+            kwargs.update(zip(cls._field_names, args))
+        if _validation_enabled:
+            cls._validate_fields(kwargs)
+        for key, coerce in cls._coerced_fields:
+            value = kwargs.get(key)
+            if value is not None and type(value) is not coerce:
+                kwargs[key] = coerce(value)
+        setter = object.__setattr__
+        for key, default in cls._field_defaults:
+            setter(self, key, kwargs.get(key, default))
+        for key in cls._private_slots:
+            setter(self, key, None)
+        if _validation_enabled:
+            self.__validate__()
+
+    @classmethod
+    def _validate_fields(cls, kwargs):
+        for key, value in kwargs.items():
+            field = cls._fields.get(key)
+            if field is None:
+                raise TypeError(f"{cls.__name__}: got an unexpected keyword argument '{key}'")
+            if value is not None:
+                field.validate(key, value)
+        for key in cls._required:
+            if kwargs.get(key) is None:
+                raise TypeError(f"{cls.__name__}: missing a required argument: '{key}'")
+
+    def __validate__(self):
+        pass
+
+    # builds from trusted values in field order, such as deserialized ones: no validation or coercion
+    @classmethod
+    def _from_values(cls, values: tuple):
+        instances = cls._instances if _interning_enabled else None
+        if instances is not None:
+            canonical = instances.get(values)
+            if canonical is not None:
+                return canonical
+        instance = object.__new__(cls)
+        setter = object.__setattr__
+        for key, value in zip(cls._field_names, values):
+            setter(instance, key, value)
+        for key in cls._private_slots:
+            setter(instance, key, None)
+        if instances is not None:
+            instances[values] = instance
+        return instance
+
+    def _replace(self, **changes):
+        values = dict(zip(self._field_names, self._field_values()))
+        values.update(changes)
+        return type(self)(**values)
+
+    def __setattr__(self, key, value):
+        raise ValueError(f"{type(self).__name__}: Structure is immutable")
+
+    def __delattr__(self, key):
+        raise ValueError(f"{type(self).__name__}: Structure is immutable")
+
+    def _field_values(self) -> tuple:
+        return tuple([getattr(self, key) for key in self._field_names])
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(self) is not type(other):
+            return False
+        return self._field_values() == other._field_values()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((type(self), self._field_values()))
+
+    def __repr__(self):
+        props = ", ".join([f"{key} = {value!r}" for key, value in zip(self._field_names, self._field_values())
+                           if value is not None])
+        return f"<Instance of {type(self).__name__}. Properties: {props}>"
+
+
+# structurally identical instances are interned into one canonical object, with the hash computed once
+class InternedStructure(ImmutableStructure):
+    __slots__ = ('_hash', '__weakref__')
+    _interned = True
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(self) is not type(other) or hash(self) != hash(other):
+            return False
+        return self._field_values() == other._field_values()
+
+    def __hash__(self):
+        h = self._hash
+        if h is None:
+            h = hash((type(self), self._field_values()))
+            object.__setattr__(self, '_hash', h)
+        return h
@@ -0,0 +1,474 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from lxml import etree
+
+from dollarxpy.basic_path import BasicPath, PathKind
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.npath import NPath
+from dollarxpy.path_utils import _element_name, opposite_relation
+from dollarxpy.planner import MAX_CONTEXTS
+from dollarxpy.queries import filter_by_npath
+from dollarxpy.snapshot import Snapshot, _first_text, compile_xpath
+
+# Successive snapshots of the same page, taken after each click of a test, mostly differ in a few subtrees. A
+# SnapshotDiff finds them: the common prefix and suffix of the two serializations bound the change to the
+# deepest element open across it, and inside that element the children are aligned by their serialization,
+# down to the elements that differ. Elements outside the changed subtrees are paired with their counterparts.
+#
+# A path whose match on an element only depends on the element itself, its ancestors, its descendants or its
+# position among its siblings is then re-evaluated on the elements a change can affect, with its single-step
+# (alternate) xpath; its other matches are the counterparts of the previous ones. Paths on the following or
+# preceding elements, on siblings, occurrence numbers and raw xpath are evaluated on the whole document again.
+
+Query = Union[BasicPath, NPath]
+
+# dependencies of a match, besides the element's own name, attributes and first text node
+_ANCESTORS, _DESCENDANTS, _POSITIONS = 1, 2, 4
+
+# what a change did to an element of the new snapshot: its own facts changed, those of an ancestor did, it is a
+# child of an element whose children were inserted or removed, or it is inside such a child, or its subtree changed
+_CHANGED, _UNDER_CHANGED, _RESHAPED, _UNDER_RESHAPED, _RECURSED = 1, 2, 4, 8, 16
+
+# mapping a previous match to its counterpart walks up to the nearest paired element; past this many matches,
+# evaluating the path on the document is cheaper
+_MAX_MAPPED_MATCHES = 2000
+
+# aligning the changed middle of two long lists of children is quadratic on repeated children, past this many
+# pairs they are paired by position
+_MAX_ALIGNED_PAIRS = 1 << 20
+
+_special_delimiters = ((b'<!--', b'-->'), (b'<?', b'?>'), (b'<![CDATA[', b']]>'))
+
+
+#########################################
+# dependencies
+
+class _NotLocal(Exception):
+    pass
+
+
+def _axis_dependencies(axis: str, target: BasicPath) -> int:
+    found = _path_dependencies(target)
+    if axis in ('ancestor', 'parent'):
+        if found & _DESCENDANTS:
+            raise _NotLocal(f"{axis}::{target} depends on the descendants of the {axis}")
+        return found | _ANCESTORS
+    if axis in ('child', 'descendant'):
+        return found | _DESCENDANTS
+    raise _NotLocal(f"{axis}::{target} depends on elements outside the element and its ancestors")
+
+
+def _property_dependencies(prop: ElementProperty) -> int:
+    if prop.xpath is not None:
+        raise _NotLocal(f"'{prop}' is a raw xpath property")
+    kind = prop.kind
+    if kind in (PropertyKind.INDEX, PropertyKind.INDEX_RANGE):
+        raise _NotLocal(f"'{prop}' depends on the other matches")
+    if kind in (PropertyKind.LAST_SIBLING, PropertyKind.ONLY_CHILD, PropertyKind.NTH_SIBLING,
+                PropertyKind.NTH_FROM_LAST_SIBLING):
+        return _POSITIONS
+    if kind is PropertyKind.N_CHILDREN or kind.name.startswith('AGGREGATED'):
+        return _DESCENDANTS
+    if kind is PropertyKind.RELATION:
+        found = 0
+        for target in prop.args[1]:
+            found |= _axis_dependencies(prop.args[0], target)
+        return found
+    if kind in (PropertyKind.AND, PropertyKind.OR, PropertyKind.NOT):
+        found = 0
+        for p in prop.args:
+            found |= _property_dependencies(p)
+        return found
+    return 0
+
+
+def _properties_dependencies(props) -> int:
+    found = 0
+    for prop in props:
+        found |= _property_dependencies(prop)
+    return found
+
+
+def _path_dependencies(path: BasicPath) -> int:
+    kind = path.kind
+    if kind is PathKind.ELEMENT:
+        if path.inside_xpath or path.alternate_xpath:
+            raise _NotLocal(f"{path}: raw xpath")
+        if path.xpath != '*' and not _element_name.match(path.xpath):
+            raise _NotLocal(f"{path}: '{path.xpath}' is not a plain element name")
+        return _properties_dependencies(path.element_properties)
+    if kind is PathKind.PREDICATE:
+        return _path_dependencies(path.operands[0]) | _properties_dependencies(path.element_properties)
+    if kind is PathKind.RELATION:
+        subject, target = path.operands
+        return _path_dependencies(subject) | _axis_dependencies(opposite_relation(path.relation), target)
+    if kind is PathKind.UNION:
+        return _path_dependencies(path.operands[0]) | _path_dependencies(path.operands[1])
+    if kind in (PathKind.NEGATION, PathKind.TOP_LEVEL):
+        return _path_dependencies(path.operands[0])
+    raise _NotLocal(f"{path}: occurrence numbers depend on the other matches")
+
+
+def _dependencies(path: BasicPath) -> Optional[int]:
+    try:
+        return _path_dependencies(path)
+    except _NotLocal:
+        return None
+
+
+# why the path is evaluated on the whole document of every snapshot, None when it is re-evaluated on the changed
+# subtrees only
+def not_incremental_reason(path: Query) -> Optional[str]:
+    try:
+        _path_dependencies(path.path if isinstance(path, NPath) else path)
+    except _NotLocal as e:
+        return str(e)
+    return None
+
+
+#########################################
+# diffing
+
+# the serialization of a tree, with the elements started and ended before an offset counted on it: tags are
+# '<name', '</name' and '/>', text and attribute values have them escaped, comments, processing instructions
+# and CDATA do not and are counted apart
+class _Markup:
+    __slots__ = ('data', 'special_starts', 'special_ends', 'special_counts')
+
+    def __init__(self, root):
+        data = self.data = etree.tostring(root)
+        spans = []
+        following = {opening: data.find(opening) for opening, _ in _special_delimiters}
+        end = 0
+        while True:
+            for opening, _ in _special_delimiters:
+                if 0 <= following[opening] < end:
+                    following[opening] = data.find(opening, end)
+            starting = [(following[opening], opening, closing) for opening, closing in _special_delimiters
+                        if following[opening] >= 0]
+            if not starting:
+                break
+            start, opening, closing = min(starting)
+            end = data.find(closing, start + len(opening))
+            end = len(data) if end < 0 else end + len(closing)
+            spans.append((start, end))
+        self.special_starts = [start for start, _ in spans]
+        self.special_ends = [end for _, end in spans]
+        counts, starts, ends = [(0, 0)], 0, 0
+        for start, end in spans:
+            lt, lt_slash = data.count(b'<', start, end), data.count(b'</', start, end)
+            starts += lt - lt_slash
+            ends += lt_slash + data.count(b'/>', start, end)
+            counts.append((starts, ends))
+        self.special_counts = counts
+
+    # the offset moved out of a comment or a tag, before it or after it
+    def boundary(self, offset: int, forward: bool) -> int:
+        data = self.data
+        i = bisect_right(self.special_starts, offset - 1) - 1
+        if i >= 0 and self.special_ends[i] > offset:
+            return self.special_ends[i] if forward else self.special_starts[i]
+        opening = data.rfind(b'<', 0, offset)
+        if opening > data.rfind(b'>', 0, offset):
+            return data.find(b'>', offset) + 1 if forward else opening
+        return offset
+
+    # elements started and ended before the offset, which is outside of comments and tags
+    def counts(self, offset: int) -> Tuple[int, int]:
+        data = self.data
+        lt_slash = data.count(b'</', 0, offset)
+        special_starts, special_ends = self.special_counts[bisect_right(self.special_ends, offset)]
+        return data.count(b'<', 0, offset) - lt_slash - special_starts, \
+            lt_slash + data.count(b'/>', 0, offset) - special_ends
+
+    # the elements open at the offset, from the root down
+    def open_elements(self, root, offset: int) -> list:
+        started, ended = self.counts(offset)
+        if not started:
+            return []
+        element = compile_xpath('(descendant-or-self::*)[$n]')(root, n=started)[0]
+        chain = [element, *element.iterancestors()]
+        chain.reverse()
+        return chain[:started - ended]
+
+
+def _common_prefix(a: bytes, b: bytes) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: bytes, b: bytes, limit: int) -> int:
+    lo, hi, la, lb = 0, limit, len(a), len(b)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[la - mid:la - lo] == b[lb - mid:lb - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _shared_depth(a: list, b: list) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x is not y:
+            break
+        n += 1
+    return n
+
+
+def _is_element(node) -> bool:
+    return isinstance(node.tag, str)
+
+
+def _inherited(bits: int) -> int:
+    return (_UNDER_CHANGED if bits & (_CHANGED | _UNDER_CHANGED) else 0) | \
+        (_UNDER_RESHAPED if bits & (_RESHAPED | _UNDER_RESHAPED) else 0)
+
+
+# the changed subtrees between two snapshots of the same page: elements whose own attributes or first text changed,
+# the roots of inserted subtrees, and of removed ones; every other element of the old snapshot has a counterpart
+class SnapshotDiff:
+    __slots__ = ('old', 'new', 'changed', 'inserted', 'removed', 'reshaped', 'recursed', '_pairs')
+
+    def __init__(self, old: Snapshot, new: Snapshot, old_markup: Optional[_Markup] = None,
+                 new_markup: Optional[_Markup] = None):
+        self.old, self.new = old, new
+        self.changed: List[etree._Element] = []
+        self.inserted: List[etree._Element] = []
+        self.removed = set()
+        # children of the elements whose children were inserted or removed, and the elements whose subtree changed
+        self.reshaped: List[etree._Element] = []
+        self.recursed: List[etree._Element] = []
+        self._pairs: Dict[etree._Element, Tuple[etree._Element, int]] = {}
+        old_markup = old_markup or _Markup(old.root)
+        new_markup = new_markup or _Markup(new.root)
+        self._locate(old_markup, new_markup)
+
+    @property
+    def unchanged(self) -> bool:
+        return not (self.changed or self.inserted or self.removed or self.recursed)
+
+    def _locate(self, old_markup: _Markup, new_markup: _Markup):
+        old_root, new_root = self.old.root, self.new.root
+        a, b = old_markup.data, new_markup.data
+        prefix = _common_prefix(a, b)
+        if prefix == len(a) == len(b):
+            self._pairs[old_root] = (new_root, 0)
+            return
+        suffix = _common_suffix(a, b, min(len(a), len(b)) - prefix)
+        start = old_markup.boundary(prefix, False)
+        old_chain = old_markup.open_elements(old_root, start)
+        new_chain = new_markup.open_elements(new_root, start)
+        depth = min(_shared_depth(old_chain, old_markup.open_elements(
+                        old_root, old_markup.boundary(len(a) - suffix, True))),
+                    _shared_depth(new_chain, new_markup.open_elements(
+                        new_root, new_markup.boundary(len(b) - suffix, True))))
+        if not depth:
+            if old_root.tag != new_root.tag:
+                self.removed.add(old_root)
+                self.inserted.append(new_root)
+                return
+            old_chain, new_chain, depth = [old_root], [new_root], 1
+        for old, new in zip(old_chain[:depth - 1], new_chain[:depth - 1]):
+            self._pairs[old] = (new, _RECURSED)
+            self.recursed.append(new)
+        self._align(old_chain[depth - 1], new_chain[depth - 1], 0)
+
+    def _align(self, old, new, bits: int):
+        bits |= _RECURSED
+        if dict(old.attrib) != dict(new.attrib) or _first_text(old) != _first_text(new):
+            bits |= _CHANGED
+            self.changed.append(new)
+        self._pairs[old] = (new, bits)
+        self.recursed.append(new)
+
+        old_children, new_children = list(old), list(new)
+        old_markup = [etree.tostring(c) for c in old_children]
+        new_markup = [etree.tostring(c) for c in new_children]
+        pairs, removed, inserted = [], [], []
+        lo, old_hi, new_hi = 0, len(old_children), len(new_children)
+        while lo < old_hi and lo < new_hi and old_markup[lo] == new_markup[lo]:
+            pairs.append((old_children[lo], new_children[lo], True))
+            lo += 1
+        suffix = []
+        while old_hi > lo and new_hi > lo and old_markup[old_hi - 1] == new_markup[new_hi - 1]:
+            old_hi, new_hi = old_hi - 1, new_hi - 1
+            suffix.append((old_children[old_hi], new_children[new_hi], True))
+        if (old_hi - lo) * (new_hi - lo) > _MAX_ALIGNED_PAIRS:
+            opcodes = [('replace', lo, old_hi, lo, new_hi)]
+        else:
+            opcodes = SequenceMatcher(None, old_markup[lo:old_hi], new_markup[lo:new_hi],
+                                      autojunk=False).get_opcodes()
+            opcodes = [(tag, i1 + lo, i2 + lo, j1 + lo, j2 + lo) for tag, i1, i2, j1, j2 in opcodes]
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                pairs.extend((old_children[i1 + k], new_children[j1 + k], True) for k in range(i2 - i1))
+                continue
+            n = min(i2 - i1, j2 - j1)
+            for old_child, new_child in zip(old_children[i1:i1 + n], new_children[j1:j1 + n]):
+                if old_child.tag == new_child.tag:
+                    pairs.append((old_child, new_child, False))
+                else:
+                    removed.append(old_child)
+                    inserted.append(new_child)
+            removed.extend(old_children[i1 + n:i2])
+            inserted.extend(new_children[j1 + n:j2])
+        pairs.extend(reversed(suffix))
+
+        reshaped = bool(removed or inserted)
+        self.removed.update(c for c in removed if _is_element(c))
+        self.inserted.extend(c for c in inserted if _is_element(c))
+        child_bits = _inherited(bits) | (_RESHAPED if reshaped else 0)
+        for old_child, new_child, equal in pairs:
+            if not _is_element(old_child):
+                continue
+            if reshaped:
+                self.reshaped.append(new_child)
+            if equal:
+                self._pairs[old_child] = (new_child, child_bits)
+            else:
+                self._align(old_child, new_child, child_bits)
+
+    # the counterpart of an element of the old snapshot and what the change did to it, None when it was removed
+    def _counterpart(self, element) -> Optional[Tuple[etree._Element, int]]:
+        pairs, removed = self._pairs, self.removed
+        path = []
+        while element not in pairs:
+            if element in removed:
+                return None
+            path.append(element)
+            element = element.getparent()
+            if element is None:
+                return None
+        for child in reversed(path):
+            if child not in pairs:
+                # the children of a paired element outside the changed subtrees are paired in order
+                new, bits = pairs[element]
+                inherited = _inherited(bits)
+                for old_child, new_child in zip(element, new):
+                    pairs.setdefault(old_child, (new_child, inherited))
+            element = child
+        return pairs[element]
+
+    # the element of the new snapshot that the element of the old snapshot became, None when it was removed
+    def counterpart(self, element) -> Optional[etree._Element]:
+        found = self._counterpart(element)
+        return None if found is None else found[0]
+
+    def _candidates(self, dependencies: int) -> Tuple[list, list]:
+        roots, nodes = list(self.inserted), list(self.changed)
+        if dependencies & _ANCESTORS:
+            roots.extend(self.changed)
+            if dependencies & _POSITIONS:
+                roots.extend(self.reshaped)
+        if dependencies & _POSITIONS:
+            nodes.extend(self.reshaped)
+        if dependencies & _DESCENDANTS:
+            nodes.extend(self.recursed)
+        return roots, nodes
+
+    def __repr__(self):
+        return f"SnapshotDiff(changed={len(self.changed)}, inserted={len(self.inserted)}, " \
+               f"removed={len(self.removed)})"
+
+
+def _stale_bits(dependencies: int) -> int:
+    bits = _CHANGED
+    if dependencies & _ANCESTORS:
+        bits |= _UNDER_CHANGED
+    if dependencies & _POSITIONS:
+        bits |= _RESHAPED | (_UNDER_RESHAPED if dependencies & _ANCESTORS else 0)
+    if dependencies & _DESCENDANTS:
+        bits |= _RECURSED
+    return bits
+
+
+#########################################
+# re-evaluation
+
+# The matches of the registered paths over successive snapshots of the same page: each update diffs the new
+# snapshot against the previous one and re-evaluates the paths on the changed subtrees only.
+class SnapshotSeries:
+    __slots__ = ('snapshot', 'reused', 'updated', 'evaluated', '_markup', '_matches')
+
+    def __init__(self, paths: Sequence[Query] = ()):
+        self.snapshot: Optional[Snapshot] = None
+        # paths whose matches were the counterparts of the previous ones, were re-evaluated on the changed
+        # subtrees, and were evaluated on the whole document
+        self.reused = self.updated = self.evaluated = 0
+        self._markup: Optional[_Markup] = None
+        # the dependencies of every registered path (None when it is not local) and its matches
+        self._matches: Dict[BasicPath, Tuple[Optional[int], list]] = {}
+        for path in paths:
+            self.register(path)
+
+    @property
+    def paths(self) -> List[BasicPath]:
+        return list(self._matches)
+
+    def register(self, path: Query):
+        path = path.path if isinstance(path, NPath) else path
+        if path not in self._matches:
+            matches = [] if self.snapshot is None else self._evaluate(self.snapshot, path)
+            self._matches[path] = _dependencies(path), matches
+
+    def _evaluate(self, snapshot: Snapshot, path: BasicPath) -> list:
+        self.evaluated += 1
+        return snapshot.find_all(path)
+
+    # takes the next snapshot of the page, returns its diff with the previous one, None for the first
+    def update(self, snapshot: Snapshot) -> Optional[SnapshotDiff]:
+        markup = _Markup(snapshot.root)
+        if self.snapshot is None:
+            diff = None
+            self._matches = {path: (dependencies, self._evaluate(snapshot, path))
+                             for path, (dependencies, _) in self._matches.items()}
+        else:
+            diff = SnapshotDiff(self.snapshot, snapshot, self._markup, markup)
+            self._matches = {path: (dependencies, self._updated(diff, path, dependencies, matches))
+                             for path, (dependencies, matches) in self._matches.items()}
+        self.snapshot, self._markup = snapshot, markup
+        return diff
+
+    def _updated(self, diff: SnapshotDiff, path: BasicPath, dependencies: Optional[int], previous: list) -> list:
+        if len(previous) > _MAX_MAPPED_MATCHES or (dependencies is None and not diff.unchanged):
+            return self._evaluate(diff.new, path)
+        stale = _stale_bits(dependencies or 0)
+        kept = []
+        for element in previous:
+            found = diff._counterpart(element)
+            if found is not None and not found[1] & stale:
+                kept.append(found[0])
+        if diff.unchanged:
+            self.reused += 1
+            return kept
+        roots, nodes = diff._candidates(dependencies)
+        if len(roots) > MAX_CONTEXTS:
+            return self._evaluate(diff.new, path)
+        self.updated += 1
+        step = path.get_alternate_xpath()
+        found = compile_xpath(f"$roots/descendant-or-self::{step} | $nodes[self::{step}]")(
+            diff.new.root, roots=roots, nodes=nodes)
+        if not kept or not found:
+            return kept or found
+        return compile_xpath("$kept | $found")(diff.new.root, kept=kept, found=found)
+
+    def find_all(self, path: Query) -> list:
+        registered = self._matches.get(path.path if isinstance(path, NPath) else path)
+        if registered is None:
+            raise ValueError(f"{path} is not registered")
+        return filter_by_npath(path, list(registered[1]))
+
+    def statistics(self) -> Dict[str, int]:
+        return {'reused': self.reused, 'updated': self.updated, 'evaluated': self.evaluated}
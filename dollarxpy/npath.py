@@ -1,6 +1,5 @@
-from typedpy import ImmutableStructure, PositiveInt
-
 from dollarxpy.basic_path import BasicPath
+from dollarxpy.immutable import ImmutableStructure, InternedStructure, PositiveInt
 from dollarxpy.relation_operator import RelationOpField, RelationOperation
 
 
@@ -14,11 +13,13 @@ def exactly(n):
     return _NPathBuilder(n = n, qualifier = RelationOperation.Exactly)
 
 
-class NPath(ImmutableStructure):
+class NPath(InternedStructure):
     path = BasicPath
     n = PositiveInt
     qualifier = RelationOpField
 
+    def __str__(self):
+        return f"{self.qualifier.as_english().strip() or 'exactly'} {self.n} occurrences of {self.path}"
 
 
 class _NPathBuilder(ImmutableStructure):
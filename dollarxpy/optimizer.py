@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+import dollarxpy.xpath_utils as xpath_utils
+from dollarxpy.basic_path import BasicPath, PathKind
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.path_utils import _element_name, document_xpath, has_heirarchy, scoped_xpath, \
+    transform_xpath_to_correct_axis
+from dollarxpy.relation_operator import RelationOperation
+
+# Rewrites a path into an equivalent one whose rendered xpath is cheaper for lxml/libxml2 and browsers.
+# The optimized tree is only meant for rendering xpath: cheaper properties become raw properties that
+# keep the original text.
+
+_ascii_letters = re.compile(r'[A-Za-z]')
+_whitespace = re.compile(r'\s')
+
+_reverse_axes = ("preceding-sibling::", "preceding::", "ancestor::", "parent::")
+
+
+def _is_single_step(expression: str) -> bool:
+    if expression.startswith('('):
+        return False
+    depth, quote = 0, None
+    for c in expression:
+        if quote:
+            quote = None if c == quote else quote
+        elif c in '\'"':
+            quote = c
+        elif c in '[(':
+            depth += 1
+        elif c in '])':
+            depth -= 1
+        elif depth == 0 and c in '/|':
+            return False
+    return True
+
+
+def _at_least(expression: str, k: int) -> str:
+    return expression if k <= 1 else f"{expression}[{k}]"
+
+
+# libxml2 walks the whole axis inside not(); a positional limit makes it stop at the nearest node
+def _none(expression: str) -> str:
+    return f"not({expression}[1])" if expression.startswith(_reverse_axes) else f"not({expression})"
+
+
+def _count_condition(expression: str, qualifier: RelationOperation, n: int) -> Optional[str]:
+    if not _is_single_step(expression):
+        return None
+    if qualifier is RelationOperation.OrMore:
+        return "true()" if n <= 0 else _at_least(expression, n)
+    if qualifier is RelationOperation.OrLess:
+        return _none(expression) if n == 0 else f"not({expression}[{n + 1}])"
+    if n == 0:
+        return _none(expression)
+    return f"{_at_least(expression, n)} and not({expression}[{n + 1}])"
+
+
+#########################################
+# properties
+
+def _class_condition(name: str) -> Optional[str]:
+    if not name or _whitespace.search(name):
+        return None
+    # the plain substring test is cheap and rejects most elements before normalize-space() and concat()
+    return f"contains(@class, '{name}') and contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _classes_condition(names, op: str) -> Optional[str]:
+    conditions = [_class_condition(name) for name in names]
+    if not conditions or None in conditions:
+        return None
+    return f" {op} ".join([f"({c})" for c in conditions]) if len(conditions) > 1 else conditions[0]
+
+
+def _none_of_classes_condition(*names) -> Optional[str]:
+    condition = _classes_condition(names, "or")
+    return None if condition is None else f"not({condition})"
+
+
+def _text_condition(kind: PropertyKind, text: str) -> str:
+    aggregated = kind.name.startswith('AGGREGATED')
+    subject = "normalize-space()" if aggregated else "text()"
+    term = text.lower()
+    # translate() only folds ascii letters, so without any in the term it cannot change the outcome
+    folded = f"translate({subject}, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')" \
+        if _ascii_letters.search(term) else subject
+    if kind in (PropertyKind.TEXT_EQUALS, PropertyKind.AGGREGATED_TEXT_EQUALS):
+        # string() keeps the first-text-node semantics of the translate() form
+        return f"{folded if folded != 'text()' else 'string(text())'} = '{term}'"
+    if kind in (PropertyKind.TEXT_CONTAINS, PropertyKind.AGGREGATED_TEXT_CONTAINS):
+        return f"contains({folded}, '{term}')"
+    if kind in (PropertyKind.TEXT_STARTS_WITH, PropertyKind.AGGREGATED_TEXT_STARTS_WITH):
+        return f"starts-with({folded}, '{term}')"
+    return f"substring({folded}, string-length({subject}) - string-length('{text}') +1) = '{term}'"
+
+
+def _relation_condition(relation, paths, npath, text_prefix, pluralize) -> Optional[str]:
+    conditions = []
+    for path in paths:
+        target = transform_xpath_to_correct_axis(optimize(path))
+        if relation == "sibling":
+            if npath is not None:
+                return None
+            conditions.append(f"(preceding-sibling::{target}) or (following-sibling::{target})")
+            continue
+        expression = f"{relation}::{target}"
+        if npath is None:
+            conditions.append(expression)
+            continue
+        condition = _count_condition(expression, npath.qualifier, npath.n)
+        conditions.append(condition if condition is not None
+                          else f"count({expression}){npath.qualifier.as_xpath()}{npath.n}")
+    return f"({') and ('.join(conditions)})" if len(conditions) > 1 else conditions[0]
+
+
+_property_rewrites = {
+    PropertyKind.CLASS: _class_condition,
+    PropertyKind.CLASSES: lambda *names: _classes_condition(names, "and"),
+    PropertyKind.ANY_OF_CLASSES: lambda *names: _classes_condition(names, "or"),
+    PropertyKind.NONE_OF_CLASSES: _none_of_classes_condition,
+    PropertyKind.TEXT_EQUALS: lambda text: _text_condition(PropertyKind.TEXT_EQUALS, text),
+    PropertyKind.TEXT_CONTAINS: lambda text: _text_condition(PropertyKind.TEXT_CONTAINS, text),
+    PropertyKind.TEXT_STARTS_WITH: lambda text: _text_condition(PropertyKind.TEXT_STARTS_WITH, text),
+    PropertyKind.TEXT_ENDS_WITH: lambda text: _text_condition(PropertyKind.TEXT_ENDS_WITH, text),
+    PropertyKind.AGGREGATED_TEXT_EQUALS: lambda text: _text_condition(PropertyKind.AGGREGATED_TEXT_EQUALS, text),
+    PropertyKind.AGGREGATED_TEXT_CONTAINS: lambda text: _text_condition(PropertyKind.AGGREGATED_TEXT_CONTAINS, text),
+    PropertyKind.AGGREGATED_TEXT_STARTS_WITH:
+        lambda text: _text_condition(PropertyKind.AGGREGATED_TEXT_STARTS_WITH, text),
+    PropertyKind.AGGREGATED_TEXT_ENDS_WITH: lambda text: _text_condition(PropertyKind.AGGREGATED_TEXT_ENDS_WITH, text),
+    PropertyKind.LAST_SIBLING: lambda: _none("following-sibling::*"),
+    PropertyKind.ONLY_CHILD: lambda: f"{_none('preceding-sibling::*')} and {_none('following-sibling::*')}",
+    PropertyKind.N_CHILDREN: lambda n, relation: _count_condition("*", relation, n),
+    PropertyKind.NTH_SIBLING: lambda index: _count_condition("preceding-sibling::*", RelationOperation.Exactly, index),
+    PropertyKind.NTH_FROM_LAST_SIBLING:
+        lambda index: _count_condition("following-sibling::*", RelationOperation.Exactly, index),
+    PropertyKind.RELATION: _relation_condition,
+}
+
+
+def optimize_property(prop: ElementProperty) -> ElementProperty:
+    if prop.xpath is not None:
+        return prop
+    if prop.kind in (PropertyKind.AND, PropertyKind.OR, PropertyKind.NOT):
+        args = tuple([optimize_property(p) for p in prop.args])
+        return prop if args == prop.args else ElementProperty(kind=prop.kind, args=args)
+    rewrite = _property_rewrites.get(prop.kind)
+    xpath = rewrite(*prop.args) if rewrite else None
+    if xpath is None or xpath == prop.to_xpath():
+        return prop
+    return ElementProperty(xpath=xpath, text=str(prop))
+
+
+def _optimize_properties(props) -> tuple:
+    return tuple([optimize_property(p) for p in props])
+
+
+#########################################
+# paths
+
+def _optimize_element(path: BasicPath) -> BasicPath:
+    props = _optimize_properties(path.element_properties)
+    if not path.alternate_xpath and _element_name.match(path.xpath):
+        # a plain node test instead of the default *[self::tag]
+        return path._replace(alternate_xpath=path.xpath, element_properties=props)
+    return path._replace(element_properties=props)
+
+
+def _union_leaves(path: BasicPath):
+    if path.kind is PathKind.UNION:
+        for operand in path.operands:
+            yield from _union_leaves(operand)
+    else:
+        yield path
+
+
+def _optimize_union(path: BasicPath) -> BasicPath:
+    # nested unions render as *[self::*[self::a | self::b] | self::c]; flatten them to a single predicate
+    leaves = [transform_xpath_to_correct_axis(optimize(p)) for p in _union_leaves(path)]
+    xpath = f"*[{' | '.join([f'self::{leaf}' for leaf in leaves])}]"
+    return BasicPath(xpath=xpath, alternate_xpath=xpath, xpath_explanation=str(path))
+
+
+def _optimize_operands(path: BasicPath) -> BasicPath:
+    return path._replace(operands=tuple([optimize(p) for p in path.operands]),
+                         element_properties=_optimize_properties(path.element_properties))
+
+
+_path_optimizers = {
+    PathKind.ELEMENT: _optimize_element,
+    PathKind.PREDICATE: _optimize_operands,
+    PathKind.RELATION: _optimize_operands,
+    PathKind.OCCURRENCE: _optimize_operands,
+    PathKind.UNION: _optimize_union,
+    PathKind.NEGATION: _optimize_operands,
+    PathKind.TOP_LEVEL: _optimize_operands,
+}
+
+
+# kept on the path itself, like its rendered xpath, so the path can still be collected
+def optimize(path: BasicPath) -> BasicPath:
+    optimized = path._optimized_cache
+    if optimized is None:
+        optimized = _path_optimizers[path.kind](path)
+        object.__setattr__(path, '_optimized_cache', optimized)
+    return optimized
+
+
+def optimized_xpath(path: BasicPath) -> str:
+    return document_xpath(optimize(path))
+
+
+def optimized_npath_condition_xpath(npath) -> str:
+    return f"count({optimized_xpath(npath.path)}){npath.qualifier.as_xpath()}{npath.n}"
+
+
+# raw xpath with a hierarchy, like custom_element('div/span'), has no single-step form
+def _has_single_step_form(path: BasicPath) -> bool:
+    if path.kind is PathKind.ELEMENT:
+        return not path.inside_xpath and bool(path.alternate_xpath or not has_heirarchy(path.xpath))
+    return all(_has_single_step_form(operand) for operand in path.operands)
+
+
+# Inside a context node (see Scope), a path is rendered in its single-step form: its relations are predicates that
+# look at the whole document, like td[ancestor::table] from a row, whichever form it renders to from the document
+# root. Raw xpath with a hierarchy is matched below the node as it is written.
+def optimized_scoped_xpath(path: BasicPath) -> str:
+    optimized = optimize(path)
+    xpath = optimized.get_alternate_xpath() if _has_single_step_form(optimized) else optimized.get_xpath()
+    return scoped_xpath(xpath_utils.inside_top_level(xpath))
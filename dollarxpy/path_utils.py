@@ -1,3 +1,13 @@
+import re
+
+import dollarxpy.xpath_utils as xpath_utils
+
+# an element name rather than an xpath expression: compared with the tag of an element, or rendered as a node test
+_element_name = re.compile(r'^[A-Za-z_][\w.\-]*$')
+
+# an xpath that selects by position, which depends on the other nodes of its context
+_positional = re.compile(r'position\(\)|last\(\)|\[\s*\d')
+
 
 def has_heirarchy(xpath) -> object:
     return '/' in xpath
@@ -21,3 +31,18 @@ def opposite_relation(relation: str):
     opposite_relations.update(reverse_relations)
     return opposite_relations[relation]
 
+
+def document_xpath(path) -> str:
+    return xpath_utils.inside_top_level(path.get_xpath())
+
+
+def npath_condition_xpath(npath) -> str:
+    return f"count({document_xpath(npath.path)}){npath.qualifier.as_xpath()}{npath.n}"
+
+
+# a document xpath matched inside a context node: //x becomes .//x, (//x)[1] becomes (.//x)[1]
+def scoped_xpath(xpath: str) -> str:
+    opening = len(xpath) - len(xpath.lstrip('('))
+    if xpath.startswith('//', opening):
+        return f"{xpath[:opening]}.{xpath[opening:]}"
+    return f".//{xpath}"
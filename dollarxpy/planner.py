@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+from dollarxpy.basic_path import BasicPath, PathKind
+from dollarxpy.path_utils import _positional, has_heirarchy
+
+# Batch plans for paths that share sub-paths, like the selectors of a page object that all sit inside the same
+# form or table. Every path renders to its own xpath from the document root, so a batch evaluates the shared
+# container once per selector. A plan evaluates each sub-path that is the relation target of two or more paths
+# (or is itself in the batch) once, and the paths related to it from its nodes: subject.descendant_of(target)
+# becomes descendant::subject from every target node, the step that the xpath of the relation already ends with.
+#
+# The steps of a plan are in evaluation order. A step with a base is its xpath evaluated from the nodes of the
+# earlier step at that index; the others are evaluated from the document, rendered as the evaluator does. From
+# more than MAX_CONTEXTS nodes, merging the results of every node in document order costs more than scanning the
+# document once, and the step is evaluated from the document as well.
+
+MAX_CONTEXTS = 32
+
+
+class PlanStep:
+    __slots__ = ('path', 'base', 'xpath')
+
+    def __init__(self, path: BasicPath, base: Optional[int], xpath: Optional[str]):
+        self.path = path
+        self.base = base
+        self.xpath = xpath
+
+    def __repr__(self):
+        return f"PlanStep({self.path}, base={self.base}, xpath={self.xpath!r})"
+
+
+class BatchPlan:
+    __slots__ = ('steps', 'outputs')
+
+    def __init__(self, steps: List[PlanStep], outputs: List[int]):
+        self.steps = steps
+        self.outputs = outputs
+
+    @property
+    def shares(self) -> bool:
+        return any(step.base is not None for step in self.steps)
+
+    def __repr__(self):
+        return f"BatchPlan(steps={self.steps}, outputs={self.outputs})"
+
+
+# the xpath step from the target of a relation to its subject, when the subject is a single step
+def relative_step(path: BasicPath) -> Optional[str]:
+    if path.kind is not PathKind.RELATION:
+        return None
+    subject = path.operands[0]
+    if subject._get_inside_xpath():
+        return None
+    xpath = subject.get_xpath()
+    step = subject.get_alternate_xpath() if has_heirarchy(xpath) else xpath
+    if _positional.search(step):
+        return None
+    return f'{path.relation}::{step}'
+
+
+def _targets(path: BasicPath) -> List[BasicPath]:
+    found = []
+    while relative_step(path) is not None:
+        path = path.operands[1]
+        found.append(path)
+    return found
+
+
+def _plan(paths: Sequence[BasicPath]) -> BatchPlan:
+    requested = set(paths)
+    uses: Dict[BasicPath, int] = {}
+    for path in requested:
+        for target in set(_targets(path)):
+            uses[target] = uses.get(target, 0) + 1
+    shared = {target for target, n in uses.items() if n > 1 or target in requested}
+
+    anchored: Dict[BasicPath, bool] = {}
+
+    def is_anchored(path: BasicPath) -> bool:
+        found = anchored.get(path)
+        if found is None:
+            found = anchored[path] = path in shared or \
+                (relative_step(path) is not None and is_anchored(path.operands[1]))
+        return found
+
+    steps: List[PlanStep] = []
+    step_of: Dict[BasicPath, int] = {}
+
+    def step_for(path: BasicPath) -> int:
+        index = step_of.get(path)
+        if index is None:
+            relative = relative_step(path)
+            if relative is not None and is_anchored(path.operands[1]):
+                step = PlanStep(path, step_for(path.operands[1]), relative)
+            else:
+                step = PlanStep(path, None, None)
+            index = step_of[path] = len(steps)
+            steps.append(step)
+        return index
+
+    return BatchPlan(steps, [step_for(path) for path in paths])
+
+
+# evaluation steps for the paths: steps with a base are evaluated from the nodes of their base step
+def plan_batch(paths: Sequence[BasicPath]) -> BatchPlan:
+    # not cached: planning costs little next to evaluating, and a cache keyed by the paths would keep them alive
+    return _plan(paths)
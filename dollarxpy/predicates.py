@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Optional, Sequence, Tuple
+
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.snapshot import _ASCII_LOWER, _aggregated_text, _class_string, _first_text, _hidden, _text_matcher
+
+if TYPE_CHECKING:
+    from dollarxpy.dom_index import DomIndex
+
+# Properties compiled to python predicates over the nodes of a DomIndex: a node is its id in the index, read
+# through the index columns (sibling index, child count, parent) and its lxml element for attributes and text.
+# DomIndex runs them on the few candidates a selective step leaves, instead of building a mask over the whole
+# document for every property. Conjunctions run cheapest first and stop at the first failing check: structure
+# and attributes before own text, relations (one axis count over the document, then a lookup) and aggregated
+# text, which walks the subtree of every candidate.
+
+Predicate = Callable[['DomIndex', int], bool]
+
+_STRUCTURE, _ATTRIBUTE, _TEXT, _RELATION, _AGGREGATED_TEXT = range(5)
+
+_NEEDS_XPATH = object()
+
+
+def _following_siblings(index, i) -> int:
+    parent = index.parent[i]
+    return 0 if parent < 0 else int(index.child_count[parent] - index.sibling_index[i]) - 1
+
+
+# kept by the index: the string value of a candidate high in the tree is as long as the document
+def _lower_aggregated_text(index, i) -> str:
+    texts = index.aggregated_texts
+    text = texts.get(i)
+    if text is None:
+        text = texts[i] = _aggregated_text(index.elements[i]).translate(_ASCII_LOWER)
+    return text
+
+
+def _own_text(index, i) -> str:
+    return _first_text(index.elements[i]).translate(_ASCII_LOWER)
+
+
+def _text_predicate(text_of, kind: PropertyKind, term: str) -> Predicate:
+    matches = _text_matcher(kind, term)
+    return lambda index, i: matches(text_of(index, i))
+
+
+def _all_of(compiled: Sequence[Tuple[int, Predicate]]) -> Tuple[int, Predicate]:
+    ordered = [predicate for _, predicate in sorted(compiled, key=lambda c: c[0])]
+    if len(ordered) == 1:
+        return compiled[0]
+
+    def predicate(index, i):
+        for p in ordered:
+            if not p(index, i):
+                return False
+        return True
+    return max(cost for cost, _ in compiled), predicate
+
+
+def _any_of(compiled: Sequence[Tuple[int, Predicate]]) -> Tuple[int, Predicate]:
+    ordered = [predicate for _, predicate in sorted(compiled, key=lambda c: c[0])]
+
+    def predicate(index, i):
+        for p in ordered:
+            if p(index, i):
+                return True
+        return False
+    return max(cost for cost, _ in compiled), predicate
+
+
+def _relation_predicate(relation, paths, npath) -> Predicate:
+    if npath is None:
+        return lambda index, i: all(index.relation_counts(path, relation)[i] > 0 for path in paths)
+    qualifier, n = npath.qualifier, npath.n
+    return lambda index, i: all(qualifier.is_satisfied_by(int(index.relation_counts(path, relation)[i]), n)
+                                for path in paths)
+
+
+# cost and predicate, or None for raw xpath and positions in a step, which only xpath can answer
+def _compile(prop: ElementProperty) -> Optional[Tuple[int, Predicate]]:
+    if prop.xpath is not None:
+        return None
+    kind, args = prop.kind, prop.args
+    if kind is PropertyKind.CLASS:
+        token = f' {args[0]} '
+        return _ATTRIBUTE, lambda index, i: token in _class_string(index.elements[i])
+    if kind in (PropertyKind.CLASSES, PropertyKind.ANY_OF_CLASSES, PropertyKind.NONE_OF_CLASSES):
+        tokens = [f' {name} ' for name in args]
+        if kind is PropertyKind.CLASSES:
+            return _ATTRIBUTE, lambda index, i: all(t in classes for classes in [_class_string(index.elements[i])]
+                                                    for t in tokens)
+        found = lambda index, i: any(t in classes for classes in [_class_string(index.elements[i])] for t in tokens)
+        return _ATTRIBUTE, found if kind is PropertyKind.ANY_OF_CLASSES else lambda index, i: not found(index, i)
+    if kind is PropertyKind.CLASS_CONTAINING:
+        name = args[0]
+        return _ATTRIBUTE, lambda index, i: name in (index.elements[i].get('class') or '')
+    if kind is PropertyKind.ATTRIBUTE:
+        name, value = args
+        return _ATTRIBUTE, lambda index, i: index.elements[i].get(name) == value
+    if kind is PropertyKind.HIDDEN:
+        return _ATTRIBUTE, lambda index, i: _hidden(index.elements[i])
+    if kind is PropertyKind.LAST_SIBLING:
+        return _STRUCTURE, lambda index, i: _following_siblings(index, i) == 0
+    if kind is PropertyKind.ONLY_CHILD:
+        return _STRUCTURE, lambda index, i: index.sibling_index[i] == 0 and _following_siblings(index, i) == 0
+    if kind is PropertyKind.N_CHILDREN:
+        n, qualifier = args
+        return _STRUCTURE, lambda index, i: qualifier.is_satisfied_by(int(index.child_count[i]), n)
+    if kind is PropertyKind.NTH_SIBLING:
+        position = args[0]
+        return _STRUCTURE, lambda index, i: index.sibling_index[i] == position
+    if kind is PropertyKind.NTH_FROM_LAST_SIBLING:
+        position = args[0]
+        return _STRUCTURE, lambda index, i: _following_siblings(index, i) == position
+    if kind is PropertyKind.SOME_TEXT:
+        return _TEXT, lambda index, i: len(_first_text(index.elements[i])) > 0
+    if kind.name.startswith('TEXT'):
+        return _TEXT, _text_predicate(_own_text, kind, args[0])
+    if kind.name.startswith('AGGREGATED'):
+        return _AGGREGATED_TEXT, _text_predicate(_lower_aggregated_text, kind, args[0])
+    if kind is PropertyKind.RELATION:
+        return _RELATION, _relation_predicate(*args[:3])
+    if kind in (PropertyKind.AND, PropertyKind.OR):
+        compiled = [_compile(p) for p in args]
+        if None in compiled:
+            return None
+        return _all_of(compiled) if kind is PropertyKind.AND else _any_of(compiled)
+    if kind is PropertyKind.NOT:
+        compiled = _compile(args[0])
+        if compiled is None:
+            return None
+        cost, predicate = compiled
+        return cost, lambda index, i: not predicate(index, i)
+    return None
+
+
+# kept on the property itself, as its rendered xpath is; a property that needs xpath keeps _NEEDS_XPATH
+def _compiled(prop: ElementProperty) -> Optional[Tuple[int, Predicate]]:
+    compiled = prop._predicate_cache
+    if compiled is None:
+        compiled = _compile(prop) or _NEEDS_XPATH
+        object.__setattr__(prop, '_predicate_cache', compiled)
+    return None if compiled is _NEEDS_XPATH else compiled
+
+
+# a predicate true on the nodes that have all the properties, or None when one of them needs xpath
+def compile_properties(props: Sequence[ElementProperty]) -> Optional[Predicate]:
+    compiled = [_compiled(p) for p in props]
+    if not compiled or None in compiled:
+        return None
+    return _all_of(compiled)[1]
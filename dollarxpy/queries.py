@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple, Union
+
+from dollarxpy.basic_path import BasicPath
+from dollarxpy.css import compile_selector
+from dollarxpy.npath import NPath
+from dollarxpy.operations import OperationFailed
+from dollarxpy.optimizer import optimized_scoped_xpath
+from dollarxpy.planner import MAX_CONTEXTS, plan_batch
+from dollarxpy.result_cache import ResultCache
+
+# The queries the browsers send: all the paths of a batch are evaluated by one script, in one round trip.
+
+# XPathResult result types
+_NUMBER_TYPE = 1
+_BOOLEAN_TYPE = 3
+_ORDERED_NODE_SNAPSHOT_TYPE = 7
+
+# The npath condition of a query, [operator, n], checked in the page on the number of nodes found.
+_SATISFIED_FUNCTION = """
+function satisfied(n, condition) {
+    var operator = condition[0], expected = condition[1];
+    return operator === '>=' ? n >= expected : operator === '<=' ? n <= expected : n === expected;
+}
+"""
+
+# An elements query may carry an npath condition: when it does not hold, no element handle is sent back.
+_EVALUATE_ALL_FUNCTION = _SATISFIED_FUNCTION + """
+function evaluateAll(queries) {
+    return queries.map(function (query) {
+        var condition = query[3];
+        if (query[2]) {
+            var matches = document.querySelectorAll(query[0]);
+            if (query[1] === XPathResult.NUMBER_TYPE) {
+                return matches.length;
+            }
+            if (query[1] === XPathResult.BOOLEAN_TYPE) {
+                return matches.length > 0;
+            }
+            if (condition && !satisfied(matches.length, condition)) {
+                return [];
+            }
+            return Array.prototype.slice.call(matches);
+        }
+        var result = document.evaluate(query[0], document, null, query[1], null);
+        if (query[1] === XPathResult.NUMBER_TYPE) {
+            return result.numberValue;
+        }
+        if (query[1] === XPathResult.BOOLEAN_TYPE) {
+            return result.booleanValue;
+        }
+        if (condition && !satisfied(result.snapshotLength, condition)) {
+            return [];
+        }
+        var nodes = [];
+        for (var i = 0; i < result.snapshotLength; i++) {
+            nodes.push(result.snapshotItem(i));
+        }
+        return nodes;
+    });
+}
+"""
+EVALUATE_ALL_SCRIPT = _EVALUATE_ALL_FUNCTION + """
+return evaluateAll(arguments[0]);
+"""
+
+# The version of the document in the page: a MutationObserver counts the batches of mutations since it was
+# injected, and a random id tells documents apart, one per page load. Records are taken synchronously, so a
+# change made just before the script runs is counted even if the observer callback has not run yet.
+_DOCUMENT_VERSION_FUNCTION = """
+function documentVersion() {
+    var state = window.__dollarxpy_version;
+    if (!state || state.document !== document) {
+        state = window.__dollarxpy_version = {id: Math.random().toString(36).slice(2), count: 0, document: document};
+        state.observer = new MutationObserver(function () { state.count++; });
+        state.observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    }
+    if (state.observer.takeRecords().length) {
+        state.count++;
+    }
+    return state.id + ':' + state.count;
+}
+"""
+
+# Queries of a ResultCache: [queries, known version, indexes of the queries missing from the cache]. Only the
+# missing queries are evaluated while the document is at the known version, all of them when it is not; the
+# result is [version, indexes of the evaluated queries, their results].
+VERSIONED_SCRIPT = _DOCUMENT_VERSION_FUNCTION + _EVALUATE_ALL_FUNCTION + """
+var queries = arguments[0], known = arguments[1], missing = arguments[2];
+var version = documentVersion();
+var evaluated = version === known ? missing : queries.map(function (query, i) { return i; });
+return [version, evaluated, evaluateAll(evaluated.map(function (i) { return queries[i]; }))];
+"""
+
+Query = Union[BasicPath, NPath]
+
+
+# Text and attributes of every element an elements query finds, as one list per field. Like Snapshot.extract:
+# the first text node, the whitespace-normalized string value, and attributes keyed '@name'.
+EXTRACT_SCRIPT = _SATISFIED_FUNCTION + """
+var query = arguments[0], attributes = arguments[1], withText = arguments[2], withAggregatedText = arguments[3];
+var nodes = [];
+if (query[2]) {
+    nodes = Array.prototype.slice.call(document.querySelectorAll(query[0]));
+} else {
+    var result = document.evaluate(query[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var i = 0; i < result.snapshotLength; i++) {
+        nodes.push(result.snapshotItem(i));
+    }
+}
+if (query[3] && !satisfied(nodes.length, query[3])) {
+    nodes = [];
+}
+function firstText(node) {
+    for (var child = node.firstChild; child; child = child.nextSibling) {
+        if (child.nodeType === 3 || child.nodeType === 4) {
+            return child.data;
+        }
+    }
+    return '';
+}
+var columns = {};
+if (withText) {
+    columns.text = nodes.map(firstText);
+}
+if (withAggregatedText) {
+    columns.aggregated_text = nodes.map(function (node) {
+        return node.textContent.replace(/[ \\t\\r\\n]+/g, ' ').replace(/^ | $/g, '');
+    });
+}
+attributes.forEach(function (name) {
+    columns['@' + name] = nodes.map(function (node) { return node.getAttribute(name); });
+});
+return columns;
+"""
+
+
+def _query(path: Query, result_type: int, xpath_function: str = None):
+    target = path.path if isinstance(path, NPath) else path
+    selector = compile_selector(target)
+    if selector.is_css:
+        return [selector.selector, result_type, True]
+    xpath = f"{xpath_function}({selector.selector})" if xpath_function else selector.selector
+    return [xpath, result_type, False]
+
+
+def count_query(path: Query):
+    return _query(path, _NUMBER_TYPE, "count")
+
+
+def exists_query(path: Query):
+    if isinstance(path, NPath):
+        return count_query(path)
+    return _query(path, _BOOLEAN_TYPE, "boolean")
+
+
+def elements_query(path: Query):
+    query = _query(path, _ORDERED_NODE_SNAPSHOT_TYPE)
+    if isinstance(path, NPath):
+        query.append([path.qualifier.as_xpath(), path.n])
+    return query
+
+
+def exists_result(path: Query, result) -> bool:
+    if isinstance(path, NPath):
+        return path.qualifier.is_satisfied_by(int(result), path.n)
+    return bool(result)
+
+
+def occurrences_result(path: NPath, found: int) -> int:
+    if not path.qualifier.is_satisfied_by(found, path.n):
+        raise OperationFailed(f"expected {path}, found {found}")
+    return found
+
+
+def filter_by_npath(path: Query, elements: list) -> list:
+    if isinstance(path, NPath) and not path.qualifier.is_satisfied_by(len(elements), path.n):
+        return []
+    return elements
+
+
+def extract_arguments(path: Query, attributes: Sequence[str], text: bool, aggregated_text: bool) -> list:
+    return [elements_query(path), list(attributes), text, aggregated_text]
+
+
+# A batch plan evaluated in the page (see planner): every step is [selector, isCss, base, relative xpath], the
+# nodes of a step with a base are found from the nodes of that step, merged in document order; every output is
+# [step, npath condition].
+PLANNED_SCRIPT = _SATISFIED_FUNCTION + """
+var steps = arguments[0], outputs = arguments[1], maxContexts = arguments[2];
+function evaluate(xpath, context) {
+    var result = document.evaluate(xpath, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var nodes = [];
+    for (var i = 0; i < result.snapshotLength; i++) {
+        nodes.push(result.snapshotItem(i));
+    }
+    return nodes;
+}
+function fromDocument(step) {
+    return step[1] ? Array.prototype.slice.call(document.querySelectorAll(step[0])) : evaluate(step[0], document);
+}
+function fromContexts(xpath, contexts) {
+    if (contexts.length === 1) {
+        return evaluate(xpath, contexts[0]);
+    }
+    var seen = new Set(), nodes = [];
+    contexts.forEach(function (context) {
+        evaluate(xpath, context).forEach(function (node) {
+            if (!seen.has(node)) {
+                seen.add(node);
+                nodes.push(node);
+            }
+        });
+    });
+    return nodes.sort(function (a, b) {
+        return a === b ? 0 : a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1;
+    });
+}
+var found = [];
+steps.forEach(function (step) {
+    var contexts = step[2] === null ? null : found[step[2]];
+    found.push(contexts === null || contexts.length > maxContexts ? fromDocument(step) : fromContexts(step[3], contexts));
+});
+return outputs.map(function (output) {
+    var nodes = found[output[0]], condition = output[1];
+    return condition && !satisfied(nodes.length, condition) ? [] : nodes;
+});
+"""
+
+
+# the steps and outputs of PLANNED_SCRIPT, or None when the paths share nothing and EVALUATE_ALL_SCRIPT does as well
+def planned_query(paths: Sequence[Query]) -> Optional[Tuple[List[list], List[list]]]:
+    plan = plan_batch([p.path if isinstance(p, NPath) else p for p in paths])
+    if not plan.shares:
+        return None
+    steps = []
+    for step in plan.steps:
+        selector = compile_selector(step.path)
+        steps.append([selector.selector, selector.is_css, step.base, step.xpath])
+    outputs = [[output, [p.qualifier.as_xpath(), p.n] if isinstance(p, NPath) else None]
+               for p, output in zip(paths, plan.outputs)]
+    return steps, outputs
+
+
+# the indexes of the paths without a result at the known version, the last one the browser saw, for VERSIONED_SCRIPT
+def missing_results(cache: ResultCache, kind: str, paths: Sequence[Query], version: Optional[str]) -> List[int]:
+    return [i for i, p in enumerate(paths) if version is None or (kind, p, version) not in cache]
+
+
+# the results of all the paths at the version VERSIONED_SCRIPT returned, the evaluated ones added to the cache
+def versioned_results(cache: ResultCache, kind: str, paths: Sequence[Query], response: list) -> Tuple[str, list]:
+    version, evaluated, results = response
+    results = dict(zip(evaluated, results))
+    # every hit is read before anything is added, which could evict it
+    found = [None if i in results else cache.get((kind, p, version)) for i, p in enumerate(paths)]
+    for i, p in enumerate(paths):
+        if i in results:
+            found[i] = cache.cached((kind, p, version), lambda: results[i])
+    return version, found
+
+
+_BATCH_QUERIES = {'count': count_query, 'exists': exists_query, 'elements': elements_query}
+
+
+# The script call that evaluates a batch of paths of one kind, as [script, arguments]: with a cache, the missing
+# paths at the known version; without one, a batch plan when the paths of elements share sub-paths.
+def batch_call(kind: str, paths: Sequence[Query], cache: Optional[ResultCache], version: Optional[str]) -> \
+        Tuple[str, list]:
+    queries = [_BATCH_QUERIES[kind](p) for p in paths]
+    if cache is not None:
+        return VERSIONED_SCRIPT, [queries, version, missing_results(cache, kind, paths, version)]
+    planned = planned_query(paths) if kind == 'elements' else None
+    if planned is not None:
+        steps, outputs = planned
+        return PLANNED_SCRIPT, [steps, outputs, MAX_CONTEXTS]
+    return EVALUATE_ALL_SCRIPT, [queries]
+
+
+# the version of the document and the result of every path, from the response to the batch_call script
+def batch_results(kind: str, paths: Sequence[Query], cache: Optional[ResultCache], version: Optional[str],
+                  response: list) -> Tuple[Optional[str], list]:
+    if cache is not None:
+        version, response = versioned_results(cache, kind, paths, response)
+    return version, [_result(kind, p, found) for p, found in zip(paths, response)]
+
+
+def _result(kind: str, path: Query, found):
+    if kind == 'count':
+        return int(found)
+    if kind == 'exists':
+        return exists_result(path, found)
+    return list(filter_by_npath(path, found))
+
+
+# One query evaluated inside each of the context elements, like Scope in snapshot: [xpath matched among the
+# descendants of the context, result type], one result per context.
+WITHIN_SCRIPT = """
+var contexts = arguments[0], query = arguments[1];
+return contexts.map(function (context) {
+    var result = document.evaluate(query[0], context, null, query[1], null);
+    if (query[1] === XPathResult.NUMBER_TYPE) {
+        return result.numberValue;
+    }
+    if (query[1] === XPathResult.BOOLEAN_TYPE) {
+        return result.booleanValue;
+    }
+    var nodes = [];
+    for (var i = 0; i < result.snapshotLength; i++) {
+        nodes.push(result.snapshotItem(i));
+    }
+    return nodes;
+});
+"""
+
+
+# css has no equivalent of .//, a selector inside an element still matches against its ancestors
+def _within_query(path: Query, result_type: int, xpath_function: str = None):
+    xpath = optimized_scoped_xpath(path.path if isinstance(path, NPath) else path)
+    return [f"{xpath_function}({xpath})" if xpath_function else xpath, result_type]
+
+
+def count_within_query(path: Query):
+    return _within_query(path, _NUMBER_TYPE, "count")
+
+
+def exists_within_query(path: Query):
+    if isinstance(path, NPath):
+        return count_within_query(path)
+    return _within_query(path, _BOOLEAN_TYPE, "boolean")
+
+
+def elements_within_query(path: Query):
+    return _within_query(path, _ORDERED_NODE_SNAPSHOT_TYPE)
+
+
+_WITHIN_QUERIES = {'count': count_within_query, 'exists': exists_within_query, 'elements': elements_within_query}
+
+
+# the arguments of WITHIN_SCRIPT for one path of one kind inside each of the contexts; the response holds one result
+# per context, read back by within_results
+def within_arguments(kind: str, contexts: Sequence, path: Query) -> list:
+    return [list(contexts), _WITHIN_QUERIES[kind](path)]
+
+
+def within_results(kind: str, path: Query, response: list) -> list:
+    if kind == 'count' and isinstance(path, NPath):
+        # like Scope.count, nothing is counted where the npath condition does not hold
+        return [n if path.qualifier.is_satisfied_by(n, path.n) else 0 for n in map(int, response)]
+    return [_result(kind, path, found) for found in response]
+
+
+# one in-page wait lasts at most this long (seconds), below the default webdriver script timeout of 30s
+WAIT_CHUNK = 20
+
+# Waits inside the page for a path to be found (or to be gone): the condition is evaluated again only when the
+# dom changes, and the async script call returns as soon as it holds, or with false once the timeout expires.
+WAIT_SCRIPT = _SATISFIED_FUNCTION + """
+var query = arguments[0], timeout = arguments[1], done = arguments[arguments.length - 1];
+function count() {
+    if (query[1]) {
+        return document.querySelectorAll(query[0]).length;
+    }
+    return document.evaluate('count(' + query[0] + ')', document, null, XPathResult.NUMBER_TYPE, null).numberValue;
+}
+function holds() {
+    return satisfied(count(), query[2]) !== query[3];
+}
+if (holds()) {
+    return done(true);
+}
+var finished = false, timer;
+var observer = new MutationObserver(function () {
+    if (!finished && holds()) {
+        finish(true);
+    }
+});
+function finish(result) {
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(result);
+}
+observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+timer = setTimeout(function () { finish(holds()); }, timeout);
+"""
+
+
+# one in-page wait of the time left, in milliseconds
+def wait_chunk(remaining: float) -> float:
+    return max(0, min(remaining, WAIT_CHUNK)) * 1000
+
+
+# A wait interrupted by the script timeout or by the page navigating away is started again on the page; any other
+# error, like an invalid selector or a lost session, would come back on every try.
+def wait_interrupted(error: Optional[str], message: str) -> bool:
+    return error == 'script timeout' or (error == 'javascript error' and 'unloaded' in message.lower())
+
+
+def wait_query(path: Query, present: bool = True):
+    target = path.path if isinstance(path, NPath) else path
+    selector = compile_selector(target)
+    if isinstance(path, NPath):
+        operator, n = path.qualifier.as_xpath(), path.n
+    else:
+        operator, n = '>=', 1
+    return [selector.selector, selector.is_css, [operator, n], not present]
@@ -1,6 +1,6 @@
 from enum import Enum
 
-from typedpy import create_typed_field
+from dollarxpy.immutable import InstanceOf
 
 
 class RelationOperation(Enum):
@@ -14,6 +14,13 @@ class RelationOperation(Enum):
     def as_xpath(self):
         return self.value[0]
 
+    def is_satisfied_by(self, actual: int, n: int) -> bool:
+        if self is RelationOperation.OrMore:
+            return actual >= n
+        if self is RelationOperation.OrLess:
+            return actual <= n
+        return actual == n
 
 
-RelationOpField = create_typed_field("RelationOperationField", RelationOperation)
\ No newline at end of file
+
+RelationOpField = InstanceOf(RelationOperation)
\ No newline at end of file
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+# Results of queries keyed by (query kind, path, document version), so the same query on an unchanged document
+# is answered once. Paths are interned, which makes them cheap keys: their hash is kept and equal paths are the
+# same object. The version of a Snapshot is its identity; in a browser it is read from a MutationObserver in the
+# page (see queries.documentVersion), so results of an older version are never returned, only evicted. Like the
+# browsers, a cache is not meant to be shared between threads.
+
+_MISSING = object()
+
+
+class ResultCache:
+    __slots__ = ('max_size', 'hits', 'misses', 'evictions', '_entries')
+
+    def __init__(self, max_size: int = 1024):
+        if max_size < 1:
+            raise ValueError(f"max_size: Expected a minimum of 1, got {max_size}")
+        self.max_size = max_size
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default=None):
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value):
+        entries = self._entries
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def cached(self, key: Hashable, compute: Callable[[], object]):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def reset_statistics(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def statistics(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._entries),
+                'max_size': self.max_size, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def __repr__(self):
+        return f"ResultCache(size={len(self._entries)}, max_size={self.max_size}, hits={self.hits}, " \
+               f"misses={self.misses}, evictions={self.evictions})"
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import json
+from enum import Enum
+from typing import Dict, Mapping, Union
+
+from dollarxpy.basic_path import BasicPath, PathKind
+from dollarxpy.css import CompiledSelector, SelectorStrategy, compile_selector
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.immutable import InternedStructure
+from dollarxpy.npath import NPath
+from dollarxpy.relation_operator import RelationOperation
+
+# Precompiled selectors: a json document holding the path trees as a table of nodes (children first, shared
+# subtrees stored once) plus, for every named entry, its rendered xpath, alternate xpath, description and
+# compiled selector. Loading builds the nodes without validation and with the renderings already cached.
+#
+#   {"format": 1, "compiler": 2,
+#    "classes": [[name, [field, ...]], ...],
+#    "enums": ["PathKind.RELATION", ...],
+#    "nodes": [[class index, value, ...], ...],
+#    "entries": {name: [node index, xpath, alternate xpath, description, strategy, selector]}}
+#
+# A value is a json scalar, ["t", value, ...] for a tuple, ["r", node index] for a node, or ["e", enum index]
+# for an enum member. Trailing fields that hold their default are left out, and so is an alternate xpath
+# that is the xpath itself.
+
+FORMAT_VERSION = 1
+
+# the version of the renderings a file holds: raise it whenever rendering, optimizer rewrites or css compilation
+# give different results, so that files compiled before are rejected instead of loading stale selectors
+COMPILER_VERSION = 2
+
+_TUPLE, _REF, _ENUM = "t", "r", "e"
+
+_enums = {cls.__name__: cls for cls in (PathKind, PropertyKind, RelationOperation)}
+
+Serializable = Union[BasicPath, ElementProperty, NPath]
+
+
+def _structure_classes() -> Dict[str, type]:
+    classes, pending = {}, [InternedStructure]
+    while pending:
+        for cls in pending.pop().__subclasses__():
+            classes[cls.__name__] = cls
+            pending.append(cls)
+    return classes
+
+
+class _Encoder:
+    __slots__ = ('classes', 'class_index', 'enums', 'enum_index', 'nodes', 'node_index')
+
+    def __init__(self):
+        self.classes, self.class_index = [], {}
+        self.enums, self.enum_index = [], {}
+        self.nodes, self.node_index = [], {}
+
+    def value(self, value):
+        if isinstance(value, InternedStructure):
+            return [_REF, self.node(value)]
+        if isinstance(value, tuple):
+            return [_TUPLE, *[self.value(v) for v in value]]
+        if isinstance(value, Enum):
+            index = self.enum_index.get(value)
+            if index is None:
+                index = self.enum_index[value] = len(self.enums)
+                self.enums.append(f'{type(value).__name__}.{value.name}')
+            return [_ENUM, index]
+        return value
+
+    def node(self, structure: InternedStructure) -> int:
+        index = self.node_index.get(structure)
+        if index is None:
+            cls = type(structure)
+            if cls not in self.class_index:
+                self.class_index[cls] = len(self.classes)
+                self.classes.append([cls.__name__, list(cls._field_names)])
+            values = [self.value(v) for v in structure._field_values()]
+            defaults = [self.value(default) for _, default in cls._field_defaults]
+            while values and values[-1] == defaults[len(values) - 1]:
+                values.pop()
+            index = len(self.nodes)
+            self.nodes.append([self.class_index[cls], *values])
+            self.node_index[structure] = index
+        return index
+
+
+def to_dict(paths: Mapping[str, Serializable]) -> dict:
+    encoder = _Encoder()
+    entries = {}
+    for name, path in paths.items():
+        index = encoder.node(path)
+        if isinstance(path, BasicPath):
+            compiled = compile_selector(path)
+            xpath, alternate_xpath = path.get_xpath(), path.get_alternate_xpath()
+            entries[name] = [index, xpath, None if alternate_xpath == xpath else alternate_xpath, str(path),
+                             compiled.strategy.value, compiled.selector]
+        elif isinstance(path, ElementProperty):
+            entries[name] = [index, path.to_xpath(), None, str(path)]
+        else:
+            entries[name] = [index]
+    return {'format': FORMAT_VERSION, 'compiler': COMPILER_VERSION, 'classes': encoder.classes, 'enums': encoder.enums,
+            'nodes': encoder.nodes, 'entries': entries}
+
+
+def _decode(value: list, nodes: list, enums: list):
+    tag = value[0]
+    if tag == _REF:
+        return nodes[value[1]]
+    if tag == _TUPLE:
+        return tuple([_decode(v, nodes, enums) if type(v) is list else v for v in value[1:]])
+    return enums[value[1]]
+
+
+def _class_decoders(classes: list) -> list:
+    known = _structure_classes()
+    decoders = []
+    for name, field_names in classes:
+        cls = known.get(name)
+        if cls is None:
+            raise ValueError(f"serialized selectors: unknown structure '{name}'")
+        if list(cls._field_names[:len(field_names)]) != field_names:
+            raise ValueError(f"serialized selectors: the fields of {name} changed, recompile the selectors")
+        decoders.append((cls, tuple([default for _, default in cls._field_defaults])))
+    return decoders
+
+
+def _enum_member(name: str):
+    enum_name, _, member = name.partition('.')
+    enum = _enums.get(enum_name)
+    if enum is None or member not in enum.__members__:
+        raise ValueError(f"serialized selectors: unknown enum member '{name}'")
+    return enum[member]
+
+
+def _cache(structure: InternedStructure, slot: str, value):
+    if getattr(structure, slot) is None:
+        object.__setattr__(structure, slot, value)
+
+
+def from_dict(data: dict) -> Dict[str, Serializable]:
+    if data.get('format') != FORMAT_VERSION:
+        raise ValueError(f"serialized selectors: unsupported format {data.get('format')!r}")
+    if data.get('compiler') != COMPILER_VERSION:
+        raise ValueError(f"serialized selectors: compiled by compiler version {data.get('compiler')!r}, expected "
+                         f"{COMPILER_VERSION}, recompile the selectors")
+    decoders = _class_decoders(data['classes'])
+    enums = [_enum_member(name) for name in data['enums']]
+    nodes = []
+    for node in data['nodes']:
+        cls, defaults = decoders[node[0]]
+        values = tuple([_decode(v, nodes, enums) if type(v) is list else v for v in node[1:]])
+        nodes.append(cls._from_values(values + defaults[len(values):]))
+    paths = {}
+    for name, entry in data['entries'].items():
+        path = nodes[entry[0]]
+        # a path that was already built, in code or by an earlier load, keeps the renderings it has
+        if isinstance(path, BasicPath):
+            _cache(path, '_xpath_cache', entry[1])
+            _cache(path, '_alternate_xpath_cache', entry[1] if entry[2] is None else entry[2])
+            _cache(path, '_str_cache', entry[3])
+            if path._selector_cache is None:
+                _cache(path, '_selector_cache', CompiledSelector._from_values((SelectorStrategy(entry[4]), entry[5])))
+        elif isinstance(path, ElementProperty):
+            _cache(path, '_xpath_cache', entry[1])
+            _cache(path, '_text_cache', entry[3])
+        paths[name] = path
+    return paths
+
+
+def dumps(paths: Mapping[str, Serializable]) -> str:
+    return json.dumps(to_dict(paths), separators=(',', ':'))
+
+
+def loads(data: Union[str, bytes]) -> Dict[str, Serializable]:
+    return from_dict(json.loads(data))
+
+
+def dump(paths: Mapping[str, Serializable], filename: str):
+    with open(filename, 'w') as f:
+        f.write(dumps(paths))
+
+
+def load(filename: str) -> Dict[str, Serializable]:
+    with open(filename, 'rb') as f:
+        return loads(f.read())
+
+
+# the paths, properties and npaths a module defines at top level, e.g. elements or a page object module
+def module_paths(module) -> Dict[str, Serializable]:
+    names = getattr(module, '__all__', None) or [n for n in vars(module) if not n.startswith('_')]
+    found = {}
+    for name in names:
+        value = getattr(module, name)
+        if isinstance(value, (BasicPath, ElementProperty, NPath)):
+            found[f'{module.__name__}.{name}'] = value
+    return found
+
+
+# Precompiling for parallel test workers: the controller process writes the file once, e.g. in a conftest
+#     serialization.precompile('selectors.json', pages.login, pages.checkout)
+# and every worker loads it before importing the page objects. Building a path that was loaded then returns the
+# loaded instance (see InternedStructure), rendered xpath and compiled selector included.
+def precompile(filename: str, *modules):
+    paths = {}
+    for module in modules:
+        paths.update(module_paths(module))
+    dump(paths, filename)
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import itertools
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from lxml import etree, html as lxml_html
+
+from dollarxpy.basic_path import BasicPath
+from dollarxpy.element_property import PropertyKind
+from dollarxpy.npath import NPath
+from dollarxpy.optimizer import optimized_npath_condition_xpath, optimized_scoped_xpath, optimized_xpath
+from dollarxpy.planner import MAX_CONTEXTS, plan_batch
+from dollarxpy.queries import filter_by_npath, occurrences_result
+from dollarxpy.result_cache import ResultCache
+
+_COMPILED_XPATH_CACHE_SIZE = 2048
+
+_MISSING = object()
+_versions = itertools.count()
+
+# normalize-space() only knows xml whitespace, and translate() in xpath_utils only folds ascii letters
+_xml_whitespace = re.compile(r'[ \t\r\n]+')
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+@lru_cache(maxsize=_COMPILED_XPATH_CACHE_SIZE)
+def compile_xpath(xpath: str) -> etree.XPath:
+    return etree.XPath(xpath)
+
+
+def _first_text(element) -> str:
+    if element.text is not None:
+        return element.text
+    for child in element:
+        if child.tail is not None:
+            return child.tail
+    return ""
+
+
+def _normalize_space(text: str) -> str:
+    return _xml_whitespace.sub(' ', text).strip(' ')
+
+
+# xpath string(.): every descendant text node in document order, but not the content of comments or processing
+# instructions
+def _aggregated_text(element) -> str:
+    return _normalize_space(''.join(element.itertext(etree.Element)))
+
+
+# the class attribute as has_class reads it: single spaces between the tokens and around them, so ' name ' finds one
+def _class_string(element) -> str:
+    return f" {_normalize_space(element.get('class') or '')} "
+
+
+def _hidden(element) -> bool:
+    style = element.get('style') or ''
+    return 'display:none' in style or 'display: none' in _normalize_space(style)
+
+
+# the test of a text property, on a text folded with _ASCII_LOWER as the translate() of xpath_utils folds it
+def _text_matcher(kind: PropertyKind, term: str) -> Callable[[str], bool]:
+    term = term.lower()
+    name = kind.name
+    if name.endswith('EQUALS'):
+        return lambda text: text == term
+    if name.endswith('CONTAINS'):
+        return lambda text: term in text
+    if name.endswith('STARTS_WITH'):
+        return lambda text: text.startswith(term)
+    return lambda text: text.endswith(term)
+
+
+# one pass over the elements: the first text node, the whitespace-normalized string value and attributes
+# (None when missing), one list per field; attributes are keyed '@name'
+def extract_columns(elements: list, attributes: Sequence[str] = (), text: bool = True,
+                    aggregated_text: bool = True) -> Dict[str, list]:
+    columns = {}
+    if text:
+        columns['text'] = []
+    if aggregated_text:
+        columns['aggregated_text'] = []
+    attribute_columns = [(name, columns.setdefault(f'@{name}', [])) for name in attributes]
+    text_column, aggregated_column = columns.get('text'), columns.get('aggregated_text')
+    for element in elements:
+        if text_column is not None:
+            text_column.append(_first_text(element))
+        if aggregated_column is not None:
+            aggregated_column.append(_aggregated_text(element))
+        for name, column in attribute_columns:
+            column.append(element.get(name))
+    return columns
+
+
+# A snapshot is not expected to change: with a ResultCache, which may be shared by many snapshots, the results of
+# its queries are kept under its version, a number no other snapshot has.
+class Snapshot:
+    __slots__ = ('root', 'version', 'cache')
+
+    def __init__(self, document, cache: Optional[ResultCache] = None):
+        self.root = document.getroot() if isinstance(document, etree._ElementTree) else document
+        self.version = next(_versions)
+        self.cache = cache
+
+    @classmethod
+    def from_html(cls, markup: Union[str, bytes], cache: Optional[ResultCache] = None) -> Snapshot:
+        return cls(lxml_html.document_fromstring(markup), cache)
+
+    @classmethod
+    def from_file(cls, filename: str, cache: Optional[ResultCache] = None) -> Snapshot:
+        return cls(lxml_html.parse(filename), cache)
+
+    def _evaluate(self, xpath: str):
+        return compile_xpath(xpath)(self.root)
+
+    def _cached(self, kind: str, path: Union[BasicPath, NPath], compute):
+        if self.cache is None:
+            return compute()
+        return self.cache.cached((kind, path, self.version), compute)
+
+    def _find_all(self, path: BasicPath) -> List[etree._Element]:
+        return self._evaluate(optimized_xpath(path))
+
+    def find_all(self, path: Union[BasicPath, NPath]) -> List[etree._Element]:
+        if isinstance(path, NPath):
+            return self.find_all(path.path) if self.exists(path) else []
+        if self.cache is None:
+            return self._find_all(path)
+        return list(self._cached('elements', path, lambda: self._find_all(path)))
+
+    # sub-paths shared by several of the paths are evaluated once
+    def find_all_of(self, paths: Sequence[Union[BasicPath, NPath]]) -> List[List[etree._Element]]:
+        cache = self.cache
+        if cache is None:
+            return self._find_all_of(paths)
+        results = [cache.get(('elements', p, self.version), _MISSING) for p in paths]
+        missing = [p for p, found in zip(paths, results) if found is _MISSING]
+        evaluated = iter(self._find_all_of(missing) if missing else ())
+        for i, p in enumerate(paths):
+            if results[i] is _MISSING:
+                results[i] = next(evaluated)
+                cache.put(('elements', p, self.version), results[i])
+        return [list(found) for found in results]
+
+    def _find_all_of(self, paths: Sequence[Union[BasicPath, NPath]]) -> List[List[etree._Element]]:
+        plan = plan_batch([p.path if isinstance(p, NPath) else p for p in paths])
+        found = []
+        for step in plan.steps:
+            context = None if step.base is None else found[step.base]
+            if context is None or len(context) > MAX_CONTEXTS:
+                found.append(self._evaluate(optimized_xpath(step.path)))
+            else:
+                found.append(compile_xpath(f"$context/{step.xpath}")(self.root, context=context) if context else [])
+        return [filter_by_npath(p, found[output]) for p, output in zip(paths, plan.outputs)]
+
+    def find_first(self, path: Union[BasicPath, NPath]) -> Optional[etree._Element]:
+        if isinstance(path, NPath):
+            found = self.find_all(path)
+        else:
+            found = self._cached('first', path, lambda: self._evaluate(f"({optimized_xpath(path)})[1]"))
+        return found[0] if found else None
+
+    def count(self, path: Union[BasicPath, NPath]) -> int:
+        if isinstance(path, NPath):
+            path = path.path
+        return self._cached('count', path, lambda: int(self._evaluate(f"count({optimized_xpath(path)})")))
+
+    def exists(self, path: Union[BasicPath, NPath]) -> bool:
+        if isinstance(path, NPath):
+            return self._cached('exists', path, lambda: bool(self._evaluate(optimized_npath_condition_xpath(path))))
+        return self._cached('exists', path, lambda: bool(self._evaluate(f"boolean({optimized_xpath(path)})")))
+
+    def assert_occurrences(self, path: NPath) -> int:
+        return occurrences_result(path, self.count(path))
+
+    def extract(self, path: Union[BasicPath, NPath], attributes: Sequence[str] = (), text: bool = True,
+                aggregated_text: bool = True) -> Dict[str, list]:
+        return extract_columns(self.find_all(path), attributes, text, aggregated_text)
+
+    def scopes(self, path: Union[BasicPath, NPath]) -> List[Scope]:
+        return [Scope(element) for element in self.find_all(path)]
+
+
+# Queries inside one element, like the rows of a grid: the path is matched among the descendants of the element
+# (//x is evaluated as .//x), so a query costs the size of the element instead of the document. Its relations
+# may be to elements outside, like td.descendant_of(table) from a row: the matches are those of the document that
+# are inside the element, but occurrence numbers count the matches inside the element only.
+class Scope:
+    __slots__ = ('element',)
+
+    def __init__(self, element: etree._Element):
+        self.element = element
+
+    def _evaluate(self, xpath: str):
+        return compile_xpath(xpath)(self.element)
+
+    def find_all(self, path: Union[BasicPath, NPath]) -> List[etree._Element]:
+        if isinstance(path, NPath):
+            return self.find_all(path.path) if self.exists(path) else []
+        return self._evaluate(optimized_scoped_xpath(path))
+
+    def find_first(self, path: Union[BasicPath, NPath]) -> Optional[etree._Element]:
+        if isinstance(path, NPath):
+            found = self.find_all(path)
+        else:
+            found = self._evaluate(f"({optimized_scoped_xpath(path)})[1]")
+        return found[0] if found else None
+
+    # as many as find_all finds: none when the npath condition does not hold
+    def count(self, path: Union[BasicPath, NPath]) -> int:
+        if isinstance(path, NPath):
+            found = self.count(path.path)
+            return found if path.qualifier.is_satisfied_by(found, path.n) else 0
+        return int(self._evaluate(f"count({optimized_scoped_xpath(path)})"))
+
+    def exists(self, path: Union[BasicPath, NPath]) -> bool:
+        if isinstance(path, NPath):
+            return path.qualifier.is_satisfied_by(self.count(path.path), path.n)
+        return bool(self._evaluate(f"boolean({optimized_scoped_xpath(path)})"))
+
+    def assert_occurrences(self, path: NPath) -> int:
+        return occurrences_result(path, self.count(path.path))
+
+    def extract(self, path: Union[BasicPath, NPath], attributes: Sequence[str] = (), text: bool = True,
+                aggregated_text: bool = True) -> Dict[str, list]:
+        return extract_columns(self.find_all(path), attributes, text, aggregated_text)
+
+    def scopes(self, path: Union[BasicPath, NPath]) -> List[Scope]:
+        return [Scope(element) for element in self.find_all(path)]
@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from dollarxpy.basic_path import BasicPath, PathKind
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.path_utils import _element_name, opposite_relation
+from dollarxpy.snapshot import _ASCII_LOWER, _aggregated_text, _class_string, _first_text, _hidden, _text_matcher
+
+# Streaming evaluation with iterparse, for files too big to hold in memory. A path is compiled to checks on the
+# element being parsed, each decided either at its start tag (name, attributes, ancestors, earlier siblings and
+# earlier elements) or at its end tag (own text, children and descendants). Relation targets are counted on the
+# way: how many ancestors, earlier siblings, earlier elements, children or descendants matched them. Axes that
+# look ahead in the document (following siblings, following elements, last-sibling tests, positions) cannot
+# be decided in one pass and raise NotStreamable.
+#
+# Finished elements are cleared as the parse goes on, so memory stays bounded by the open elements plus the
+# subtrees some check still needs: a match is yielded with its descendants, and aggregated text needs them too.
+# Only elements that pass the start tag checks of such a path keep their subtree, which is why a path that
+# has none (any element, that has the text ...) cannot be streamed with descendants.
+
+_START, _END = 0, 1
+
+Check = Callable[['_Frame'], bool]
+
+
+class NotStreamable(ValueError):
+    pass
+
+
+class _Frame:
+    __slots__ = ('element', 'parent', 'index', 'children', 'first_text', 'results', 'inherited', 'siblings_before',
+                 'preceding', 'child_counts', 'descendant_counts', 'matched', 'keep', 'keep_descendants')
+
+    def __init__(self, element, parent: Optional[_Frame], tracked: int):
+        self.element = element
+        self.parent = parent
+        self.index = 0
+        self.children = 0
+        self.first_text = None
+        self.results = [False] * tracked
+        self.child_counts = [0] * tracked
+        self.descendant_counts = [0] * tracked
+        self.inherited = self.siblings_before = self.preceding = None
+        self.matched = False
+        self.keep = self.keep_descendants = False
+
+    def text(self) -> str:
+        element = self.element
+        if element.text is None and self.first_text is not None:
+            return self.first_text
+        return _first_text(element)
+
+
+#########################################
+# compiling
+
+def _always(frame: _Frame) -> bool:
+    return True
+
+
+def _all_of(checks: List[Check]) -> Check:
+    if len(checks) == 1:
+        return checks[0]
+
+    def check(frame):
+        for c in checks:
+            if not c(frame):
+                return False
+        return True
+    return check
+
+
+def _any_of(checks: List[Check]) -> Check:
+    def check(frame):
+        for c in checks:
+            if c(frame):
+                return True
+        return False
+    return check
+
+
+def _negated(check: Check) -> Check:
+    return lambda frame: not check(frame)
+
+
+def _text_check(text_of, kind: PropertyKind, term: str) -> Check:
+    matches = _text_matcher(kind, term)
+    return lambda frame: matches(text_of(frame).translate(_ASCII_LOWER))
+
+
+def _own_text(frame: _Frame) -> str:
+    return frame.text()
+
+
+def _string_value(frame: _Frame) -> str:
+    return _aggregated_text(frame.element)
+
+
+_look_ahead = {
+    PropertyKind.LAST_SIBLING: "depends on the following siblings",
+    PropertyKind.ONLY_CHILD: "depends on the following siblings",
+    PropertyKind.NTH_FROM_LAST_SIBLING: "depends on the following siblings",
+    PropertyKind.INDEX: "depends on the matches after the element",
+    PropertyKind.INDEX_RANGE: "depends on the matches after the element",
+}
+
+
+class _Compiler:
+    __slots__ = ('tracked', 'tracked_ids', 'subtree_filters', 'uses_inherited', 'uses_siblings', 'uses_preceding')
+
+    def __init__(self):
+        self.tracked: List[Tuple[Check, int]] = []
+        self.tracked_ids = {}
+        self.subtree_filters: List[Check] = []
+        self.uses_inherited = self.uses_siblings = self.uses_preceding = False
+
+    def track(self, path: BasicPath) -> int:
+        tid = self.tracked_ids.get(path)
+        if tid is None:
+            check, phase, _ = self.path(path)
+            tid = self.tracked_ids[path] = len(self.tracked)
+            self.tracked.append((check, phase))
+        return tid
+
+    # check, phase, and the part of the check decided at the start tag (None when there is none)
+    def path(self, path: BasicPath) -> Tuple[Check, int, Optional[Check]]:
+        if path.inside_xpath:
+            raise NotStreamable(f"{path}: an inside xpath is raw xpath")
+        kind = path.kind
+        if kind is PathKind.ELEMENT:
+            name = path.xpath
+            if name == '*':
+                return _always, _START, None
+            if not _element_name.match(name):
+                raise NotStreamable(f"{path}: '{name}' is not a plain element name")
+            check = lambda frame: frame.element.tag == name
+            return check, _START, check
+        if kind is PathKind.TOP_LEVEL:
+            return self.path(path.operands[0])
+        if kind is PathKind.PREDICATE:
+            check, phase, start_check = self.path(path.operands[0])
+            parts = [(check, phase)] + [self.property(p, start_check) for p in path.element_properties]
+            return self._combined(parts, start_check)
+        if kind is PathKind.RELATION:
+            subject, target = path.operands
+            check, phase, start_check = self.path(subject)
+            parts = [(check, phase), self.axis(opposite_relation(path.relation), target)]
+            return self._combined(parts, start_check)
+        if kind is PathKind.UNION:
+            compiled = [self.path(operand) for operand in path.operands]
+            start_checks = [s for _, _, s in compiled]
+            return _any_of([c for c, _, _ in compiled]), max(p for _, p, _ in compiled), \
+                None if None in start_checks else _any_of(start_checks)
+        if kind is PathKind.NEGATION:
+            check, phase, _ = self.path(path.operands[0])
+            negated = _negated(check)
+            return negated, phase, negated if phase == _START else None
+        raise NotStreamable(f"{path}: occurrence numbers depend on elements after the match")
+
+    @staticmethod
+    def _combined(parts: List[Tuple[Check, int]], start_check: Optional[Check]):
+        starting = [c for c, phase in parts if phase == _START and c is not _always]
+        ending = [c for c, phase in parts if phase == _END]
+        check = _all_of(starting + ending) if starting or ending else _always
+        if starting:
+            start_check = _all_of(starting)
+        return check, _END if ending else _START, start_check
+
+    # the count of elements on an axis of the element that match the target
+    def axis(self, axis: str, target: BasicPath, npath=None) -> Tuple[Check, int]:
+        if axis in ('ancestor', 'parent'):
+            tid = self.track(target)
+            if self.tracked[tid][1] != _START:
+                raise NotStreamable(f"{axis}::{target} is only decided at the end of the {axis}, after its "
+                                    f"descendants")
+            self.uses_inherited = True
+            if axis == 'ancestor':
+                count, phase = (lambda frame: frame.inherited[tid]), _START
+            else:
+                count, phase = (lambda frame: frame.parent is not None and frame.parent.results[tid]), _START
+        elif axis == 'preceding-sibling':
+            tid = self.track(target)
+            self.uses_siblings = True
+            count, phase = (lambda frame: frame.siblings_before[tid]), _START
+        elif axis == 'preceding':
+            tid = self.track(target)
+            self.uses_preceding = True
+            count, phase = (lambda frame: frame.preceding[tid]), _START
+        elif axis == 'child':
+            tid = self.track(target)
+            count, phase = (lambda frame: frame.child_counts[tid]), _END
+        elif axis == 'descendant':
+            tid = self.track(target)
+            count, phase = (lambda frame: frame.descendant_counts[tid]), _END
+        else:
+            raise NotStreamable(f"{axis}::{target} looks ahead in the document")
+        if npath is None:
+            return (lambda frame: count(frame) > 0), phase
+        qualifier, n = npath.qualifier, npath.n
+        return (lambda frame: qualifier.is_satisfied_by(int(count(frame)), n)), phase
+
+    def property(self, prop: ElementProperty, start_check: Optional[Check]) -> Tuple[Check, int]:
+        if prop.xpath is not None:
+            raise NotStreamable(f"'{prop}' is a raw xpath property")
+        kind, args = prop.kind, prop.args
+        if kind in _look_ahead:
+            raise NotStreamable(f"'{prop}' {_look_ahead[kind]}")
+        if kind is PropertyKind.CLASS:
+            token = f' {args[0]} '
+            return (lambda frame: token in _class_string(frame.element)), _START
+        if kind in (PropertyKind.CLASSES, PropertyKind.ANY_OF_CLASSES, PropertyKind.NONE_OF_CLASSES):
+            tokens = [f' {name} ' for name in args]
+            combine = all if kind is PropertyKind.CLASSES else any
+            check = lambda frame: combine(token in classes for classes in [_class_string(frame.element)]
+                                          for token in tokens)
+            return (_negated(check) if kind is PropertyKind.NONE_OF_CLASSES else check), _START
+        if kind is PropertyKind.CLASS_CONTAINING:
+            name = args[0]
+            return (lambda frame: name in (frame.element.get('class') or '')), _START
+        if kind is PropertyKind.ATTRIBUTE:
+            name, value = args
+            return (lambda frame: frame.element.get(name) == value), _START
+        if kind is PropertyKind.HIDDEN:
+            return (lambda frame: _hidden(frame.element)), _START
+        if kind is PropertyKind.NTH_SIBLING:
+            index = args[0]
+            return (lambda frame: frame.index == index), _START
+        if kind is PropertyKind.N_CHILDREN:
+            n, relation = args
+            return (lambda frame: relation.is_satisfied_by(frame.children, n)), _END
+        if kind is PropertyKind.SOME_TEXT:
+            return (lambda frame: len(frame.text()) > 0), _END
+        if kind.name.startswith('TEXT'):
+            return _text_check(_own_text, kind, args[0]), _END
+        if kind.name.startswith('AGGREGATED'):
+            if start_check is None:
+                raise NotStreamable(f"'{prop}' on any element would keep the whole document in memory")
+            self.subtree_filters.append(start_check)
+            return _text_check(_string_value, kind, args[0]), _END
+        if kind is PropertyKind.RELATION:
+            relation, paths, npath = args[0], args[1], args[2]
+            if relation == 'sibling':
+                raise NotStreamable(f"'{prop}' looks at the following siblings")
+            parts = [self.axis(relation, target, npath) for target in paths]
+            return _all_of([c for c, _ in parts]), max(phase for _, phase in parts)
+        if kind in (PropertyKind.AND, PropertyKind.OR):
+            parts = [self.property(p, start_check) for p in args]
+            combine = _all_of if kind is PropertyKind.AND else _any_of
+            return combine([c for c, _ in parts]), max(phase for _, phase in parts)
+        if kind is PropertyKind.NOT:
+            check, phase = self.property(args[0], start_check)
+            return _negated(check), phase
+        raise NotStreamable(f"'{prop}' is not supported when streaming")
+
+
+class _Plan:
+    __slots__ = ('check', 'phase', 'start_check', 'tracked', 'subtree_filters', 'uses_inherited', 'uses_siblings',
+                 'uses_preceding')
+
+    def __init__(self, path: BasicPath):
+        compiler = _Compiler()
+        self.check, self.phase, self.start_check = compiler.path(path)
+        self.tracked = compiler.tracked
+        self.subtree_filters = compiler.subtree_filters
+        self.uses_inherited = compiler.uses_inherited
+        self.uses_siblings = compiler.uses_siblings
+        self.uses_preceding = compiler.uses_preceding
+
+
+# not cached: a plan is built once for a whole file
+def _streamable_plan(path: BasicPath, with_descendants: bool) -> _Plan:
+    plan = _Plan(path)
+    if with_descendants and plan.start_check is None:
+        raise NotStreamable(f"{path}: every element is a candidate, so keeping the descendants of matches "
+                            f"would keep the whole document (use with_descendants=False)")
+    return plan
+
+
+def not_streamable_reason(path: BasicPath, with_descendants: bool = True) -> Optional[str]:
+    try:
+        _streamable_plan(path, with_descendants)
+        return None
+    except NotStreamable as e:
+        return str(e)
+
+
+#########################################
+# evaluating
+
+# the matches of the path in a file name or binary file, each yielded at its end tag and complete until the generator
+# is resumed; with_descendants=False drops their subtrees, so paths without a start tag check can stream as well
+def iter_matches(source, path: BasicPath, html: bool = False, with_descendants: bool = True) \
+        -> Iterator[etree._Element]:
+    plan = _streamable_plan(path, with_descendants)
+    subtree_filters = list(plan.subtree_filters)
+    if with_descendants:
+        subtree_filters.append(plan.start_check)
+    return _stream(etree.iterparse(source, events=('start', 'end'), html=html, huge_tree=True), plan,
+                   subtree_filters)
+
+
+def _stream(events, plan: _Plan, subtree_filters: List[Check]) -> Iterator[etree._Element]:
+    tracked = len(plan.tracked)
+    starting = [(tid, check) for tid, (check, phase) in enumerate(plan.tracked) if phase == _START]
+    ending = [(tid, check) for tid, (check, phase) in enumerate(plan.tracked) if phase == _END]
+    check, decided_at_start = plan.check, plan.phase == _START
+    ended = [0] * tracked
+    current = None
+    for event, element in events:
+        if event == 'start':
+            parent = current
+            frame = current = _Frame(element, parent, tracked)
+            if parent is not None:
+                frame.index = parent.children
+                parent.children += 1
+                frame.keep = parent.keep or parent.keep_descendants
+                if plan.uses_inherited:
+                    frame.inherited = [n + r for n, r in zip(parent.inherited, parent.results)]
+                if plan.uses_siblings:
+                    frame.siblings_before = list(parent.child_counts)
+            else:
+                if plan.uses_inherited:
+                    frame.inherited = [0] * tracked
+                if plan.uses_siblings:
+                    frame.siblings_before = [0] * tracked
+            if plan.uses_preceding:
+                frame.preceding = list(ended)
+            for tid, c in starting:
+                frame.results[tid] = c(frame)
+            if decided_at_start:
+                frame.matched = check(frame)
+            frame.keep_descendants = any(f(frame) for f in subtree_filters)
+            continue
+
+        frame = current
+        for tid, c in ending:
+            frame.results[tid] = c(frame)
+        matched = frame.matched if decided_at_start else check(frame)
+        parent = current = frame.parent
+        results = frame.results
+        for tid in range(tracked):
+            if results[tid]:
+                ended[tid] += 1
+        if parent is not None:
+            child_counts, descendant_counts = parent.child_counts, parent.descendant_counts
+            own_descendants = frame.descendant_counts
+            for tid in range(tracked):
+                child_counts[tid] += results[tid]
+                descendant_counts[tid] += own_descendants[tid] + results[tid]
+        if matched:
+            yield element
+        if not frame.keep:
+            _release(element, parent)
+
+
+# drops what is no longer needed: the content of the element and the siblings before it, once the tails that may
+# hold the parent's first text node were looked at
+def _release(element, parent: Optional[_Frame]):
+    element.clear(keep_tail=True)
+    if parent is None:
+        return
+    parent_element = parent.element
+    while parent_element[0] is not element:
+        previous = parent_element[0]
+        if parent.first_text is None and previous.tail is not None:
+            parent.first_text = previous.tail
+        del parent_element[0]
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from dollarxpy.element_property import ElementProperty, PropertyKind
+from dollarxpy.snapshot import _ASCII_LOWER, _aggregated_text, _first_text, _xml_whitespace
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class _StringIndex:
+    __slots__ = ('postings', '_trigrams')
+
+    def __init__(self, values: List[str]):
+        postings = defaultdict(list)
+        for i, value in enumerate(values):
+            postings[value].append(i)
+        self.postings = {value: np.asarray(ids, dtype=np.int64) for value, ids in postings.items()}
+        self._trigrams = None
+
+    def _union(self, values) -> np.ndarray:
+        found = [self.postings[v] for v in values]
+        return np.sort(np.concatenate(found)) if found else _EMPTY
+
+    def equal_to(self, term: str) -> np.ndarray:
+        return self.postings.get(term, _EMPTY)
+
+    def matching(self, accept: Callable[[str], bool]) -> np.ndarray:
+        return self._union([v for v in self.postings if accept(v)])
+
+    def _trigram_index(self) -> Dict[str, set]:
+        if self._trigrams is None:
+            trigrams = defaultdict(set)
+            for value in self.postings:
+                for i in range(len(value) - 2):
+                    trigrams[value[i:i + 3]].add(value)
+            self._trigrams = trigrams
+        return self._trigrams
+
+    def containing(self, term: str) -> np.ndarray:
+        if len(term) < 3:
+            return self.matching(lambda v: term in v)
+        trigrams = self._trigram_index()
+        candidates = None
+        for i in range(len(term) - 2):
+            values = trigrams.get(term[i:i + 3])
+            if not values:
+                return _EMPTY
+            candidates = set(values) if candidates is None else candidates & values
+        return self._union([v for v in candidates if term in v])
+
+
+class TextIndex:
+    __slots__ = ('elements', '_classes', '_own_text', '_aggregated_text')
+
+    def __init__(self, elements: list):
+        self.elements = elements
+        self._classes = None
+        self._own_text = None
+        self._aggregated_text = None
+
+    def _class_postings(self) -> Dict[str, np.ndarray]:
+        if self._classes is None:
+            postings = defaultdict(list)
+            for i, element in enumerate(self.elements):
+                for token in set(_xml_whitespace.split(element.get('class') or '')):
+                    if token:
+                        postings[token].append(i)
+            self._classes = {token: np.asarray(ids, dtype=np.int64) for token, ids in postings.items()}
+        return self._classes
+
+    def own_text(self) -> _StringIndex:
+        if self._own_text is None:
+            self._own_text = _StringIndex([_first_text(e).translate(_ASCII_LOWER) for e in self.elements])
+        return self._own_text
+
+    def aggregated_text(self) -> _StringIndex:
+        if self._aggregated_text is None:
+            self._aggregated_text = _StringIndex([_aggregated_text(e).translate(_ASCII_LOWER)
+                                                  for e in self.elements])
+        return self._aggregated_text
+
+    def with_class(self, token: str) -> np.ndarray:
+        return self._class_postings().get(token, _EMPTY)
+
+    def with_all_classes(self, tokens) -> np.ndarray:
+        result = None
+        for token in tokens:
+            ids = self.with_class(token)
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+        return _EMPTY if result is None else result
+
+    def with_any_of_classes(self, tokens) -> np.ndarray:
+        found = [self.with_class(token) for token in tokens]
+        return np.unique(np.concatenate(found)) if found else _EMPTY
+
+    # node ids matching a text or class property, or None when the index cannot answer it exactly
+    def resolve(self, prop: ElementProperty) -> Optional[np.ndarray]:
+        if prop.xpath is not None:
+            return None
+        kind, args = prop.kind, prop.args
+        if kind in (PropertyKind.CLASS, PropertyKind.CLASSES, PropertyKind.ANY_OF_CLASSES):
+            if any(_xml_whitespace.search(name) or not name for name in args):
+                return None
+            if kind is PropertyKind.ANY_OF_CLASSES:
+                return self.with_any_of_classes(args)
+            return self.with_all_classes(args)
+        if kind is PropertyKind.SOME_TEXT:
+            return np.setdiff1d(np.arange(len(self.elements)), self.own_text().equal_to(""), assume_unique=True)
+        text_index = self.aggregated_text() if kind.name.startswith('AGGREGATED') else \
+            self.own_text() if kind.name.startswith('TEXT') else None
+        if text_index is None:
+            return None
+        term = args[0].lower()
+        if kind in (PropertyKind.TEXT_EQUALS, PropertyKind.AGGREGATED_TEXT_EQUALS):
+            return text_index.equal_to(term)
+        if kind in (PropertyKind.TEXT_CONTAINS, PropertyKind.AGGREGATED_TEXT_CONTAINS):
+            return text_index.containing(term)
+        if kind in (PropertyKind.TEXT_STARTS_WITH, PropertyKind.AGGREGATED_TEXT_STARTS_WITH):
+            return text_index.matching(lambda v: v.startswith(term))
+        return text_index.matching(lambda v: v.endswith(term))
@@ -10,23 +10,23 @@ class LogicalOp(Enum):
 
 
 def _translate_text_for_path(txt: str) -> str:
-    "translate(%s, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')".format(txt)
+    return f"translate({txt}, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
 
 
 def text_contains(text: str) -> str:
-    return "contains(%s, '%s')".format(_translate_text_for_path("text()"), text.lower())
+    return f"contains({_translate_text_for_path('text()')}, '{text.lower()}')"
 
 
 def text_equals(text):
-    return "%s = '%s'".format(_translate_text_for_path("text()"), text.lower())
+    return f"{_translate_text_for_path('text()')} = '{text.lower()}'"
 
 
 def aggregated_text_equals(text):
-    return "%s = '%s'".format(_translate_text_for_path("normalize-space(string(.))"), text.lower())
+    return f"{_translate_text_for_path('normalize-space(string(.))')} = '{text.lower()}'"
 
 
 def aggregated_text_contains(text):
-    return "contains(%s, '%s')".format(_translate_text_for_path("normalize-space(string(.))"), text.lower())
+    return f"contains({_translate_text_for_path('normalize-space(string(.))')}, '{text.lower()}')"
 
 
 has_some_text = "string-length(text()) > 0"
@@ -41,14 +41,14 @@ def has_class_containing(name):
 
 
 def has_classes(*class_names):
-    return _has_classes_internal("and", class_names)
+    return _has_classes_internal(LogicalOp.AND, class_names)
 
 
 def has_any_of_classes(*class_names):
-    return _has_classes_internal("or", class_names)
+    return _has_classes_internal(LogicalOp.OR, class_names)
 
 
-def _has_classes_internal(op: LogicalOp, *class_names):
+def _has_classes_internal(op: LogicalOp, class_names):
     return f" {op.value} ".join([has_class(x) for x in class_names])
 
 
@@ -57,7 +57,7 @@ def has_id(id):
 
 
 def has_attribute(attribute, value):
-    return f"@{attribute}={value}"
+    return f"@{attribute}='{value}'"
 
 
 def does_not_exist(path: str) -> str:
@@ -78,15 +78,15 @@ def n_occurrence(xpath: str, number_of_occurrences, relation_operator: RelationO
 
 
 def inside_top_level(xpath):
-    already_written_as_inside_top_level = compile("^[(]*[//]+.*").matches(xpath)
+    already_written_as_inside_top_level = compile("^[(]*[//]+.*").match(xpath)
     prefix = "" if already_written_as_inside_top_level else \
-        "(//" if xpath.startswith("/") else "//"
+        "(//" if xpath.startswith("(") else "//"
     chopn = 1 if (xpath.startswith("(") and not already_written_as_inside_top_level) else 0
     return prefix + xpath[chopn:]
 
 
 def text_ends_with(suffix: str) -> str:
-    return f"""substring(_translate_text_for_path("text()"), string-length(text()) - string-length('{suffix}') +1) = '{suffix.lower()}'"""
+    return f"""substring({_translate_text_for_path("text()")}, string-length(text()) - string-length('{suffix}') +1) = '{suffix.lower()}'"""
 
 
 def text_starts_with(prefix: str) -> str:
@@ -0,0 +1,58 @@
+"""A selenium driver stand-in for Browser and SessionPool tests: no page, only the calls they make."""
+from selenium.common.exceptions import WebDriverException
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def window(self, handle):
+        self._driver.current_window = handle
+
+
+class FakeDriver:
+    def __init__(self, async_results=(), healthy: bool = True, resettable: bool = True, script_results=()):
+        # returned (or raised, for exceptions) by the next execute_async_script calls
+        self.async_results = list(async_results)
+        self.async_calls = []
+        # likewise for execute_script; once they are used up, scripts return the document ready state
+        self.script_results = list(script_results)
+        self.script_calls = []
+        self.healthy = healthy
+        self.resettable = resettable
+        self.window_handles = ['w0']
+        self.current_window = 'w0'
+        self.switch_to = _SwitchTo(self)
+        self.visited = []
+        self.quitted = False
+
+    def execute_script(self, script, *args):
+        if not self.healthy or self.quitted:
+            raise WebDriverException("the session is gone")
+        self.script_calls.append((script, args))
+        if not self.script_results:
+            return 'complete'
+        result = self.script_results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def execute_async_script(self, script, *args):
+        self.async_calls.append(args)
+        result = self.async_results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self):
+        self.window_handles.remove(self.current_window)
+
+    def delete_all_cookies(self):
+        if not self.resettable:
+            raise WebDriverException("cookies cannot be deleted")
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def quit(self):
+        self.quitted = True
@@ -0,0 +1,178 @@
+import asyncio
+import time
+
+import pytest
+
+from dollarxpy import button, div, has_class, li
+from dollarxpy.async_browser import AsyncBrowser
+from dollarxpy.operations import OperationFailed
+from webdriver_stub import StubWebDriver
+
+PAGE = '<html><body><div class="menu"><ul><li>one</li><li>two</li><li>three</li></ul></div>' \
+       '<button>save</button></body></html>'
+
+
+def run(test, **options):
+    async def with_stub():
+        async with StubWebDriver(PAGE, **options) as url:
+            return await test(url)
+    return asyncio.run(with_stub())
+
+
+def test_queries():
+    async def test(url):
+        async with await AsyncBrowser.start(url) as browser:
+            assert await browser.count(li) == 3
+            assert await browser.exists(div.that(has_class('menu')))
+            assert len(await browser.find_all(li.descendant_of(div))) == 3
+            assert await browser.get_text(li) == 'one'
+    run(test)
+
+
+def test_sessions_run_concurrently():
+    async def test(url):
+        browsers = await asyncio.gather(*[AsyncBrowser.start(url) for _ in range(5)])
+        start = time.perf_counter()
+        counts = await asyncio.gather(*[b.count(li) for b in browsers for _ in range(2)])
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*[b.quit() for b in browsers])
+        return counts, elapsed
+    counts, elapsed = run(test, latency=0.1)
+    assert counts == [3] * 10
+    # the commands of a session run in turn, the sessions side by side
+    assert elapsed < 0.5
+
+
+def test_keep_alive_connection_is_reused():
+    stub = StubWebDriver(PAGE)
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            for _ in range(3):
+                await browser.count(li)
+    asyncio.run(test())
+    assert stub.connections == 1
+
+
+def test_dropped_idle_connection_is_opened_again():
+    stub = StubWebDriver(PAGE, close_idle=True)
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            return [await browser.count(li) for _ in range(3)]
+    assert asyncio.run(test()) == [3, 3, 3]
+    assert stub.connections == 5
+
+
+def test_chunked_bodies():
+    async def test(url):
+        async with await AsyncBrowser.start(url) as browser:
+            return await browser.count(li), await browser.get_text(button)
+    assert run(test, chunked=True) == (3, 'save')
+
+
+# the trailer fields are read with the response, the next one on the same connection starts after them
+def test_chunked_bodies_with_trailers():
+    stub = StubWebDriver(PAGE, chunked=True, trailers=('X-Checksum: 1', 'X-Elapsed: 2'))
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            return await browser.count(li), await browser.get_text(button), await browser.exists(div)
+    assert asyncio.run(asyncio.wait_for(test(), 5)) == (3, 'save', True)
+    assert stub.connections == 1
+
+
+def test_command_after_cancelled_one_reads_its_own_response():
+    async def test(url):
+        async with await AsyncBrowser.start(url) as browser:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(browser.count(li), 0.05)
+            return await browser.count(button)
+    assert run(test, latency=0.1) == 1
+
+
+def test_command_is_not_sent_again_after_a_partial_response():
+    stub = StubWebDriver(PAGE)
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            element = await browser.find(button)
+            stub.raw_responses.append(b'HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n{"value"')
+            with pytest.raises(OperationFailed):
+                await element.click()
+    asyncio.run(test())
+    assert sum(path.endswith('/click') for _, path in stub.commands) == 1
+
+
+@pytest.mark.parametrize('response', [b'garbage\r\n\r\n', b'HTTP/1.1 OK\r\n\r\n', b'HTTP/1.1 200 OK\r\n\r\nnot json'])
+def test_malformed_responses_fail_the_operation(response):
+    stub = StubWebDriver(PAGE)
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            stub.raw_responses.append(response)
+            with pytest.raises(OperationFailed):
+                await browser.count(li)
+            assert await browser.count(li) == 3
+    asyncio.run(test())
+
+
+def test_webdriver_errors_fail_the_operation():
+    stub = StubWebDriver(PAGE)
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            stub.script_errors.append({'error': 'javascript error', 'message': 'invalid xpath'})
+            with pytest.raises(OperationFailed, match='javascript error: invalid xpath'):
+                await browser.count(li)
+            with pytest.raises(OperationFailed, match='could not find'):
+                await browser.find(div.that(has_class('missing')))
+    asyncio.run(test())
+
+
+def test_refused_connection_fails_the_operation():
+    async def test():
+        stub = StubWebDriver(PAGE)
+        url = await stub.start()
+        await stub.stop()
+        with pytest.raises(OperationFailed):
+            await AsyncBrowser.start(url)
+    asyncio.run(test())
+
+
+def test_wait_until():
+    stub = StubWebDriver(PAGE)
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            root = next(iter(stub.sessions.values()))['root']
+            asyncio.get_running_loop().call_later(0.05, lambda: root.find('.//button').set('class', 'done'))
+            await browser.wait_until(button.that(has_class('done')), timeout=2)
+            with pytest.raises(OperationFailed, match='was still found'):
+                await browser.wait_until_gone(li, timeout=0.05)
+    asyncio.run(test())
+
+
+def test_wait_is_tried_again_after_navigation_and_script_timeout():
+    stub = StubWebDriver(PAGE)
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            stub.script_errors += [{'error': 'javascript error', 'message': 'document unloaded while waiting'},
+                                   {'error': 'script timeout', 'message': ''}]
+            await browser.wait_until(li, timeout=2)
+    asyncio.run(test())
+    assert sum(path.endswith('/execute/async') for _, path in stub.commands) == 3
+
+
+def test_wait_fails_at_once_on_other_errors():
+    stub = StubWebDriver(PAGE)
+
+    async def test():
+        async with stub as url, await AsyncBrowser.start(url) as browser:
+            stub.script_errors.append({'error': 'javascript error', 'message': 'not a valid XPath expression'})
+            with pytest.raises(OperationFailed, match='failed to wait'):
+                await browser.wait_until(li, timeout=10)
+    start = time.perf_counter()
+    asyncio.run(test())
+    assert time.perf_counter() - start < 1
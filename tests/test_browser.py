@@ -0,0 +1,151 @@
+import pytest
+from lxml.cssselect import CSSSelector
+from selenium.common.exceptions import JavascriptException, TimeoutException, WebDriverException
+
+from dollarxpy import custom_element, div, has_child, has_class, has_text, is_last_sibling, li, span, td, tr
+from dollarxpy.browser import Browser
+from dollarxpy.npath import at_least, exactly
+from dollarxpy.operations import OperationFailed
+from dollarxpy.queries import EVALUATE_ALL_SCRIPT, EXTRACT_SCRIPT, WITHIN_SCRIPT, count_query, elements_query, \
+    exists_query
+from dollarxpy.snapshot import Snapshot
+from fake_driver import FakeDriver
+from webdriver_stub import _satisfied
+from test_snapshot import _GRID, _SCOPED
+
+
+def test_wait_is_tried_again_after_navigation_and_script_timeout():
+    driver = FakeDriver([JavascriptException("javascript error: document unloaded while waiting for result"),
+                         TimeoutException("script timeout"), True])
+    Browser(driver).wait_until(div, timeout=5)
+    assert len(driver.async_calls) == 3
+
+
+@pytest.mark.parametrize('error', [
+    JavascriptException("javascript error: Failed to execute 'evaluate' on 'Document': not a valid XPath expression"),
+    WebDriverException("invalid session id"),
+])
+def test_wait_fails_at_once_on_other_errors(error):
+    driver = FakeDriver([error, True])
+    with pytest.raises(OperationFailed, match='failed to wait') as raised:
+        Browser(driver).wait_until(div, timeout=5)
+    assert raised.value.__cause__ is error
+    assert len(driver.async_calls) == 1
+
+
+def test_wait_times_out():
+    with pytest.raises(OperationFailed, match='still found'):
+        Browser(FakeDriver([False])).wait_until_gone(div, timeout=0)
+
+
+def test_batches_are_evaluated_in_one_script():
+    paths = [div, li.that(has_text('a')), at_least(2).occurrences_of(span)]
+    driver = FakeDriver(script_results=[[1, 0, 3], [True, False, 1]])
+    browser = Browser(driver)
+    assert browser.count_all(paths) == [1, 0, 3]
+    assert browser.exists_all(paths) == [True, False, False]
+    assert driver.script_calls == [(EVALUATE_ALL_SCRIPT, ([count_query(p) for p in paths],)),
+                                   (EVALUATE_ALL_SCRIPT, ([exists_query(p) for p in paths],))]
+    assert exists_query(paths[2]) == count_query(paths[2])
+
+
+def test_npath_conditions_are_sent_with_the_elements_queries():
+    paths = [div, exactly(2).occurrences_of(span), exactly(1).occurrences_of(li)]
+    driver = FakeDriver(script_results=[[['d'], ['s1', 's2'], ['l1', 'l2']]])
+    assert Browser(driver).find_all_of(paths) == [['d'], ['s1', 's2'], []]
+    queries = [elements_query(p) for p in paths]
+    assert driver.script_calls == [(EVALUATE_ALL_SCRIPT, (queries,))]
+    assert [query[3:] for query in queries] == [[], [['=', 2]], [['=', 1]]]
+
+
+# evaluates the queries of EVALUATE_ALL_SCRIPT with lxml on a page
+class _EvaluateAllDriver(FakeDriver):
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+
+    def execute_script(self, script, *args):
+        self.script_calls.append((script, args))
+        results = []
+        for selector, result_type, is_css, *condition in args[0]:
+            found = CSSSelector(selector)(self.root) if is_css else self.root.xpath(selector)
+            if is_css and result_type != 7:  # a count or a boolean, not the elements
+                found = len(found) if result_type == 1 else bool(found)
+            if condition and not _satisfied(len(found), *condition[0]):
+                found = []
+            results.append(found)
+        return results
+
+
+def test_batch_results_are_those_of_the_snapshot():
+    paths = [td.that(has_class('c')), span.descendant_of(tr.that(has_class('odd'))), custom_element('b'),
+             at_least(2).occurrences_of(custom_element('b')), exactly(5).occurrences_of(span),
+             span.that(has_text('v3')),
+             exactly(1).occurrences_of(td.that(is_last_sibling).that(has_child(custom_element('b'))))]
+    snapshot = Snapshot.from_html(_GRID)
+    driver = _EvaluateAllDriver(snapshot.root)
+    browser = Browser(driver)
+    assert browser.find_all_of(paths) == [snapshot.find_all(p) for p in paths]
+    assert browser.count_all(paths) == [snapshot.count(p) for p in paths]
+    assert browser.exists_all(paths) == [snapshot.exists(p) for p in paths]
+    assert [script for script, _ in driver.script_calls] == [EVALUATE_ALL_SCRIPT] * 3
+
+
+def test_batches_fail_on_script_errors():
+    error = JavascriptException("javascript error")
+    with pytest.raises(OperationFailed, match='failed to evaluate 2 xpath queries') as raised:
+        Browser(FakeDriver(script_results=[error])).count_all([div, span])
+    assert raised.value.__cause__ is error
+
+
+@pytest.mark.parametrize('path', [div, li.that(has_text('a'))], ids=str)
+def test_occurrences_are_counted_in_the_page(path):
+    driver = FakeDriver(script_results=[[3], [3]])
+    assert Browser(driver).assert_occurrences(at_least(2).occurrences_of(path)) == 3
+    with pytest.raises(OperationFailed, match='found 3'):
+        Browser(driver).assert_occurrences(exactly(2).occurrences_of(path))
+    query = count_query(path)
+    assert driver.script_calls == [(EVALUATE_ALL_SCRIPT, ([query],))] * 2
+    assert query[1] == 1  # XPathResult.NUMBER_TYPE
+    assert query[2] or query[0].startswith('count(')
+
+
+def test_extract_sends_one_script_with_the_columns_asked_for():
+    columns = {'aggregated_text': ['a', 'b'], '@href': ['/1', None]}
+    driver = FakeDriver(script_results=[columns])
+    path = exactly(2).occurrences_of(li.that(has_text('a')))
+    assert Browser(driver).extract(path, ('href',), text=False) == columns
+    assert driver.script_calls == [(EXTRACT_SCRIPT, (elements_query(path), ['href'], False, True))]
+    assert elements_query(path)[3] == ['=', 2]
+
+
+def test_extract_fails_on_script_errors():
+    error = JavascriptException("javascript error")
+    with pytest.raises(OperationFailed, match='failed to extract') as raised:
+        Browser(FakeDriver(script_results=[error])).extract(div)
+    assert raised.value.__cause__ is error
+
+
+# evaluates the query of WITHIN_SCRIPT with lxml, the contexts being lxml elements
+class _WithinDriver(FakeDriver):
+    def execute_script(self, script, *args):
+        self.script_calls.append((script, args))
+        contexts, (xpath, result_type) = args
+        return [context.xpath(xpath) for context in contexts]
+
+
+_NPATHS_IN_ROWS = [exactly(1).occurrences_of(span.descendant_of(td)), exactly(1).occurrences_of(custom_element('b'))]
+
+
+@pytest.mark.parametrize('path', _SCOPED + _NPATHS_IN_ROWS, ids=str)
+def test_queries_within_elements_find_what_scopes_do(path):
+    rows = Snapshot.from_html(_GRID).scopes(tr)
+    contexts = [row.element for row in rows]
+    driver = _WithinDriver()
+    browser = Browser(driver)
+    assert browser.find_all_within(contexts, path) == [row.find_all(path) for row in rows]
+    assert browser.count_within(contexts, path) == [row.count(path) for row in rows]
+    assert browser.exists_within(contexts, path) == [row.exists(path) for row in rows]
+    assert [script for script, _ in driver.script_calls] == [WITHIN_SCRIPT] * 3
+    assert all(query[0].startswith(('.//', '(.//', 'count(.//', 'count((.//', 'boolean(.//', 'boolean((.//'))
+               for _, (_, query) in driver.script_calls)
@@ -0,0 +1,67 @@
+import gc
+import weakref
+
+import pytest
+from lxml import html
+
+from dollarxpy import div, has_class, has_text_containing, span
+from dollarxpy import basic_path
+from dollarxpy.basic_path import PathKind
+from dollarxpy.css import compile_selector
+from dollarxpy.incremental import SnapshotSeries
+from dollarxpy.optimizer import optimized_xpath
+from dollarxpy.planner import plan_batch
+from dollarxpy.predicates import compile_properties
+from dollarxpy.snapshot import Snapshot
+from dollarxpy.streaming import not_streamable_reason
+
+
+def _series(path):
+    SnapshotSeries([path]).update(Snapshot(html.document_fromstring('<p><span>not kept</span></p>')))
+
+
+# what is computed from a path is kept on the path itself, or by its caller, and never keeps it alive
+@pytest.mark.parametrize('compute', [
+    compile_selector, optimized_xpath, lambda path: plan_batch([path, div]), not_streamable_reason, _series,
+], ids=['compile_selector', 'optimized_xpath', 'plan_batch', 'not_streamable_reason', 'SnapshotSeries'])
+def test_computing_from_a_path_does_not_keep_it_alive(compute):
+    path = span.that(has_class('not-kept'), has_text_containing('not kept')).child_of(div)
+    compute(path)
+    reference = weakref.ref(path)
+    del path
+    gc.collect()
+    assert reference() is None
+
+
+def test_compiling_properties_does_not_keep_them_alive():
+    prop = has_text_containing('not kept either')
+    assert compile_properties([prop, has_class('not-kept')]) is not None
+    reference = weakref.ref(prop)
+    del prop
+    gc.collect()
+    assert reference() is None
+
+
+# renderings are kept on the path, and an equal path built while it is alive is the same interned instance
+def test_path_built_again_while_alive_is_not_rendered_again(monkeypatch):
+    renders = []
+    for table in (basic_path._xpath_renderers, basic_path._alternate_xpath_renderers,
+                  basic_path._without_inside_renderers):
+        render = table[PathKind.RELATION]
+        monkeypatch.setitem(table, PathKind.RELATION, lambda path, render=render: renders.append(path) or render(path))
+    path = span.that(has_class('rendered-once')).child_of(div)
+    rendered = path.get_xpath(), path.get_alternate_xpath(), path._get_xpath_without_inside_claus()
+    assert len(renders) == 3
+    again = span.that(has_class('rendered-once')).child_of(div)
+    assert (again.get_xpath(), again.get_alternate_xpath(), again._get_xpath_without_inside_claus()) == rendered
+    assert len(renders) == 3
+
+
+def test_rendering_a_path_does_not_keep_its_operands_alive():
+    operand = div.that(has_class('operand-not-kept'))
+    path = span.child_of(operand)
+    path.get_xpath(), path.get_alternate_xpath(), path._get_xpath_without_inside_claus()
+    reference = weakref.ref(operand)
+    del path, operand
+    gc.collect()
+    assert reference() is None
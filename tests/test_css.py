@@ -0,0 +1,29 @@
+import pytest
+from lxml import html
+from lxml.cssselect import CSSSelector
+
+from dollarxpy import div, element, has_class, has_classes, has_none_of_the_classes, not_prop, span
+from dollarxpy.css import compile_css, compile_selector
+from dollarxpy.optimizer import optimized_xpath
+from test_optimizer import _SAMPLE, corpus
+
+
+def test_compiled_selector_is_kept_on_the_path():
+    path = span.that(has_class('x')).child_of(div)
+    assert compile_selector(path) is compile_selector(span.that(has_class('x')).child_of(div))
+    assert compile_selector(path).selector == 'div > span.x'
+
+
+@pytest.mark.parametrize('path', corpus() + [
+    span.that(has_class('a main')),
+    div.that(has_class('a main')),
+    element.that(has_class('')),
+    span.that(has_classes('x', 'y x')),
+    span.that(has_none_of_the_classes('y', 'a main')),
+    span.that(not_prop(has_class('a main'))),
+], ids=str)
+def test_css_finds_what_xpath_does(path):
+    document = html.document_fromstring(_SAMPLE)
+    css = compile_css(path)
+    if css is not None:
+        assert CSSSelector(css)(document) == document.xpath(optimized_xpath(path))
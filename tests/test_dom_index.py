@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from lxml import html
+
+from dollarxpy import child_number, div, has_ancestor, has_class, is_with_index, li, span, td, ul
+from dollarxpy.dom_index import DomIndex
+from dollarxpy.npath import at_least, at_most, exactly
+from dollarxpy.snapshot import Snapshot
+from test_optimizer import _DOCUMENTS, corpus
+
+PAGE = '<html><body><div class="a"><ul><li>1</li><li><span>2</span></li></ul></div><span>3</span>' \
+       '<div><ul><li>4</li></ul></div></body></html>'
+
+
+def test_relation_target_shared_by_a_batch_is_evaluated_once(monkeypatch):
+    target = div.that(has_class('a'))
+    paths = [span.descendant_of(target), li.descendant_of(target), ul.descendant_of(target),
+             span.that(has_ancestor(target))]
+    evaluated = []
+    mask = DomIndex._mask
+
+    def counted(index, path):
+        evaluated.append(path)
+        return mask(index, path)
+    monkeypatch.setattr(DomIndex, '_mask', counted)
+    document = html.document_fromstring(PAGE)
+    found = DomIndex(document).find_all_of(paths)
+    assert evaluated.count(target) == 1
+    snapshot = Snapshot(document)
+    assert found == [snapshot.find_all(p) for p in paths]
+
+
+@pytest.mark.parametrize('document', list(_DOCUMENTS))
+@pytest.mark.parametrize('path', corpus(), ids=str)
+def test_index_finds_what_the_snapshot_does(document, path):
+    index, snapshot = DomIndex(_DOCUMENTS[document]), Snapshot(_DOCUMENTS[document])
+    assert index.find_all(path) == snapshot.find_all(path)
+    assert index.count(path) == snapshot.count(path)
+
+
+@pytest.mark.parametrize('document', list(_DOCUMENTS))
+@pytest.mark.parametrize('npath', [
+    at_least(2).occurrences_of(li), at_most(3).occurrences_of(td), exactly(1).occurrences_of(span.child_of(div)),
+    at_most(1).occurrences_of(ul.descendant_of(li)), at_least(1).occurrences_of(li.that(has_class('x'))),
+], ids=str)
+def test_npath_count_and_exists(document, npath):
+    index, snapshot = DomIndex(_DOCUMENTS[document]), Snapshot(_DOCUMENTS[document])
+    assert index.count(npath) == snapshot.count(npath)
+    assert index.exists(npath) == snapshot.exists(npath)
+    assert index.find_all(npath) == snapshot.find_all(npath)
+
+
+@pytest.mark.parametrize('axis', ['self', 'child', 'parent', 'descendant', 'ancestor', 'following', 'preceding',
+                                  'preceding-sibling', 'following-sibling'])
+def test_axis_counts(axis):
+    document = _DOCUMENTS['sample']
+    index = DomIndex(document)
+    counts = index.axis_counts(index._tag_mask('span'), axis)
+    assert counts.tolist() == [int(e.xpath(f'count({axis}::span)')) for e in index.elements]
+
+
+@pytest.mark.parametrize('path', [child_number(2).of_type(td), li.that(is_with_index(2))], ids=str)
+def test_unsupported_paths_fall_back_to_xpath(path):
+    document = _DOCUMENTS['sample']
+    index = DomIndex(document)
+    assert not index.supports(path)
+    assert index.find_all(path) == Snapshot(document).find_all(path) != []
+    assert index.count(path) == len(index.find_all(path))
+    assert isinstance(index.matches(path), np.ndarray)
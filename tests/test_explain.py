@@ -0,0 +1,46 @@
+import pytest
+from lxml import html
+
+from dollarxpy import div, has_class, has_raw_xpath_property, has_text, li, span, ul
+from dollarxpy.explain import CostClass, explain, most_expensive
+from dollarxpy.snapshot import Snapshot
+
+_CHEAP = div
+_MODERATE = span.that(has_text('a'))
+_EXPENSIVE = span.after(ul)
+_NESTED = div.that(has_raw_xpath_property("count(//li) > count(//span[@title='//'])", "has more items than spans"))
+
+
+@pytest.mark.parametrize('path, cost, full_document_axes, nested_document_scans, string_functions', [
+    (_CHEAP, CostClass.CHEAP, 0, 0, 0),
+    (li.child_of(ul), CostClass.CHEAP, 0, 0, 0),
+    (_MODERATE, CostClass.MODERATE, 0, 0, 1),
+    (div.that(has_raw_xpath_property("count(span) > 1", "has spans")), CostClass.MODERATE, 0, 0, 0),
+    (_EXPENSIVE, CostClass.EXPENSIVE, 1, 0, 0),
+    (_NESTED, CostClass.EXPENSIVE, 0, 2, 0),
+], ids=str)
+def test_cost(path, cost, full_document_axes, nested_document_scans, string_functions):
+    explanation = explain(path)
+    assert (explanation.cost, explanation.full_document_axes, explanation.nested_document_scans,
+            explanation.string_functions) == (cost, full_document_axes, nested_document_scans, string_functions)
+    assert explanation.measured_time is None
+
+
+def test_uses_alternate_when_the_xpath_has_a_hierarchy():
+    assert not explain(span.that(has_class('x'))).uses_alternate
+    explanation = explain(span.child_of(div))
+    assert explanation.uses_alternate
+    assert explanation.alternate_xpath == span.child_of(div).get_alternate_xpath()
+
+
+def test_measured_on_a_document():
+    document = html.document_fromstring('<html><body><div><span>a</span><span>b</span></div></body></html>')
+    explanation = explain(span.child_of(div), document)
+    assert explanation.found == 2
+    assert explanation.measured_time >= 0
+    assert explain(span, Snapshot(document)).found == 2
+
+
+def test_most_expensive_ranks_by_estimated_cost():
+    ranked = most_expensive([_CHEAP, _MODERATE, _NESTED, _EXPENSIVE], limit=3)
+    assert [e.description for e in ranked] == [str(_NESTED), str(_EXPENSIVE), str(_MODERATE)]
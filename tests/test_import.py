@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+# loaded only once a browser or document API is used
+LAZY_MODULES = ('selenium', 'lxml', 'numpy', 'typedpy')
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _python(code: str):
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True, cwd=_ROOT)
+    return json.loads(output.stdout)
+
+
+def test_import_loads_no_optional_dependency_and_builds_no_element():
+    loaded = _python(f"""
+import json, sys
+import dollarxpy, dollarxpy.elements as elements
+print(json.dumps({{
+    'modules': [m for m in {LAZY_MODULES!r} if m in sys.modules],
+    'elements': [name for name in elements.__all__ if name in vars(elements)],
+}}))
+""")
+    assert loaded == {'modules': [], 'elements': []}
+
+
+def test_star_import_exports_elements_and_properties():
+    exported = _python("""
+import json
+from dollarxpy import *
+print(json.dumps(['div' in dir(), 'span' in dir(), 'has_class' in dir(), 'BasicPath' in dir(),
+                  'basic_path' in dir()]))
+""")
+    assert exported == [True, True, True, True, False]
@@ -0,0 +1,142 @@
+import copy
+import random
+
+import pytest
+from lxml import etree, html
+
+import dollarxpy as d
+from dollarxpy.incremental import SnapshotSeries, not_incremental_reason
+from dollarxpy.npath import at_least, exactly
+from dollarxpy.snapshot import Snapshot
+
+PAGE = """<html><body>
+<div id="main" class="a"><h1>Title</h1>
+  <ul class="menu"><li class="x">one</li><li>two <b>b</b></li><li class="x y">three</li></ul>
+  <table><tr class="sel"><td>1</td><td class="c">2</td></tr><tr><td>3</td><td><span>x</span></td></tr></table>
+  <div class="a"><span class="x">inner</span><!-- note --><span>b</span></div>
+</div>
+<div class="b"><span>tail</span>after<p>text <i>i</i></p></div>
+</body></html>"""
+
+tr = d.custom_element('tr')
+p = d.custom_element('p')
+
+LOCAL = [
+    d.li, d.li.that(d.has_class('x')), d.span.that(d.has_text('x')), d.span.descendant_of(d.div.that(d.has_class('a'))),
+    d.td.child_of(tr.that(d.has_class('sel'))), d.li.that(d.is_last_sibling), d.li.that(d.is_nth_sibling(1)),
+    d.td.that(d.is_only_child), d.span.that(d.is_nth_from_last_sibling(0)), d.ul.that(d.has_n_children(3).or_more()),
+    d.element.that(d.has_aggregated_text_containing('b')), d.div.that(d.has_child(d.span)),
+    d.element.that(d.has_ancestor(d.ul)), d.element.that(d.has_no_children), d.li.or_(d.span),
+    d.anything_except(d.li).that(d.has_class('x')), d.element.that(d.has_attribute('v', 'data-v')),
+    d.div.that(d.contains(d.span, d.custom_element('b'))), d.span.that(d.has_text_containing('')),
+    d.element.that(d.has_class('a').or_(d.has_text('b')).and_not(d.has_class('y'))),
+    d.td.that(d.is_child_of(tr.that(d.is_nth_sibling(0)))),
+]
+
+NOT_LOCAL = [
+    d.span.after_sibling(d.span), d.li.that(d.is_after_sibling(at_least(1).occurrences_of(d.li))),
+    d.span.after(d.ul), d.li.before(d.table), d.element.that(d.is_sibling_of(d.ul)), d.first_occurrence_of(d.li),
+    d.last_occurrence_of(d.span), d.child_number(2).of_type(d.li), d.li.that(d.is_with_index(1)),
+    d.custom_element('div/span'), d.span.that(d.has_raw_xpath_property('@class', 'has a class')),
+    d.element.that(d.has_ancestor(d.element.that(d.has_child(d.li)))),
+]
+
+NPATHS = [at_least(2).occurrences_of(d.li.that(d.has_class('x'))),
+          exactly(1).occurrences_of(d.span.that(d.has_text('x')))]
+
+
+def _assert_series_finds_what_the_snapshot_does(series: SnapshotSeries, root):
+    snapshot = Snapshot(html.document_fromstring(etree.tostring(root)))
+    series.update(snapshot)
+    for path in LOCAL + NOT_LOCAL + NPATHS:
+        assert series.find_all(path) == snapshot.find_all(path), str(path)
+
+
+def _element(tag: str, text=None, css_class=None):
+    element = etree.Element(tag)
+    element.text = text
+    if css_class is not None:
+        element.set('class', css_class)
+    return element
+
+
+# each edit changes the tree in place
+EDITS = [
+    ('set an attribute', lambda root: root.xpath('//li')[1].set('class', 'x')),
+    ('remove an attribute', lambda root: root.xpath('//li')[0].attrib.pop('class')),
+    ('add a data attribute', lambda root: root.xpath('//td')[2].set('data-v', 'v')),
+    ('change text', lambda root: setattr(root.xpath('//span')[0], 'text', 'b')),
+    ('change a tail', lambda root: setattr(root.xpath('//b')[0], 'tail', ' bb')),
+    ('nothing', lambda root: None),
+    ('insert a first child', lambda root: root.xpath('//ul')[0].insert(0, _element('li', 'zero', 'x'))),
+    ('append a child', lambda root: root.xpath('//ul')[0].append(_element('li', 'x'))),
+    ('insert in a row', lambda root: root.xpath('//tr')[1].insert(1, _element('td', 'new'))),
+    ('delete an element', lambda root: root.xpath('//li')[2].getparent().remove(root.xpath('//li')[2])),
+    ('delete a subtree', lambda root: root.xpath('//table')[0].remove(root.xpath('//tr')[0])),
+    ('move an element', lambda root: root.xpath('//div[@class="b"]')[0].append(root.xpath('//ul/li')[0])),
+    ('move a subtree', lambda root: root.xpath('//ul')[0].append(root.xpath('//div[@class="a"]/div')[0])),
+    ('insert a comment', lambda root: root.xpath('//ul')[0].insert(1, etree.Comment('c'))),
+    ('replace the body', lambda root: root.xpath('//body')[0].insert(0, _element('span', 'x', 'x'))),
+]
+
+
+def test_paths_that_are_not_local_are_evaluated_on_the_document():
+    assert [path for path in LOCAL if not_incremental_reason(path) is not None] == []
+    assert [path for path in NOT_LOCAL if not_incremental_reason(path) is None] == []
+
+
+def test_series_after_each_edit():
+    series = SnapshotSeries(LOCAL + NOT_LOCAL + NPATHS)
+    root = html.document_fromstring(PAGE)
+    _assert_series_finds_what_the_snapshot_does(series, root)
+    for _, edit in EDITS:
+        edit(root)
+        _assert_series_finds_what_the_snapshot_does(series, root)
+    assert series.reused > 0 and series.updated > 0
+
+
+@pytest.mark.parametrize('name, edit', EDITS, ids=[name for name, _ in EDITS])
+def test_series_after_one_edit(name, edit):
+    series = SnapshotSeries(LOCAL + NOT_LOCAL + NPATHS)
+    root = html.document_fromstring(PAGE)
+    _assert_series_finds_what_the_snapshot_does(series, root)
+    edit(root)
+    _assert_series_finds_what_the_snapshot_does(series, root)
+
+
+def _random_edit(root, rng: random.Random):
+    elements = [e for e in root.iter(etree.Element) if e.tag not in ('html', 'body')]
+    element = rng.choice(elements) if elements else None
+    edit = rng.randrange(7) if elements else 3
+    if edit == 0:
+        element.set('class', rng.choice(['x', 'a', 'x y', 'sel', 'b', '']))
+    elif edit == 1:
+        element.attrib.pop('class', None)
+    elif edit == 2:
+        setattr(element, rng.choice(['text', 'tail']), rng.choice([None, 'x', 'b', 'B', ' ab b ', '']))
+    elif edit == 3:
+        parent = rng.choice(elements + [root.find('body')])
+        new = _element(rng.choice(['li', 'span', 'div', 'td', 'b']), rng.choice([None, 'x', 'b']),
+                       rng.choice([None, 'x', 'a', 'sel']))
+        parent.insert(rng.randrange(len(parent) + 1), new)
+    elif edit == 4:
+        element.getparent().remove(element)
+    elif edit == 5:
+        targets = [e for e in elements + [root.find('body')] if element not in e.iterancestors() and e is not element]
+        target = rng.choice(targets)
+        target.insert(rng.randrange(len(target) + 1), element)
+    else:
+        element.getparent().insert(element.getparent().index(element), copy.deepcopy(element))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_series_after_random_edits(seed):
+    rng = random.Random(seed)
+    series = SnapshotSeries(LOCAL + NOT_LOCAL + NPATHS)
+    root = html.document_fromstring(PAGE)
+    _assert_series_finds_what_the_snapshot_does(series, root)
+    for _ in range(40):
+        for _ in range(rng.randint(1, 3)):
+            _random_edit(root, rng)
+        _assert_series_finds_what_the_snapshot_does(series, root)
+    assert series.updated > 0
@@ -0,0 +1,57 @@
+import gc
+import json
+import os
+import subprocess
+import sys
+import weakref
+
+import pytest
+
+from dollarxpy import BasicPath, div, has_class, has_text, li, span
+from dollarxpy.element_property import ElementProperty
+from dollarxpy.immutable import is_interning_enabled, set_interning
+from dollarxpy.npath import NPath, at_least
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def interning_disabled():
+    enabled = is_interning_enabled()
+    set_interning(False)
+    yield
+    set_interning(enabled)
+
+
+def test_equal_paths_are_one_instance():
+    assert span.that(has_class('x')).child_of(div) is span.that(has_class('x')).child_of(div)
+    assert has_text('a').or_(has_class('b')) is has_text('a').or_(has_class('b'))
+    assert at_least(2).occurrences_of(li) is at_least(2).occurrences_of(li)
+    assert BasicPath(xpath='p') is BasicPath(xpath='p', element_properties=())
+    assert span.that(has_class('x')) is not span.that(has_class('y'))
+
+
+def test_dropped_paths_are_released():
+    path = span.that(has_class('released')).child_of(div)
+    reference = weakref.ref(path)
+    table_size = len(BasicPath._instances)
+    del path
+    gc.collect()
+    assert reference() is None
+    assert len(BasicPath._instances) < table_size
+
+
+def test_paths_built_with_interning_disabled_are_equal_but_not_identical(interning_disabled):
+    assert not is_interning_enabled()
+    first, second = span.that(has_class('x')).child_of(div), span.that(has_class('x')).child_of(div)
+    assert first is not second
+    assert first == second and hash(first) == hash(second)
+    assert ElementProperty(kind=has_class('x').kind, args=('x',)) is not has_class('x')
+    assert NPath(path=li, n=1, qualifier=at_least(1).qualifier) is not at_least(1).occurrences_of(li)
+
+
+def test_interning_is_disabled_by_the_environment():
+    code = "import json; from dollarxpy import span; print(json.dumps(span.that() is span.that()))"
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True, cwd=_ROOT,
+                            env={**os.environ, 'DOLLARXPY_INTERNING': '0'})
+    assert json.loads(output.stdout) is False
@@ -0,0 +1,97 @@
+import pytest
+from lxml import etree, html
+
+import dollarxpy as d
+from dollarxpy.npath import at_least, at_most, exactly
+from dollarxpy.optimizer import optimized_xpath
+from dollarxpy.path_utils import document_xpath
+
+ROWS = 200
+
+_SAMPLE = """<html><body>
+<div id="main" class="a  main"><h1>Title</h1><h2>Sub Title</h2>
+  <ul><li class="x">First ITEM</li><li class="x y">second item</li><li><b>bold</b> Third Item</li><li>42</li></ul>
+  <span class="x">A</span><span class="y x">b</span><span class="xy">c</span><span>  spaced
+     out   text </span>
+  <div class="a"><span class="x">inner</span><p>only</p></div>
+  <table><tr><td>1</td><td class="c">2</td><td>3</td></tr><tr><td>4</td></tr></table>
+</div>
+<div class="b"><h3>Other</h3><span>tail</span>after</div>
+</body></html>"""
+
+
+def _table(rows: int) -> str:
+    cells = ''.join([f'<tr class="row {"odd" if i % 2 else "even"}">' +
+                     ''.join([f'<td class="c{j}{" hot" if (i + j) % 7 == 0 else ""}"><span>v{i}-{j}</span></td>'
+                              for j in range(5)]) + '</tr>' for i in range(rows)])
+    return f'<html><body><div id="main"><h1>Grid</h1><table class="grid">{cells}</table></div></body></html>'
+
+
+def documents():
+    return {'sample': html.document_fromstring(_SAMPLE), f'table x{ROWS}': html.document_fromstring(_table(ROWS))}
+
+
+def corpus():
+    return [
+        d.span.that(d.has_class('x')),
+        d.element.that(d.has_classes('x', 'y')),
+        d.element.that(d.has_any_of_classes('x', 'c', 'hot')),
+        d.element.that(d.has_none_of_the_classes('x', 'row')),
+        d.element.that(d.has_class('x').or_(d.has_class('c')).and_not(d.has_class('y'))),
+        d.span.descendant_of(d.div.that(d.has_class('a'))),
+        d.header,
+        d.header.or_(d.span).or_(d.td),
+        d.li.that(d.has_text('second item')),
+        d.li.that(d.has_text('42')),
+        d.element.that(d.has_text('v3-1')),
+        d.element.that(d.has_text('')),
+        d.span.that(d.has_text_containing('-4')),
+        d.li.that(d.has_text_starting_with('first')),
+        d.li.that(d.has_text_ending_with('ITEM')),
+        d.span.that(d.has_text_ending_with('-3')),
+        d.element.that(d.has_aggregated_text_equal_to('spaced out text')),
+        d.element.that(d.has_aggregated_text_containing('7-2')),
+        d.element.that(d.has_aggregated_text_starting_with('bold third')),
+        d.element.that(d.has_aggregated_text_ending_with('item')),
+        d.td.that(d.is_last_sibling),
+        d.span.that(d.is_only_child),
+        d.element.that(d.has_no_children),
+        d.element.that(d.has_children).that(d.is_nth_from_last_sibling(0)),
+        d.div.that(d.has_n_children(2).or_more()),
+        d.element.that(d.has_n_children(3).or_less()),
+        d.tr.that(d.has_n_children(5).exactly()),
+        d.li.that(d.is_nth_sibling(1)),
+        d.td.that(d.is_nth_sibling(0)),
+        d.td.that(d.is_nth_from_last_sibling(2)),
+        d.span.that(d.is_after_sibling(at_least(2).occurrences_of(d.span))),
+        d.span.that(d.is_before_sibling(at_most(1).occurrences_of(d.span))),
+        d.td.that(d.is_after_sibling(at_most(1).occurrences_of(d.td))),
+        d.td.that(d.is_after_sibling(exactly(3).occurrences_of(d.td))),
+        d.element.that(d.is_before_sibling(at_most(1).occurrences_of(d.element))),
+        d.span.that(d.is_sibling_of(d.ul)),
+        d.div.that(d.contains(d.li, d.span)),
+        d.element.that(d.is_child_of(d.body)),
+        d.element.that(d.is_parent_of(d.td)),
+        d.element.that(d.has_ancestor(d.ul)),
+        d.element.that(d.is_after(d.header2)),
+        d.span.after(d.ul).before(d.table),
+        d.span.that(d.has_class('x')).descendant_of(d.div.that(d.has_class('a'))).before_sibling(
+            d.span.that(d.has_class('y'))),
+        d.span.descendant_of(d.div).child_of(d.div),
+        d.anything_except(d.div).that(d.has_id('main')),
+        d.first_occurrence_of(d.div),
+        d.last_occurrence_of(d.li),
+        d.occurrence_number(2).of(d.span.descendant_of(d.div)),
+        d.child_number(2).of_type(d.td),
+        d.span.that(d.has_classes('x', 'y')).inside_top_level(),
+    ]
+
+
+_DOCUMENTS = documents()
+
+
+@pytest.mark.parametrize('document', list(_DOCUMENTS))
+@pytest.mark.parametrize('path', corpus(), ids=str)
+def test_optimized_xpath_finds_what_the_plain_one_does(document, path):
+    find = lambda xpath: etree.XPath(xpath)(_DOCUMENTS[document])
+    assert find(optimized_xpath(path)) == find(document_xpath(path))
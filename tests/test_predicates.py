@@ -0,0 +1,58 @@
+import pytest
+from lxml import html
+
+import dollarxpy as d
+from dollarxpy import dom_index
+from dollarxpy.dom_index import DomIndex
+from dollarxpy.npath import at_least, at_most
+from dollarxpy.path_utils import document_xpath
+from dollarxpy.predicates import compile_properties
+
+PAGE = """<html><body>
+<div id="main" class="a  b"><p class="a">Hello   World</p><p class=" b	a ">hello</p><p class="">Été à Paris</p>
+  <p>before<!-- c -->after</p><p><!-- c -->  after<!-- d --> more <b>bold</b></p><p></p><p> </p>
+  <ul><li>One</li><li style="display: none">TWO</li><li style="display:none;color:red"><i>x</i></li></ul>
+</div>
+<div class="ab"><span title="">élève</span><span title="t">  spaced
+   out  </span><span>HELLO<b>x</b></span></div>
+</body></html>"""
+
+_DOCUMENT = html.document_fromstring(PAGE)
+
+_PROPERTIES = [
+    d.has_class('a'), d.has_class('b'), d.has_class('ab'), d.has_classes('a', 'b'), d.has_any_of_classes('b', 'ab'),
+    d.has_none_of_the_classes('a', 'ab'), d.has_class_containing('a'), d.has_class_containing(' '),
+    d.has_id('main'), d.has_attribute('', 'title'), d.has_attribute('t', 'title'), d.is_hidden_with_inline_styling,
+    d.has_some_text, d.has_text(''), d.has_text(' '), d.has_text('hello'), d.has_text('Hello   World'),
+    d.has_text('before'), d.has_text('  after'), d.has_text_containing('été'),
+    d.has_text_containing('Été'), d.has_text_containing(''), d.has_text_starting_with('HEL'),
+    d.has_text_ending_with('O'), d.has_text_ending_with('ève'),
+    d.has_aggregated_text_equal_to('hello world'), d.has_aggregated_text_equal_to('beforeafter'),
+    d.has_aggregated_text_equal_to('after more bold'), d.has_aggregated_text_equal_to(''),
+    d.has_aggregated_text_equal_to('spaced out'), d.has_aggregated_text_containing('lo w'),
+    d.has_aggregated_text_starting_with('hellox'), d.has_aggregated_text_ending_with('bold'),
+    d.is_last_sibling, d.is_only_child, d.has_no_children, d.has_children, d.has_n_children(3).or_more(),
+    d.has_n_children(2).or_less(), d.is_nth_sibling(1), d.is_nth_from_last_sibling(0),
+    d.has_child(d.custom_element('b')), d.is_child_of(d.div.that(d.has_class('ab'))), d.has_ancestor(d.ul),
+    d.contains(d.custom_element('b'), d.custom_element('i')), d.is_after(d.ul), d.is_before(d.ul),
+    d.is_after_sibling(at_least(2).occurrences_of(d.custom_element('p'))),
+    d.is_before_sibling(at_most(1).occurrences_of(d.element)), d.is_sibling_of(d.ul),
+    d.has_class('a').and_(d.has_text('hello')), d.has_class('a').or_(d.has_text('')),
+    d.has_class('b').and_not(d.has_class('ab')),
+]
+
+
+@pytest.fixture
+def predicates_on_every_candidate(monkeypatch):
+    monkeypatch.setattr(dom_index, '_PREDICATE_CANDIDATES_RATIO', 1)
+    monkeypatch.setattr(dom_index, '_XPATH_PREDICATE_CANDIDATES_RATIO', 1)
+
+
+@pytest.mark.parametrize('base', [d.element, d.custom_element('p'), d.span], ids=str)
+@pytest.mark.parametrize('prop', _PROPERTIES, ids=str)
+@pytest.mark.usefixtures('predicates_on_every_candidate')
+def test_predicates_find_what_xpath_does(base, prop):
+    assert compile_properties([prop]) is not None
+    index = DomIndex(_DOCUMENT)
+    for path in (base.that(prop), base.that(d.not_prop(prop))):
+        assert index.find_all(path) == _DOCUMENT.xpath(document_xpath(path))
@@ -0,0 +1,128 @@
+"""Golden renderings: a change to any of these changes the selectors sent to lxml and to browsers."""
+import pytest
+
+import dollarxpy as d
+from dollarxpy.npath import at_least
+
+
+RENDERINGS = [
+    pytest.param(d.div,
+                 'div',
+                 '*[self::div]',
+                 'div', id='div'),
+    pytest.param(d.li,
+                 'li',
+                 '*[self::li]',
+                 'list item', id='li'),
+    pytest.param(d.element.that(d.has_id('i')),
+                 "*[@id='i']",
+                 "*[@id='i']",
+                 'any element, that has id: i', id='element with id'),
+    pytest.param(d.span.that(d.has_class('x')),
+                 "span[contains(concat(' ', normalize-space(@class), ' '), ' x ')]",
+                 "*[self::span][contains(concat(' ', normalize-space(@class), ' '), ' x ')]",
+                 "span, that has class 'x'", id='span with class'),
+    pytest.param(d.span.that(d.has_class('x'), d.has_text('hello')),
+                 "span[contains(concat(' ', normalize-space(@class), ' '), ' x ')][translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz') = 'hello']",
+                 "*[self::span][contains(concat(' ', normalize-space(@class), ' '), ' x ')][translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz') = 'hello']",
+                 'span, that has class \'x\', and has the text "hello"', id='two properties'),
+    pytest.param(d.li.that(d.has_class('x'), d.is_last_sibling, d.has_text_containing('a')),
+                 "li[contains(concat(' ', normalize-space(@class), ' '), ' x ')][count(following-sibling::*)=0][contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'a')]",
+                 "*[self::li][contains(concat(' ', normalize-space(@class), ' '), ' x ')][count(following-sibling::*)=0][contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'a')]",
+                 'list item, that [has class \'x\', is last sibling, has text containing "a"]', id='three properties'),
+    pytest.param(d.div.with_class('a'),
+                 "div[contains(concat(' ', normalize-space(@class), ' '), ' a ')]",
+                 "*[self::div][contains(concat(' ', normalize-space(@class), ' '), ' a ')]",
+                 "div, that has class 'a'", id='with_class'),
+    pytest.param(d.span.child_of(d.div),
+                 'div/child::span',
+                 '*[self::span][parent::*[self::div]]',
+                 'span, child of div', id='child_of'),
+    pytest.param(d.span.descendant_of(d.div.that(d.has_class('a'))),
+                 "div[contains(concat(' ', normalize-space(@class), ' '), ' a ')]/descendant::span",
+                 "*[self::span][ancestor::*[self::div][contains(concat(' ', normalize-space(@class), ' '), ' a ')]]",
+                 "span, descendant (div, that has class 'a')", id='descendant_of'),
+    pytest.param(d.td.after_sibling(d.td.that(d.has_text('1'))),
+                 "td[translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz') = '1']/following-sibling::td",
+                 "*[self::td][preceding-sibling::*[self::td][translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz') = '1']]",
+                 'table cell, after the sibling (table cell, that has the text "1")', id='after_sibling'),
+    pytest.param(d.div.ancestor_of(d.span.child_of(d.li)),
+                 'li/child::span/ancestor::div',
+                 '*[self::div][descendant::*[self::span][parent::*[self::li]]]',
+                 'div, ancestor (span, child of (list item))', id='nested relation'),
+    pytest.param(d.span.or_(d.div),
+                 '*[self::span | self::div]',
+                 '*[self::span | self::div]',
+                 'span or div', id='or_'),
+    pytest.param(d.anything_except(d.div),
+                 '*[not(self::div)]',
+                 '*[not(self::*[self::div])]',
+                 'anything except (div)', id='anything_except'),
+    pytest.param(d.first_occurrence_of(d.li),
+                 '(//li)[1]',
+                 '(//*[self::li])[1]',
+                 'the first occurrence of (list item)', id='first_occurrence_of'),
+    pytest.param(d.last_occurrence_of(d.span.child_of(d.div)),
+                 '(//div/child::span)[last()]',
+                 '(//*[self::span][parent::*[self::div]])[last()]',
+                 'the last occurrence of (span, child of div)', id='last_occurrence_of'),
+    pytest.param(d.child_number(2).of_type(d.td),
+                 'td[2]',
+                 '*[self::td][2]',
+                 'child number 2 of type table cell', id='child_number'),
+    pytest.param(d.span.that(d.has_class('x')).inside_top_level(),
+                 "//span[contains(concat(' ', normalize-space(@class), ' '), ' x ')]",
+                 "*[self::span][contains(concat(' ', normalize-space(@class), ' '), ' x ')]",
+                 "span, that has class 'x'", id='inside_top_level'),
+    pytest.param(d.div.that(d.has_class('menu')).described_by('the menu'),
+                 "div[contains(concat(' ', normalize-space(@class), ' '), ' menu ')]",
+                 "*[self::div][contains(concat(' ', normalize-space(@class), ' '), ' menu ')]",
+                 'the menu', id='described_by'),
+    pytest.param(d.element.that(d.has_classes('a', 'b')),
+                 "*[contains(concat(' ', normalize-space(@class), ' '), ' a ') and contains(concat(' ', normalize-space(@class), ' '), ' b ')]",
+                 "*[contains(concat(' ', normalize-space(@class), ' '), ' a ') and contains(concat(' ', normalize-space(@class), ' '), ' b ')]",
+                 'any element, that has classes [a, b]', id='has_classes'),
+    pytest.param(d.span.that(d.not_prop(d.has_class('x'))),
+                 "span[not(contains(concat(' ', normalize-space(@class), ' '), ' x '))]",
+                 "*[self::span][not(contains(concat(' ', normalize-space(@class), ' '), ' x '))]",
+                 "span, not (has class 'x')", id='not_prop'),
+    pytest.param(d.span.that(d.has_class('x').or_(d.has_class('y'))),
+                 "span[(contains(concat(' ', normalize-space(@class), ' '), ' x ') or contains(concat(' ', normalize-space(@class), ' '), ' y '))]",
+                 "*[self::span][(contains(concat(' ', normalize-space(@class), ' '), ' x ') or contains(concat(' ', normalize-space(@class), ' '), ' y '))]",
+                 "span, (has class 'x' or has class 'y')", id='or of properties'),
+    pytest.param(d.ul.that(d.has_n_children(2).or_more()),
+                 'ul[count(./*)>=2]',
+                 '*[self::ul][count(./*)>=2]',
+                 'unordered list, that has at least 2 children', id='has_n_children'),
+    pytest.param(d.li.that(d.is_nth_sibling(1)),
+                 'li[count(preceding-sibling::*)=1]',
+                 '*[self::li][count(preceding-sibling::*)=1]',
+                 'list item, that is in place 1 among its siblings', id='is_nth_sibling'),
+    pytest.param(d.element.that(d.is_child_of(d.body)),
+                 '*[parent::body]',
+                 '*[parent::body]',
+                 'any element, that is child of: (document body)', id='is_child_of'),
+    pytest.param(d.div.that(d.contains(d.li, d.span)),
+                 'div[(descendant::li) and (descendant::span)]',
+                 '*[self::div][(descendant::li) and (descendant::span)]',
+                 'div, that has descendants: [(list item), span]', id='contains'),
+    pytest.param(d.span.that(d.is_after_sibling(at_least(2).occurrences_of(d.span))),
+                 'span[count(preceding-sibling::span)>=2]',
+                 '*[self::span][count(preceding-sibling::span)>=2]',
+                 'span, that is after at least 2 siblings of type span', id='npath sibling'),
+    pytest.param(d.element.that(d.has_aggregated_text_starting_with('Ab')),
+                 "*[starts-with(translate(normalize-space(string(.)), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'ab')]",
+                 "*[starts-with(translate(normalize-space(string(.)), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'ab')]",
+                 'any element, that has aggregated text starting with "Ab"', id='aggregated text'),
+    pytest.param(d.header,
+                 '*[self::*[self::*[self::*[self::*[self::h1 | self::h2] | self::h3] | self::h4] | self::h5] | self::h6]',
+                 '*[self::*[self::*[self::*[self::*[self::h1 | self::h2] | self::h3] | self::h4] | self::h5] | self::h6]',
+                 'header-1 or header-2 or header-3 or header-4 or header-5 or header-6', id='header'),
+]
+
+
+@pytest.mark.parametrize('path, xpath, alternate_xpath, text', RENDERINGS)
+def test_rendering(path, xpath, alternate_xpath, text):
+    assert path.get_xpath() == xpath
+    assert path.get_alternate_xpath() == alternate_xpath
+    assert str(path) == text
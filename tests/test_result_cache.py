@@ -0,0 +1,89 @@
+import pytest
+
+from dollarxpy import div, li, span
+from dollarxpy.browser import Browser
+from dollarxpy.queries import VERSIONED_SCRIPT, count_query, missing_results, versioned_results
+from dollarxpy.result_cache import ResultCache
+from dollarxpy.snapshot import Snapshot
+from fake_driver import FakeDriver
+
+PAGE = '<html><body><div><span>1</span><span>2</span></div><ul><li>a</li></ul></body></html>'
+
+
+def test_hits_and_misses_by_kind_path_and_version():
+    cache = ResultCache()
+    snapshot = Snapshot.from_html(PAGE, cache)
+    assert snapshot.count(span) == 2
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert snapshot.count(span) == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert snapshot.exists(span)
+    assert snapshot.count(li) == 1
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert ('count', span, snapshot.version) in cache and ('exists', span, snapshot.version) in cache
+    assert snapshot.find_all_of([span, li]) == [snapshot.find_all(span), snapshot.find_all(li)]
+    assert (cache.hits, cache.misses) == (3, 5)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.cached('b', lambda: 4) == 4
+    assert 'a' not in cache
+    assert cache.get('missing', 'default') == 'default'
+    assert cache.statistics() == {'hits': 1, 'misses': 2, 'evictions': 2, 'size': 2, 'max_size': 2,
+                                  'hit_rate': 1 / 3}
+    cache.reset_statistics()
+    cache.clear()
+    assert cache.statistics()['hits'] == cache.statistics()['size'] == 0
+    with pytest.raises(ValueError):
+        ResultCache(max_size=0)
+
+
+def test_snapshots_sharing_a_cache_get_their_own_results():
+    cache = ResultCache()
+    first, second = Snapshot.from_html(PAGE, cache), Snapshot.from_html(PAGE.replace('<li>a</li>', ''), cache)
+    assert first.version != second.version
+    assert (first.count(li), second.count(li)) == (1, 0)
+    assert (first.exists(li), second.exists(li)) == (True, False)
+    assert first.find_first(li) is not None and second.find_first(li) is None
+    assert [e.getroottree().getroot() is first.root for e in first.find_all(span)] == [True, True]
+    assert [e.getroottree().getroot() is second.root for e in second.find_all(span)] == [True, True]
+    assert first.find_all_of([li]) != second.find_all_of([li])
+
+
+def test_browser_evaluates_every_query_again_after_the_version_changed():
+    driver = FakeDriver(script_results=[['v1', [0, 1], [2, 1]], ['v1', [1], [0]], ['v2', [0, 1], [3, 2]],
+                                        ['v2', [], []]])
+    browser = Browser(driver, ResultCache())
+    assert browser.count_all([span, li]) == [2, 1]
+    assert browser.count_all([span, div]) == [2, 0]
+    assert browser.count_all([span, div]) == [3, 2]
+    assert browser.count_all([span, div]) == [3, 2]
+    queries = [count_query(span), count_query(div)]
+    assert driver.script_calls == [
+        (VERSIONED_SCRIPT, ([count_query(span), count_query(li)], None, [0, 1])),
+        (VERSIONED_SCRIPT, (queries, 'v1', [1])),
+        (VERSIONED_SCRIPT, (queries, 'v1', [])),
+        (VERSIONED_SCRIPT, (queries, 'v2', [])),
+    ]
+
+
+def test_missing_results():
+    cache = ResultCache()
+    cache.put(('count', span, 'v1'), 2)
+    assert missing_results(cache, 'count', [span, li], 'v1') == [1]
+    assert missing_results(cache, 'exists', [span, li], 'v1') == [0, 1]
+    assert missing_results(cache, 'count', [span, li], None) == [0, 1]
+
+
+def test_versioned_results_read_the_hits_before_adding_entries():
+    cache = ResultCache(max_size=1)
+    cache.put(('count', span, 'v1'), 2)
+    version, found = versioned_results(cache, 'count', [span, li, div], ['v1', [1, 2], [1, 0]])
+    assert (version, found) == ('v1', [2, 1, 0])
+    assert len(cache) == 1 and ('count', div, 'v1') in cache
@@ -0,0 +1,29 @@
+import pytest
+
+from dollarxpy import div, has_class, has_text, span
+from dollarxpy.css import compile_selector
+from dollarxpy.serialization import COMPILER_VERSION, from_dict, to_dict
+
+
+def test_round_trip():
+    path = span.that(has_class('kept')).child_of(div)
+    data = to_dict({'path': path})
+    assert from_dict(data)['path'].get_xpath() == path.get_xpath()
+
+
+def test_loading_does_not_replace_the_renderings_of_a_path_built_in_code():
+    path = span.that(has_text('built')).child_of(div)
+    xpath, selector = path.get_xpath(), compile_selector(path)
+    data = to_dict({'path': path})
+    data['entries']['path'][1:] = ['//stale', '//stale', 'stale', selector.strategy.value, 'stale']
+    loaded = from_dict(data)['path']
+    assert loaded is path
+    assert loaded.get_xpath() == xpath and compile_selector(loaded) == selector and str(loaded) != 'stale'
+
+
+@pytest.mark.parametrize('compiler', [None, COMPILER_VERSION - 1])
+def test_files_of_another_compiler_version_are_rejected(compiler):
+    data = to_dict({'path': div})
+    data['compiler'] = compiler
+    with pytest.raises(ValueError, match='recompile'):
+        from_dict(data)
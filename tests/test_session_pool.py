@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from dollarxpy.browser import SessionPool
+from dollarxpy.operations import OperationFailed
+from fake_driver import FakeDriver
+
+
+class Factory:
+    def __init__(self, **options):
+        self.options = options
+        self.drivers = []
+
+    def __call__(self):
+        driver = FakeDriver(**self.options)
+        self.drivers.append(driver)
+        return driver
+
+
+def test_sessions_are_reset_and_reused():
+    factory = Factory()
+    with SessionPool(factory, reset_url='about:blank') as pool:
+        with pool.session() as browser:
+            browser.driver.window_handles.append('w1')
+        with pool.session() as browser:
+            assert browser.driver is factory.drivers[0]
+            assert browser.driver.window_handles == ['w0']
+            assert browser.driver.visited == ['about:blank']
+    assert factory.drivers[0].quitted
+
+
+def test_checkout_waits_for_a_checkin_when_all_sessions_are_in_use():
+    pool = SessionPool(Factory(), size=1)
+    browser = pool.checkout()
+    threading.Timer(0.05, pool.checkin, [browser]).start()
+    start = time.monotonic()
+    assert pool.checkout(timeout=2).driver is browser.driver
+    assert time.monotonic() - start >= 0.04
+
+
+def test_checkout_timeout():
+    pool = SessionPool(Factory(), size=2, checkout_timeout=0.05)
+    pool.checkout(), pool.checkout()
+    with pytest.raises(OperationFailed, match='within 0.05s'):
+        pool.checkout()
+
+
+def test_unhealthy_session_is_replaced():
+    factory = Factory()
+    pool = SessionPool(factory)
+    with pool.session() as browser:
+        pass
+    browser.driver.healthy = False
+    assert pool.checkout().driver is factory.drivers[1]
+    assert factory.drivers[0].quitted
+
+
+def test_session_that_cannot_be_reset_is_discarded():
+    factory = Factory(resettable=False)
+    pool = SessionPool(factory, size=1)
+    with pool.session():
+        pass
+    assert factory.drivers[0].quitted
+    assert pool.checkout().driver is factory.drivers[1]
+
+
+def test_session_is_replaced_after_max_uses():
+    factory = Factory()
+    pool = SessionPool(factory, max_uses=2)
+    drivers = []
+    for _ in range(3):
+        with pool.session() as browser:
+            drivers.append(browser.driver)
+    assert drivers == [factory.drivers[0], factory.drivers[0], factory.drivers[1]]
+    assert factory.drivers[0].quitted
+
+
+def test_close_while_sessions_are_leased():
+    factory = Factory()
+    pool = SessionPool(factory, size=2)
+    leased = pool.checkout()
+    with pool.session():
+        pass
+    pool.close()
+    assert factory.drivers[1].quitted and not factory.drivers[0].quitted
+    with pytest.raises(OperationFailed, match='closed'):
+        pool.checkout()
+    pool.checkin(leased)
+    assert factory.drivers[0].quitted
+
+
+def test_factory_failure():
+    attempts = []
+
+    def factory():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise WebDriverException("the browser did not start")
+        return FakeDriver()
+    pool = SessionPool(factory, size=1, checkout_timeout=0.05)
+    with pytest.raises(OperationFailed, match='failed to start'):
+        pool.checkout()
+    # the slot of the failed session is free again
+    assert pool.checkout() is not None
+
+
+def test_new_session_failing_its_health_check():
+    factory = Factory(healthy=False)
+    pool = SessionPool(factory, size=1)
+    with pytest.raises(OperationFailed, match='health check'):
+        pool.checkout()
+    assert factory.drivers[0].quitted
+
+
+def test_checkin_of_a_foreign_browser():
+    pool = SessionPool(Factory())
+    other = SessionPool(Factory()).checkout()
+    with pytest.raises(ValueError):
+        pool.checkin(other)
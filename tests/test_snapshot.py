@@ -0,0 +1,143 @@
+import pytest
+
+from dollarxpy import custom_element, div, first_occurrence_of, has_child, has_class, has_text, is_last_sibling, \
+    last_occurrence_of, li, span, table, td, tr, ul
+from dollarxpy.basic_path import PathKind
+from dollarxpy.npath import at_least, at_most, exactly
+from dollarxpy.operations import OperationFailed
+from dollarxpy.snapshot import Snapshot
+
+PAGE = '<html><body><ul class="menu"><li>Home</li><li class="x">About</li><li class="x">Contact</li></ul>' \
+       '<div><span>1</span></div></body></html>'
+
+
+@pytest.fixture
+def snapshot():
+    return Snapshot.from_html(PAGE)
+
+
+def test_find_all_and_first(snapshot):
+    assert [e.text for e in snapshot.find_all(li)] == ['Home', 'About', 'Contact']
+    assert snapshot.find_first(li.that(has_class('x'))).text == 'About'
+    assert snapshot.find_all(li.that(has_text('missing'))) == []
+    assert snapshot.find_first(li.that(has_text('missing'))) is None
+
+
+def test_relations(snapshot):
+    assert [e.text for e in snapshot.find_all(span.descendant_of(div))] == ['1']
+    assert snapshot.find_all(span.child_of(ul)) == []
+    assert snapshot.find_first(ul.that(has_class('menu'))).tag == 'ul'
+
+
+def test_count_and_exists(snapshot):
+    assert snapshot.count(li) == 3
+    assert snapshot.count(li.that(has_class('x'))) == 2
+    assert snapshot.count(span.child_of(ul)) == 0
+    assert snapshot.exists(span)
+    assert not snapshot.exists(li.child_of(div))
+
+
+@pytest.mark.parametrize('npath, satisfied', [
+    (exactly(3).occurrences_of(li), True),
+    (at_least(2).occurrences_of(li.that(has_class('x'))), True),
+    (at_most(1).occurrences_of(li), False),
+    (at_least(4).occurrences_of(li), False),
+])
+def test_npaths(snapshot, npath, satisfied):
+    assert snapshot.exists(npath) is satisfied
+    assert snapshot.count(npath) == snapshot.count(npath.path)
+    assert snapshot.find_all(npath) == (snapshot.find_all(npath.path) if satisfied else [])
+    assert snapshot.find_first(npath) is (snapshot.find_first(npath.path) if satisfied else None)
+
+
+def test_assert_occurrences(snapshot):
+    assert snapshot.assert_occurrences(exactly(3).occurrences_of(li)) == 3
+    with pytest.raises(OperationFailed, match='found 3'):
+        snapshot.assert_occurrences(at_most(2).occurrences_of(li))
+
+
+_LINKS = '<html><body><p><a href="/1" title="one">First <b>bold</b>\n  link</a><a href="/2"><!-- c -->  after ' \
+         'comment<i>x</i> </a><a><b>only</b> tail</a><a href="/4"></a><a href="/5">\u00e9l\u00e8ve\t\u00a0 nbsp</a>' \
+         '</p></body></html>'
+
+
+def test_extract_columns():
+    snapshot = Snapshot.from_html(_LINKS)
+    columns = snapshot.extract(custom_element('a'), ['href', 'title'])
+    assert columns == {
+        'text': ['First ', '  after comment', ' tail', '', '\u00e9l\u00e8ve\t\u00a0 nbsp'],
+        'aggregated_text': ['First bold link', 'after commentx', 'only tail', '', '\u00e9l\u00e8ve \u00a0 nbsp'],
+        '@href': ['/1', '/2', None, '/4', '/5'],
+        '@title': ['one', None, None, None, None],
+    }
+    assert snapshot.extract(custom_element('a'), ['href'], text=False, aggregated_text=False) == \
+        {'@href': ['/1', '/2', None, '/4', '/5']}
+    assert snapshot.extract(exactly(2).occurrences_of(custom_element('a'))) == {'text': [], 'aggregated_text': []}
+
+
+# the first text node and the normalized string value are what the xpath text()[1] and normalize-space() find
+def test_extracted_text_is_what_xpath_finds():
+    snapshot = Snapshot.from_html(_LINKS)
+    columns = snapshot.extract(custom_element('a'))
+    links = snapshot.find_all(custom_element('a'))
+    assert columns['text'] == [link.xpath('string(text()[1])') for link in links]
+    assert columns['aggregated_text'] == [link.xpath('normalize-space(.)') for link in links]
+
+
+_GRID = '<html><body><table class="grid">' + ''.join(
+    f'<tr class="{"odd" if i % 2 else "even"}"><td>{i}</td><td class="c"><span>v{i}</span></td>'
+    f'<td>{"<b>hot</b>" if i % 3 == 0 else ""}</td></tr>' for i in range(6)) + '</table></body></html>'
+
+_SCOPED = [
+    td, td.that(has_class('c')), span.descendant_of(td), span.child_of(td.that(has_class('c'))),
+    td.that(is_last_sibling), custom_element('b').inside_top_level(), first_occurrence_of(td),
+    last_occurrence_of(td), td.that(has_child(custom_element('b'))), td.after_sibling(td.that(has_class('c'))),
+    td.descendant_of(table), span.descendant_of(td).descendant_of(table), span.descendant_of(td.descendant_of(table)),
+    span.descendant_of(tr.that(has_class('odd'))), td.that(is_last_sibling).child_of(tr).descendant_of(table),
+]
+
+
+@pytest.mark.parametrize('path', _SCOPED, ids=str)
+def test_scope_finds_the_matches_inside_the_element(path):
+    snapshot = Snapshot.from_html(_GRID)
+    rows = snapshot.scopes(tr)
+    assert len(rows) == 6
+    everywhere = snapshot.find_all(path)
+    for row in rows:
+        inside = [e for e in everywhere if row.element in e.iterancestors()]
+        if path.kind is not PathKind.OCCURRENCE:  # the first or last occurrence in the document is not in every row
+            assert row.find_all(path) == inside
+        assert row.count(path) == len(row.find_all(path))
+        assert row.exists(path) == bool(row.find_all(path))
+        assert row.find_first(path) is (row.find_all(path)[0] if row.find_all(path) else None)
+
+
+def test_occurrences_are_counted_inside_the_element():
+    rows = Snapshot.from_html(_GRID).scopes(tr)
+    assert [row.find_first(last_occurrence_of(td)).text for row in rows[:2]] == [None, None]
+    assert [row.find_all(first_occurrence_of(td))[0].text for row in rows] == [str(i) for i in range(6)]
+    assert [len(row.find_all(exactly(1).occurrences_of(custom_element('b')))) for row in rows] == [1, 0, 0, 1, 0, 0]
+    assert rows[0].assert_occurrences(exactly(3).occurrences_of(td)) == 3
+
+
+# the relations look outside the element whichever form the path renders to from the document root
+def test_relations_to_elements_outside_the_scope():
+    snapshot = Snapshot.from_html(_GRID)
+    for row in snapshot.scopes(tr):
+        assert len(row.find_all(td.descendant_of(table))) == 3
+        assert len(row.find_all(span.descendant_of(td).descendant_of(table))) == 1
+        assert len(row.find_all(span.descendant_of(td.descendant_of(table)))) == 1
+        assert row.count(span.descendant_of(td).descendant_of(table)) == 1
+        assert row.exists(span.descendant_of(td.descendant_of(table)))
+    assert [len(grid.find_all(td.descendant_of(tr))) for grid in snapshot.scopes(table)] == [18]
+
+
+def test_npaths_are_counted_as_found():
+    rows = Snapshot.from_html(_GRID).scopes(tr)
+    hot = exactly(1).occurrences_of(custom_element('b'))
+    assert [row.count(hot) for row in rows] == [len(row.find_all(hot)) for row in rows] == [1, 0, 0, 1, 0, 0]
+    assert [row.exists(hot) for row in rows] == [True, False, False, True, False, False]
+    assert rows[0].count(at_least(2).occurrences_of(td)) == 3
+    assert rows[0].count(at_most(2).occurrences_of(td)) == 0
+    with pytest.raises(OperationFailed, match='found 3'):
+        rows[0].assert_occurrences(at_most(2).occurrences_of(td))
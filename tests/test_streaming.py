@@ -0,0 +1,39 @@
+import io
+
+import pytest
+from lxml import etree
+
+from dollarxpy import div, element, span, is_after_sibling
+from dollarxpy.optimizer import optimized_xpath
+from dollarxpy.streaming import NotStreamable, iter_matches, not_streamable_reason
+
+DOCUMENT = b'<r><div/><span/><div><span/><div/></div></r>'
+
+
+def _streamed(path, with_descendants=False):
+    return [e.tag for e in iter_matches(io.BytesIO(DOCUMENT), path, with_descendants=with_descendants)]
+
+
+def _expected(path):
+    return [e.tag for e in etree.fromstring(DOCUMENT).xpath(optimized_xpath(path))]
+
+
+@pytest.mark.parametrize('path', [
+    element.after_sibling(div),
+    element.that(is_after_sibling(div)),
+    span.after_sibling(div),
+    span.descendant_of(div),
+    div.child_of(element.after_sibling(span)),
+])
+def test_streamed_matches_are_the_xpath_matches(path):
+    assert not_streamable_reason(path, with_descendants=False) is None
+    assert _streamed(path) == _expected(path)
+
+
+def test_root_has_no_earlier_siblings():
+    assert _streamed(element.after_sibling(div)) == ['span', 'div']
+
+
+def test_look_ahead_is_not_streamable():
+    with pytest.raises(NotStreamable):
+        list(iter_matches(io.BytesIO(DOCUMENT), div.before_sibling(span)))
@@ -0,0 +1,56 @@
+import pytest
+from lxml import etree, html
+
+import dollarxpy as d
+from dollarxpy.text_index import TextIndex
+
+PAGE = """<html><body>
+<p class="Intro  lead">Hello World</p><p class="lead">hello</p><p class="x">HELLO<b>bold</b> tail</p>
+<span>ab</span><span>AB</span><span>a</span><span></span><span> padded  text </span><span>Ärger über Straße</span>
+<div class="a b"><i>x</i>Mixed <b>CaSe</b>   words</div><div class="b	c">tab separated</div><em>xyz 42</em>
+</body></html>"""
+
+_DOCUMENT = html.document_fromstring(PAGE)
+
+
+def _xpath_matches(prop):
+    return _DOCUMENT.xpath(f'//*[{prop.to_xpath()}]')
+
+
+def _index_matches(prop):
+    elements = list(_DOCUMENT.iter(etree.Element))
+    ids = TextIndex(elements).resolve(prop)
+    return None if ids is None else [elements[i] for i in ids.tolist()]
+
+
+_TERMS = ['hello', 'HeLLo', 'hello world', 'lo', 'l', 'ab', 'a', '', 'xyz 42', 'ärger', 'Ärger', 'straße',
+          'über', 'padded', 'padded text', 'mixed case words', 'case', 'words', 'x', 'bold tail', 'missing']
+
+
+@pytest.mark.parametrize('builder', [
+    d.has_text, d.has_text_containing, d.has_text_starting_with, d.has_text_ending_with,
+    d.has_aggregated_text_equal_to, d.has_aggregated_text_containing, d.has_aggregated_text_starting_with,
+    d.has_aggregated_text_ending_with,
+], ids=lambda builder: builder.__name__)
+@pytest.mark.parametrize('term', _TERMS)
+def test_text_postings_find_what_xpath_does(builder, term):
+    prop = builder(term)
+    assert _index_matches(prop) == _xpath_matches(prop)
+
+
+def test_some_text():
+    assert _index_matches(d.has_some_text) == _xpath_matches(d.has_some_text)
+
+
+@pytest.mark.parametrize('prop', [
+    d.has_class('lead'), d.has_class('Intro'), d.has_class('intro'), d.has_class('b'), d.has_class('c'),
+    d.has_class('missing'), d.has_classes('a', 'b'), d.has_classes('lead', 'Intro'), d.has_classes('a', 'c'),
+    d.has_any_of_classes('x', 'c'), d.has_any_of_classes('missing', 'a'),
+], ids=str)
+def test_class_postings_find_what_xpath_does(prop):
+    assert _index_matches(prop) == _xpath_matches(prop)
+
+
+@pytest.mark.parametrize('prop', [d.has_class('a b'), d.has_class(''), d.has_classes('lead', 'x y')], ids=str)
+def test_class_names_with_whitespace_are_left_to_xpath(prop):
+    assert _index_matches(prop) is None
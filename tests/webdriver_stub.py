@@ -0,0 +1,172 @@
+"""A W3C WebDriver server over asyncio streams for the browser tests.
+
+Scripts are not run: EVALUATE_ALL_SCRIPT and WAIT_SCRIPT are recognized and their queries evaluated with lxml on
+a fixed page. Responses can be delayed, sent chunked, or replaced by raw bytes to test broken servers.
+"""
+import asyncio
+import itertools
+import json
+
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+from dollarxpy.queries import EVALUATE_ALL_SCRIPT, WAIT_SCRIPT
+
+ELEMENT_KEY = 'element-6066-11e4-a23f-4fd9ac6dc74b'
+
+
+def _satisfied(n, operator, expected):
+    return n >= expected if operator == '>=' else n <= expected if operator == '<=' else n == expected
+
+
+class StubWebDriver:
+    def __init__(self, markup: str, latency: float = 0.0, chunked: bool = False, close_idle: bool = False,
+                 trailers: tuple = ()):
+        self.markup, self.latency, self.chunked, self.close_idle = markup, latency, chunked, close_idle
+        # trailer fields sent after the last chunk of a chunked response, like 'X-Checksum: 1'
+        self.trailers = trailers
+        self.sessions = {}
+        self.connections = 0
+        self.commands = []
+        self.clicks = []
+        # raw bytes sent instead of the response to the next commands, after which the connection is closed
+        self.raw_responses = []
+        # webdriver errors thrown by the next scripts, as {'error': ..., 'message': ...}
+        self.script_errors = []
+        self._ids = itertools.count()
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        return f'http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}/wd/hub'
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self) -> str:
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def _reference(self, session: dict, element) -> dict:
+        element_id = session['ids'].get(element)
+        if element_id is None:
+            element_id = session['ids'][element] = f'e{next(self._ids)}'
+            session['elements'][element_id] = element
+        return {ELEMENT_KEY: element_id}
+
+    @staticmethod
+    def _matches(root, selector: str, is_css: bool) -> list:
+        return CSSSelector(selector)(root) if is_css else root.xpath(selector)
+
+    def _evaluate_all(self, session: dict, queries: list) -> list:
+        results = []
+        for query in queries:
+            selector, result_type, is_css = query[:3]
+            if is_css:
+                found = self._matches(session['root'], selector, True)
+                value = len(found) if result_type == 1 else bool(found) if result_type == 3 else found
+            else:
+                value = session['root'].xpath(selector)
+            if isinstance(value, list):
+                condition = query[3] if len(query) > 3 else None
+                if condition and not _satisfied(len(value), *condition):
+                    value = []
+                value = [self._reference(session, e) for e in value]
+            results.append(value)
+        return results
+
+    def _holds(self, session: dict, query: list) -> bool:
+        selector, is_css, condition, negated = query
+        found = len(self._matches(session['root'], selector, True)) if is_css else \
+            int(session['root'].xpath(f'count({selector})'))
+        return _satisfied(found, *condition) != negated
+
+    async def _wait(self, session: dict, query: list, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout / 1000
+        while not self._holds(session, query):
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    async def _handle(self, method: str, path: str, body):
+        parts = path[len('/wd/hub'):].strip('/').split('/')
+        if parts == ['session'] and method == 'POST':
+            session_id = f's{next(self._ids)}'
+            self.sessions[session_id] = {'root': lxml_html.document_fromstring(self.markup), 'ids': {},
+                                         'elements': {}}
+            return 200, {'sessionId': session_id, 'capabilities': {}}
+        session = self.sessions.get(parts[1]) if len(parts) > 1 else None
+        if session is None:
+            return 404, {'error': 'invalid session id', 'message': f'no session {path}'}
+        command = parts[2:]
+        if not command and method == 'DELETE':
+            del self.sessions[parts[1]]
+            return 200, None
+        if command == ['url']:
+            return 200, None
+        if command[0] == 'execute':
+            if self.script_errors:
+                return 500, self.script_errors.pop(0)
+            if command == ['execute', 'sync'] and body['script'] == EVALUATE_ALL_SCRIPT:
+                return 200, self._evaluate_all(session, body['args'][0])
+            if command == ['execute', 'async'] and body['script'] == WAIT_SCRIPT:
+                return 200, await self._wait(session, *body['args'])
+            return 500, {'error': 'javascript error', 'message': 'the stub does not run this script'}
+        if command[0] == 'element':
+            element = session['elements'].get(command[1])
+            if element is None:
+                return 404, {'error': 'no such element', 'message': command[1]}
+            if command[2:] == ['click']:
+                self.clicks.append(command[1])
+                return 200, None
+            if command[2:] == ['text']:
+                return 200, ' '.join(element.text_content().split())
+        return 404, {'error': 'unknown command', 'message': f'{method} {path}'}
+
+    def _response(self, status: int, value) -> bytes:
+        data = json.dumps({'value': value}).encode()
+        if not self.chunked:
+            return f'HTTP/1.1 {status} OK\r\nContent-Length: {len(data)}\r\n\r\n'.encode() + data
+        middle = len(data) // 2
+        chunks = b''.join(f'{len(c):x}\r\n'.encode() + c + b'\r\n' for c in (data[:middle], data[middle:]))
+        trailers = ''.join(f'{field}\r\n' for field in self.trailers).encode()
+        return f'HTTP/1.1 {status} OK\r\nTransfer-Encoding: chunked\r\n\r\n'.encode() + chunks + b'0\r\n' + \
+            trailers + b'\r\n'
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(' ')
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b''):
+                        break
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = json.loads(await reader.readexactly(length)) if length else None
+                self.commands.append((method, path))
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if self.raw_responses:
+                    writer.write(self.raw_responses.pop(0))
+                    await writer.drain()
+                    break
+                writer.write(self._response(*await self._handle(method, path, body)))
+                await writer.drain()
+                if self.close_idle:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()